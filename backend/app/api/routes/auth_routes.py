@@ -4,10 +4,11 @@ from fastapi import APIRouter, HTTPException, Request, Depends, Response, Cookie
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional
-import jwt
+from jose import ExpiredSignatureError, JWTError
 import time
 import secrets
-from datetime import datetime
+from datetime import datetime, timedelta
+from api.services.token_service import create_access_token, decode_token
 
 router = APIRouter()
 security = HTTPBearer()
@@ -41,15 +42,10 @@ async def login(credentials: UserLogin):
         if len(credentials.username) < 3 or len(credentials.password) < 6:
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        # Generate token
-        token = jwt.encode(
-            {
-                "sub": credentials.username,
-                "role": role,
-                "exp": datetime.utcnow() + timedelta(hours=24)
-            },
-            "secret_key",  # Use proper secret key in production
-            algorithm="HS256"
+        # Generate token (JWT_SECRET, see token_service)
+        token = create_access_token(
+            {"sub": credentials.username, "role": role},
+            expires_delta=timedelta(hours=24)
         )
 
         return UserResponse(
@@ -59,6 +55,8 @@ async def login(credentials: UserLogin):
             token=token
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -72,12 +70,12 @@ async def logout(response: Response):
 async def get_current_user(token: str = Depends(security)):
     """Get current authenticated user"""
     try:
-        payload = jwt.decode(token.credentials, "secret_key", algorithms=["HS256"])
+        payload = decode_token(token.credentials)
         return {
             "username": payload["sub"],
             "role": payload["role"]
         }
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
@@ -1,17 +1,23 @@
 # backend/api/routes/mycocore_routes.py
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, HTTPException, WebSocket, status
 from pydantic import BaseModel
 from typing import List, Optional
 import logging
-import asyncio
 from datetime import datetime
+from core.events.event_bus import event_bus
+from core.utils.log_stream import LOGS_TOPIC, LogFilter, live_log_handler
+from core.utils.request_identity import identity_resolver, subject_of
+from core.utils.websocket_manager import manager
 
 router = APIRouter()
 logger = logging.getLogger("mycocore")
 
-# WebSocket connections store
-connections: List[WebSocket] = []
+# Hub topic every stream client is subscribed to
+SYSTEM_TOPIC = "system"
+
+# Roles that may read every user's log records; everyone else only sees their own
+LOG_READER_ROLES = {"owner", "admin"}
 
 # 🧬 Response Schema
 class Snapshot(BaseModel):
@@ -43,72 +49,82 @@ async def get_mycocore_snapshot():
         logger.error(f"MycoCore snapshot error: {e}")
         raise HTTPException(status_code=500, detail="Unable to fetch MycoCore data.")
 
+def stream_claims(websocket: WebSocket, token: str = "") -> Optional[dict]:
+    """Claims of a login token passed as ?token= (browsers can't set headers on sockets) or a Bearer header"""
+    return identity_resolver.claims(websocket, token or None)
+
 # 🔌 WebSocket endpoint for real-time agent logs
 @router.websocket("/mycocore/stream")
-async def agent_log_stream(websocket: WebSocket):
-    try:
-        await websocket.accept()
-        connections.append(websocket)
-        logger.info(f"New WebSocket connection established. Total connections: {len(connections)}")
-        
-        # Send initial system status
-        await websocket.send_json({
-            "type": "connection_established",
-            "message": "Connected to MycoCore stream",
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Keep connection alive with heartbeat
-        while True:
-            try:
-                # Wait for messages but also implement a heartbeat
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=30)
-                if data == "ping":
-                    await websocket.send_json({
-                        "type": "pong",
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-            except asyncio.TimeoutError:
-                # Send heartbeat
-                await websocket.send_json({
-                    "type": "heartbeat",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                
-    except WebSocketDisconnect:
-        logger.info("WebSocket client disconnected")
-        await handle_disconnect(websocket)
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-        await handle_disconnect(websocket)
+async def agent_log_stream(
+    websocket: WebSocket,
+    token: str = "",
+    topics: str = "",
+    last_event_id: str = "",
+    logs: bool = True,
+    agent: str = "",
+    level: str = "",
+    user: str = "",
+    tail: int = 0
+):
+    """
+    Streams system events and agent log records, plus any topics given as
+    ?topics=agent:neuroweave,... Clients can (un)subscribe later with
+    {"action": "subscribe", "topic": "..."}.
 
-async def handle_disconnect(websocket: WebSocket):
-    """Handle WebSocket disconnection cleanup"""
+    Log records come from every logger in the app, so the stream needs a
+    login token (?token= or an Authorization header); without one the socket
+    is closed with 1008. Only verified owner/admin tokens may read other
+    users' records (?user= empty or another name); everyone else gets their
+    own records only, and asking for someone else's closes with 1008.
+
+    Log records are filtered server-side by ?agent=a,b, ?level=WARNING and
+    ?user=; ?tail=N first sends this worker's last N matching records as one
+    batch. With EVENT_BUS=streams, reconnecting clients pass ?last_event_id=
+    to get what they missed first (may overlap the first live events).
+    """
+    claims = stream_claims(websocket, token)
+    subject = subject_of(claims)
+    if not subject:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="❌ Login required")
+        return
+    if identity_resolver.role(claims) not in LOG_READER_ROLES:
+        if user and user != subject:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="❌ Not allowed to read other users' logs")
+            return
+        user = subject
     try:
-        connections.remove(websocket)
-        logger.info(f"Connection removed. Remaining connections: {len(connections)}")
-    except ValueError:
-        pass  # Already removed
-    except Exception as e:
-        logger.error(f"Error during disconnect cleanup: {e}")
+        log_filter = LogFilter.from_params(agent, level, user)
+    except ValueError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+    topics = [SYSTEM_TOPIC, *filter(None, (t.strip() for t in topics.split(",")))]
+    if logs:
+        topics.append(LOGS_TOPIC)
+    initial = [{
+        "type": "connection_established",
+        "message": "Connected to MycoCore stream",
+        "timestamp": datetime.utcnow().isoformat()
+    }]
+    recent = live_log_handler.buffer.tail(tail, log_filter) if logs else []
+    if recent:
+        initial.append({"type": "batch", "events": recent})
+    if last_event_id:
+        missed = []
+        for event in await event_bus.replay(last_event_id, topics):
+            message = event.message()
+            # Replayed log records get the same filter as live ones
+            if event.topic != LOGS_TOPIC or log_filter(message):
+                missed.append(message)
+        if missed:
+            initial.append({"type": "batch", "events": missed})
+    await manager.serve(websocket, topics=topics, initial=initial, selectors={LOGS_TOPIC: log_filter})
 
 # 📡 Broadcast helper for sending events to all connected clients
 async def broadcast_event(event: SystemEvent):
     """
-    Broadcasts an event to all connected WebSocket clients.
-    
+    Broadcasts an event to stream clients on every worker.
+
     Args:
         event (SystemEvent): The event data to broadcast
     """
-    dead_connections = []
-    
-    for connection in connections:
-        try:
-            await connection.send_json(event.dict())
-        except Exception as e:
-            logger.error(f"Failed to broadcast to client: {e}")
-            dead_connections.append(connection)
-            
-    # Cleanup dead connections
-    for dead in dead_connections:
-        await handle_disconnect(dead)
\ No newline at end of file
+    await event_bus.publish(SYSTEM_TOPIC, event.dict())
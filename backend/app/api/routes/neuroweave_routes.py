@@ -1,13 +1,20 @@
 # backend/app/api/routes/neuroweave_routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, WebSocket
 from pydantic import BaseModel
 from typing import Dict
 import logging
+from core.utils.streaming import StreamPromptInput, serve_stream_socket, sse_response
+from shared.agents.prompt_agent import PromptAgent
 
 router = APIRouter()
 logger = logging.getLogger("neuroweave")
 
+agent = PromptAgent(
+    name="Neuroweave",
+    system_message="You are Neuroweave, a general intelligence and reasoning agent. Think step by step and answer clearly."
+)
+
 class PromptInput(BaseModel):
     prompt: str
 
@@ -30,4 +37,21 @@ async def ask_neuroweave(input: PromptInput):
         }
     except Exception as e:
         logger.error(f"Neuroweave processing error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process request")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to process request")
+
+@router.post("/neuroweave/ask/stream", tags=["neuroweave"])
+async def ask_neuroweave_stream(input: StreamPromptInput):
+    """
+    🧠 Neuroweave (streaming) - Server-Sent Events, one `token` event per delta, then `done`
+    """
+    logger.info(f"Streaming request: {input.prompt}")
+    return sse_response(agent.name, agent.stream(input.prompt, max_tokens=input.max_tokens))
+
+@router.websocket("/neuroweave/ask/ws")
+async def ask_neuroweave_ws(websocket: WebSocket):
+    """
+    🧠 Neuroweave (streaming) - WebSocket, send {"prompt": ...} and receive token messages then done
+    """
+    await serve_stream_socket(
+        websocket, agent.name, lambda request: agent.stream(request.prompt, max_tokens=request.max_tokens)
+    )
@@ -1,13 +1,20 @@
 # backend/app/api/routes/rootbloom_routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, WebSocket
 from pydantic import BaseModel
 from typing import Dict
 import logging
+from core.utils.streaming import StreamPromptInput, serve_stream_socket, sse_response
+from shared.agents.prompt_agent import PromptAgent
 
 router = APIRouter()
 logger = logging.getLogger("rootbloom")
 
+agent = PromptAgent(
+    name="RootBloom",
+    system_message="You are RootBloom, a creative content generation agent. Write original, well-structured content."
+)
+
 class PromptInput(BaseModel):
     prompt: str
 
@@ -30,4 +37,21 @@ async def generate_content(input: PromptInput):
         }
     except Exception as e:
         logger.error(f"RootBloom generation error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate content")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate content")
+
+@router.post("/rootbloom/generate/stream", tags=["rootbloom"])
+async def generate_content_stream(input: StreamPromptInput):
+    """
+    🌱 RootBloom (streaming) - Server-Sent Events, one `token` event per delta, then `done`
+    """
+    logger.info(f"Streaming request: {input.prompt}")
+    return sse_response(agent.name, agent.stream(input.prompt, max_tokens=input.max_tokens))
+
+@router.websocket("/rootbloom/generate/ws")
+async def generate_content_ws(websocket: WebSocket):
+    """
+    🌱 RootBloom (streaming) - WebSocket, send {"prompt": ...} and receive token messages then done
+    """
+    await serve_stream_socket(
+        websocket, agent.name, lambda request: agent.stream(request.prompt, max_tokens=request.max_tokens)
+    )
@@ -1,13 +1,20 @@
 # backend/app/api/routes/sporelink_routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, WebSocket
 from pydantic import BaseModel
 from typing import Dict
 import logging
+from core.utils.streaming import StreamPromptInput, serve_stream_socket, sse_response
+from shared.agents.prompt_agent import PromptAgent
 
 router = APIRouter()
 logger = logging.getLogger("sporelink")
 
+agent = PromptAgent(
+    name="SporeLink",
+    system_message="You are SporeLink, a data analysis agent. Analyze the input and report findings concisely."
+)
+
 class PromptInput(BaseModel):
     prompt: str
 
@@ -30,4 +37,21 @@ async def analyze_data(input: PromptInput):
         }
     except Exception as e:
         logger.error(f"SporeLink analysis error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to analyze data")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to analyze data")
+
+@router.post("/sporelink/analyze/stream", tags=["sporelink"])
+async def analyze_data_stream(input: StreamPromptInput):
+    """
+    📊 SporeLink (streaming) - Server-Sent Events, one `token` event per delta, then `done`
+    """
+    logger.info(f"Streaming request: {input.prompt}")
+    return sse_response(agent.name, agent.stream(input.prompt, max_tokens=input.max_tokens))
+
+@router.websocket("/sporelink/analyze/ws")
+async def analyze_data_ws(websocket: WebSocket):
+    """
+    📊 SporeLink (streaming) - WebSocket, send {"prompt": ...} and receive token messages then done
+    """
+    await serve_stream_socket(
+        websocket, agent.name, lambda request: agent.stream(request.prompt, max_tokens=request.max_tokens)
+    )
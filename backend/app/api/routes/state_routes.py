@@ -1,11 +1,13 @@
-```python
 # backend/app/api/routes/state_routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
+from shared.memory.memory_router import MemoryRouter
+from shared.state.session_manager import session
+
 router = APIRouter()
 logger = logging.getLogger("state")
 
@@ -33,16 +35,23 @@ async def get_system_state():
         raise HTTPException(status_code=500, detail="Failed to fetch system state")
 
 @router.get("/state/memory", tags=["state"])
-async def get_memory_state():
+async def get_memory_state(
+    prefix: Optional[str] = Query(None, description="Only keys starting with this prefix"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+):
     """
     Get current memory state and runtime flags.
+    Memory is paged by key: pass `next_cursor` back as `cursor` for the next page.
     """
     try:
+        memory = MemoryRouter(mode="sql_async")
+        page = await memory.scan_page(prefix=prefix, after=cursor, limit=limit)
         return {
-            "flags": {},
-            "memory": {}
+            "flags": session.get_context(),
+            "memory": dict(page),
+            "next_cursor": page[-1][0] if len(page) == limit else None
         }
     except Exception as e:
         logger.error(f"Failed to get memory state: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch memory state")
-```
\ No newline at end of file
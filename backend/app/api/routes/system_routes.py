@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
 import logging
+from core.cache.redis_cache import cache
 
 router = APIRouter()
 logger = logging.getLogger("system")
@@ -34,4 +35,13 @@ async def set_system_mode(mode: str):
         return {"status": "ok", "mode": mode}
     except Exception as e:
         logger.error(f"Failed to set system mode: {e}")
-        raise HTTPException(status_code=500, detail="Failed to set system mode")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to set system mode")
+
+@router.get("/system/cache")
+async def get_cache_stats(top: int = 20):
+    """Cache occupancy and the hottest keys seen by this worker"""
+    try:
+        return cache.stats(top=top)
+    except Exception as e:
+        logger.error(f"Failed to get cache stats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get cache stats")
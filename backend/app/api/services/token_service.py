@@ -1,15 +1,21 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-import os
+from shared.config.env_loader import get_env_variable
 
-SECRET_KEY = os.environ.get("JWT_SECRET")
+# The one signing secret: tokens issued by /api/auth/login are verified with it
+# by get_current_user and by the rate limiter's IdentityResolver
+SECRET_KEY = get_env_variable("JWT_SECRET")
 ALGORITHM = "HS256"
+# Set (true) only by a login that checked the credentials against a user store.
+# Roles and rate-limit tiers are only taken from tokens carrying it; the mock
+# /api/auth/login checks nothing, so its tokens never do.
+VERIFIED_CLAIM = "verified"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-def create_access_token(data: dict):
+def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
@@ -19,8 +25,12 @@ def create_refresh_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def decode_token(token: str, secret: str = None):
+    """Verified claims; raises ExpiredSignatureError / JWTError"""
+    return jwt.decode(token, secret or SECRET_KEY, algorithms=[ALGORITHM])
+
 def verify_token(token: str):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return decode_token(token)
     except JWTError:
         return None
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+cache_bench.py ⏱️
+-----------------
+RedisCache benchmarks: event-loop stall and value codecs.
+
+Run from backend/app against a real Redis (e.g. `docker run -p 6379:6379 redis:7`):
+    python -m benchmarks.cache_bench [--requests 200] [--gets 20]
+or, without Redis, only the serializer benchmark:
+    python -m benchmarks.cache_bench --codecs-only
+
+The stall benchmark simulates concurrent requests that each do a handful of
+cache reads, once with the blocking get() and once with the redis.asyncio
+aget(), while a probe task measures how late the event loop wakes it up. Lag on the probe is time every
+other coroutine (other requests, websockets, heartbeats) was stalled.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+from core.cache.redis_cache import RedisCache
+from core.cache.serializers import CacheCodec
+
+
+async def _probe(samples, stop, interval=0.001):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def _run(cache, mode, requests, gets):
+    async def request(n):
+        for i in range(gets):
+            key = f"bench:cache:{(n + i) % 16}"
+            if mode == "sync":
+                cache.get(key)
+                await asyncio.sleep(0)
+            else:
+                await cache.aget(key)
+
+    samples, stop = [], asyncio.Event()
+    probe = asyncio.create_task(_probe(samples, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(request(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    samples.sort()
+    return {
+        "elapsed_ms": elapsed * 1000,
+        "gets_per_s": requests * gets / elapsed,
+        "max_stall_ms": samples[-1] * 1000 if samples else 0.0,
+        "p99_stall_ms": samples[int(len(samples) * 0.99) - 1] * 1000 if samples else 0.0,
+        "mean_stall_ms": statistics.mean(samples) * 1000 if samples else 0.0,
+    }
+
+
+async def bench_stall(requests=200, gets=20):
+    cache = RedisCache()
+    for i in range(16):
+        await cache.aset(f"bench:cache:{i}", {"agent_id": "cortexa", "response": "x" * 512}, expire=300)
+
+    results = {mode: await _run(cache, mode, requests, gets) for mode in ("sync", "async")}
+
+    print(f"\n🧊 event-loop stall ({requests} concurrent requests x {gets} gets)")
+    for mode, r in results.items():
+        print(
+            f"  {mode:<6} {r['elapsed_ms']:8.1f} ms total  {r['gets_per_s']:9.0f} gets/s  "
+            f"stall max {r['max_stall_ms']:7.2f} ms  p99 {r['p99_stall_ms']:6.2f} ms  mean {r['mean_stall_ms']:6.3f} ms"
+        )
+    await cache.aclose()
+    return results
+
+
+def _agent_result(words):
+    """Shaped like an AgentService.process_request result."""
+    return {
+        "agent_id": "cortexa",
+        "prompt": "Summarize the mycelial network status for today",
+        "response": " ".join(f"hypha{i % 97}" for i in range(words)),
+        "timestamp": datetime.utcnow().isoformat(),
+        "processing_time": 1.234,
+    }
+
+
+def bench_codecs(rounds=5000):
+    """Serialize/deserialize throughput and frame size per serializer, with and without compression."""
+    payloads = {"small": _agent_result(40), "large": _agent_result(2000)}
+    print(f"\n🧬 cache codecs ({rounds} rounds)")
+    results = {}
+    for serializer in ("json", "msgpack", "pickle"):
+        for compression in ("none", "zlib"):
+            codec = CacheCodec(serializer=serializer, compression=compression, threshold=1024)
+            for size, value in payloads.items():
+                frame = codec.encode(value)
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    codec.encode(value)
+                dumps_us = (time.perf_counter() - start) / rounds * 1e6
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    codec.decode(frame)
+                loads_us = (time.perf_counter() - start) / rounds * 1e6
+                results[(serializer, compression, size)] = (dumps_us, loads_us, len(frame))
+                print(
+                    f"  {serializer:<8} {compression:<5} {size:<6} "
+                    f"encode {dumps_us:7.1f} µs  decode {loads_us:7.1f} µs  {len(frame):7d} bytes"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyphaeOS Redis cache benchmarks")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--gets", type=int, default=20)
+    parser.add_argument("--codecs-only", action="store_true")
+    args = parser.parse_args()
+    bench_codecs()
+    if not args.codecs_only:
+        asyncio.run(bench_stall(args.requests, args.gets))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+memory_bench.py ⏱️
+------------------
+Micro-benchmarks for the memory engines.
+
+Run from backend/app:
+    python -m benchmarks.memory_bench [--keys 12] [--rounds 50]
+
+Uses a throwaway SQLite file unless MEMORY_DB_URL is already set.
+Set BENCH_PG_URL (e.g. a local `docker run postgres:15`) to also run the
+concurrent-writer benchmark against a Postgres stand-in.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault(
+    "MEMORY_DB_URL", f"sqlite:///{tempfile.mkdtemp(prefix='hyphae_bench_')}/memory.db"
+)
+
+from cryptography.fernet import Fernet
+from sqlalchemy.exc import SQLAlchemyError
+
+from shared.memory import sql_memory_engine
+from shared.memory.sql_memory_engine import MemoryRecord, SQLMemoryEngine, init_engine
+from shared.memory.cached_memory_engine import MemoryCache
+from shared.memory.encrypted_memory_engine import EncryptedMemoryEngine
+from shared.memory.in_memory_engine import InMemoryEngine
+from shared.memory.file_memory_engine import FileMemoryEngine
+
+
+def _timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def bench_batch(keys=12, rounds=50):
+    """Compares N single save/fetch calls against one save_many/fetch_many."""
+    init_engine(os.environ["MEMORY_DB_URL"])
+    engine = SQLMemoryEngine()
+    user = "bench"
+    mapping = {f"ctx_{i}": {"step": i, "payload": "x" * 64} for i in range(keys)}
+
+    def single_save():
+        for key, value in mapping.items():
+            engine.save(user, key, value)
+
+    def single_fetch():
+        for key in mapping:
+            engine.fetch(user, key)
+
+    results = {
+        "single save": _timed(single_save, rounds),
+        "save_many": _timed(lambda: engine.save_many(user, mapping), rounds),
+        "single fetch": _timed(single_fetch, rounds),
+        "fetch_many": _timed(lambda: engine.fetch_many(user, list(mapping)), rounds),
+    }
+    engine.clear(user)
+
+    print(f"\n📦 batch vs single ({keys} keys, {rounds} rounds, {os.environ['MEMORY_DB_URL']})")
+    for name, ms in results.items():
+        print(f"  {name:<14} {ms:8.2f} ms/op")
+    return results
+
+
+def _legacy_save(user, key, value):
+    """The pre-upsert read-then-write save, kept for comparison."""
+    with sql_memory_engine._session() as db:
+        rec = db.query(MemoryRecord).filter_by(user=user, key=key).first()
+        if rec:
+            rec.value = value
+        else:
+            db.add(MemoryRecord(user=user, key=key, value=value))
+        db.commit()
+
+
+def bench_concurrent_writers(url, threads=8, writes=200):
+    """
+    Hammers a small set of shared keys from several threads and reports
+    throughput and failed writes for read-then-write vs native upsert.
+    """
+    init_engine(url)
+    engine = SQLMemoryEngine()
+    keys = [f"shared_{i}" for i in range(4)]
+
+    def run(save, tag):
+        engine.clear(tag)
+        failures = 0
+
+        def worker(n):
+            nonlocal failures
+            for i in range(writes):
+                try:
+                    save(tag, keys[(n + i) % len(keys)], f"{n}:{i}")
+                except SQLAlchemyError:
+                    failures += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+        engine.clear(tag)
+        return threads * writes / elapsed, failures
+
+    results = {
+        "read-then-write": run(_legacy_save, "bench_legacy"),
+        "upsert": run(engine.save, "bench_upsert"),
+    }
+
+    print(f"\n✍️  concurrent writers ({threads} threads x {writes} writes, {url})")
+    for name, (ops, failures) in results.items():
+        print(f"  {name:<16} {ops:9.0f} writes/s  {failures:5d} failed")
+    return results
+
+
+class _DictEngine:
+    """Minimal in-process backend so the decrypt benchmark measures only crypto + parsing."""
+
+    def __init__(self):
+        self.data = {}
+
+    def save(self, user, key, value, ttl=None):
+        self.data[(user, key)] = value
+
+    def fetch(self, user, key):
+        return self.data.get((user, key))
+
+
+def bench_decrypt_cache(rounds=2000):
+    """Fetch latency of EncryptedMemoryEngine with and without the decrypted-value cache."""
+    cipher = Fernet(Fernet.generate_key())
+    value = {"last_plugin_chain": [{"plugin": "calculator", "output": i} for i in range(20)]}
+    backend = _DictEngine()
+
+    results = {}
+    for name, cache in (("no cache", None), ("digest cache", MemoryCache(max_entries=512, ttl=0, name="bench"))):
+        engine = EncryptedMemoryEngine(backend, cipher=cipher, decrypt_cache=cache)
+        engine.save("bench", "hot", value)
+        results[name] = _timed(lambda: engine.fetch("bench", "hot"), rounds) * 1000
+
+    print(f"\n🔐 encrypted fetch ({rounds} rounds, in-process backend)")
+    for name, us in results.items():
+        print(f"  {name:<14} {us:8.1f} µs/op")
+    return results
+
+
+def bench_engines(rounds=2000, threads=8):
+    """Single-key save/fetch latency and threaded fetch throughput across SQL, memory and file engines."""
+    init_engine(os.environ["MEMORY_DB_URL"])
+    log_path = os.path.join(tempfile.mkdtemp(prefix="hyphae_bench_"), "memory.log")
+    engines = {
+        "sql": SQLMemoryEngine(),
+        "memory": InMemoryEngine(),
+        "file": FileMemoryEngine(log_path),
+    }
+    value = {"step": 1, "payload": "x" * 256}
+
+    results = {}
+    for name, engine in engines.items():
+        engine.save("bench", "hot", value)
+        save_us = _timed(lambda: engine.save("bench", "hot", value), rounds // 10) * 1000
+        fetch_us = _timed(lambda: engine.fetch("bench", "hot"), rounds) * 1000
+
+        def reader(n):
+            for i in range(rounds // threads):
+                engine.fetch(f"bench{n}", "hot")
+
+        for n in range(threads):
+            engine.save(f"bench{n}", "hot", value)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(reader, range(threads)))
+        ops = rounds / (time.perf_counter() - start)
+        results[name] = (save_us, fetch_us, ops)
+    engines["file"].close()
+
+    print(f"\n🗄️  engines ({rounds} fetches, {threads} reader threads)")
+    for name, (save_us, fetch_us, ops) in results.items():
+        print(f"  {name:<8} save {save_us:9.1f} µs/op  fetch {fetch_us:8.1f} µs/op  {ops:9.0f} fetches/s threaded")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyphaeOS memory engine benchmarks")
+    parser.add_argument("--keys", type=int, default=12)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+    bench_batch(args.keys, args.rounds)
+    bench_decrypt_cache()
+    bench_engines(threads=args.threads)
+    bench_concurrent_writers(os.environ["MEMORY_DB_URL"], args.threads, args.writes)
+    pg_url = os.environ.get("BENCH_PG_URL")
+    if pg_url:
+        bench_concurrent_writers(pg_url, args.threads, args.writes)
+    else:
+        print("\n(set BENCH_PG_URL to run the concurrent-writer benchmark on Postgres)")
+
+
+if __name__ == "__main__":
+    main()
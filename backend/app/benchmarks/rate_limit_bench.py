@@ -0,0 +1,99 @@
+"""
+rate_limit_bench.py ⏱️
+----------------------
+Per-request overhead of the rate-limit middleware: exact (one Redis call per
+request) vs leased (local token bucket, one Redis call per chunk).
+
+Run from backend/app against a real Redis (e.g. `docker run -p 6379:6379 redis:7`):
+    python -m benchmarks.rate_limit_bench [--requests 5000] [--clients 50]
+
+--fakeredis runs against an in-process fake instead; that hides network
+latency, so it only shows the limiter's own CPU cost. Calls slower than
+RATE_LIMIT_DEADLINE_MS fail open and are timed as such.
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.utils import rate_limiter as rl
+
+
+def _request(client, path="/api/mycocore/snapshot", method="GET"):
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [],
+        "query_string": b"",
+        "client": (client, 40000),
+        "server": ("bench", 80),
+        "scheme": "http",
+    })
+
+
+async def _call_next(request):
+    return Response("ok")
+
+
+async def _run(requests, clients):
+    samples = []
+    for i in range(requests):
+        request = _request(f"10.0.{i % clients // 256}.{i % clients % 256}")
+        start = time.perf_counter()
+        await rl.rate_limit_middleware(request, _call_next)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1e6
+    return {"p50": pick(0.50), "p99": pick(0.99), "p999": pick(0.999), "max": samples[-1] * 1e6}
+
+
+async def bench_overhead(requests=5000, clients=50, client=None, async_client=None):
+    limiter = rl.RateLimiter(client=client, async_client=async_client)
+    # High enough that nothing is denied; we measure the allow path
+    limiter.default_limits["GET"] = requests * 10
+    results = {}
+    for name, lease_size in (("exact", 1), ("leased", 10)):
+        limiter.redis.flushdb()
+        rl.local_rate_limiter = rl.LeasedRateLimiter(limiter, lease_size=lease_size, lease_ttl_ms=60000)
+        calls = 0
+        ahit = limiter.ahit
+
+        async def counted(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            return await ahit(*args, **kwargs)
+
+        limiter.ahit = counted
+        results[name] = {**await _run(requests, clients), "redis_calls": calls}
+        limiter.ahit = ahit
+    await limiter.aclose()
+
+    print(f"\n🚦 rate-limit middleware overhead ({requests} requests, {clients} clients)")
+    for name, r in results.items():
+        print(
+            f"  {name:<7} p50 {r['p50']:7.1f} µs  p99 {r['p99']:7.1f} µs  "
+            f"p99.9 {r['p999']:7.1f} µs  max {r['max']:8.1f} µs  {r['redis_calls']:6d} Redis calls"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyphaeOS rate limiter benchmarks")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--fakeredis", action="store_true")
+    args = parser.parse_args()
+    client = async_client = None
+    if args.fakeredis:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        client = fakeredis.FakeRedis(server=server)
+        async_client = fakeredis.aioredis.FakeRedis(server=server)
+    asyncio.run(bench_overhead(args.requests, args.clients, client, async_client))
+
+
+if __name__ == "__main__":
+    main()
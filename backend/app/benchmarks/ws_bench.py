@@ -0,0 +1,128 @@
+"""
+ws_bench.py ⏱️
+--------------
+Broadcast latency to many WebSocket clients: the old sequential send_json
+loop vs ConnectionManager's serialize-once broadcast with per-client queues.
+
+Run from backend/app:
+    python -m benchmarks.ws_bench [--clients 5000] [--slow 50] [--slow-delay-ms 20]
+
+Clients are simulated in-process: a fast client's send completes without
+blocking (the frame fits the transport buffer), a slow one takes
+--slow-delay-ms per frame. Latency is measured per fast client from the
+broadcast call to its frame being sent; "blocked" is how long the broadcaster
+itself was held up.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from core.utils.websocket_manager import ConnectionManager
+
+MESSAGE = {
+    "type": "agent_log",
+    "agent": "neuroweave",
+    "level": "INFO",
+    "message": "Processed prompt in 412 ms",
+    "timestamp": "2024-01-01T00:00:00",
+}
+
+
+class SimSocket:
+    def __init__(self, delay, run):
+        self.delay = delay
+        self.run = run
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, frame):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        elif frame.startswith('{"type":"agent_log"'):
+            self.run.delivered(time.perf_counter())
+
+
+class Run:
+    def __init__(self, expected):
+        self.expected = expected
+        self.samples = []
+        self.started = 0.0
+        self.done = asyncio.Event()
+
+    def delivered(self, at):
+        self.samples.append(at - self.started)
+        if len(self.samples) == self.expected:
+            self.done.set()
+
+
+def _sockets(clients, slow, delay, run):
+    # Slow clients spread evenly across the connection order
+    step = clients // slow if slow else clients + 1
+    return [SimSocket(delay if i % step == 0 and i // step < slow else 0, run) for i in range(clients)]
+
+
+async def _sequential(sockets):
+    # The pre-queue ConnectionManager.broadcast
+    for ws in sockets:
+        await ws.send_json(MESSAGE)
+
+
+async def bench_broadcast(clients=5000, slow=50, slow_delay_ms=20, messages=5):
+    results = {}
+    for name in ("sequential", "queued"):
+        samples, blocked = [], []
+        manager = ConnectionManager(queue_size=256, policy="drop_oldest", heartbeat_interval=3600)
+        for _ in range(messages):
+            run = Run(clients - slow)
+            sockets = _sockets(clients, slow, slow_delay_ms / 1000, run)
+            if name == "queued":
+                for i, ws in enumerate(sockets):
+                    await manager.connect(ws, f"client-{i}")
+                # Let writers flush the initial heartbeats and park on their queues
+                await asyncio.sleep(0.2)
+            run.started = time.perf_counter()
+            if name == "queued":
+                await manager.broadcast(MESSAGE)
+            else:
+                await _sequential(sockets)
+            blocked.append(time.perf_counter() - run.started)
+            await run.done.wait()
+            samples.extend(run.samples)
+            for client_id in list(manager.active_connections):
+                await manager.disconnect(client_id)
+        samples.sort()
+        pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1e3
+        results[name] = {
+            "p50": pick(0.50), "p99": pick(0.99), "max": samples[-1] * 1e3,
+            "blocked": max(blocked) * 1e3,
+        }
+
+    print(f"\n📡 broadcast to {clients} clients ({slow} slow at {slow_delay_ms} ms/frame, {messages} messages)")
+    for name, r in results.items():
+        print(
+            f"  {name:<10} fast-client latency p50 {r['p50']:8.2f} ms  p99 {r['p99']:8.2f} ms  "
+            f"max {r['max']:8.2f} ms  broadcaster blocked {r['blocked']:8.2f} ms"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyphaeOS WebSocket broadcast benchmark")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50)
+    parser.add_argument("--slow-delay-ms", type=float, default=20)
+    parser.add_argument("--messages", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(bench_broadcast(args.clients, args.slow, args.slow_delay_ms, args.messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,164 @@
 from functools import wraps
 from .redis_cache import cache
-import hashlib
-import json
+from .keys import RECEIVER_PARAMS, UnkeyableArgument, namespace_of, make_key
+import asyncio
+import inspect
+import logging
+import math
+import random
+import time
 
-def cached(expire: int = 3600):
-    """Decorator to cache function results"""
+logger = logging.getLogger(__name__)
+
+# Misses currently being computed in this process: cache key -> asyncio.Task
+_inflight = {}
+
+# cached_batch marker for an item with no cached entry (None is a valid result)
+_MISS = object()
+
+def cached(expire: int = 3600, early_refresh: bool = False, beta: float = 1.0, version: str = "1", namespace: str = None):
+    """
+    Decorator to cache function results in the two-tier cache (L1 + Redis).
+
+    Concurrent misses for the same key are coalesced: one call computes, the
+    rest await its result. With early_refresh, a hit may trigger a background
+    recompute shortly before expiry (probabilistic early expiration, weighted
+    by how long the last computation took) so hot keys never expire under load;
+    callers keep getting the current value meanwhile.
+
+    Args:
+        expire (int): Seconds a result stays cached
+        early_refresh (bool): Enable stale-while-revalidate style early refresh
+        beta (float): >1 refreshes earlier, <1 later
+        version (str): Bump when the function's result format changes
+        namespace (str): Override the default module.qualname@version namespace
+
+    The wrapper exposes `.namespace`, so all of its entries can be dropped with
+    `cache.invalidate_namespace(func.namespace)`.
+
+    On methods, `self`/`cls` is not part of the key (instances share entries).
+    Calls with any other argument that has no stable key run uncached.
+    """
     def decorator(func):
+        ns = namespace or namespace_of(func, version)
+        skip = 1 if _has_receiver(func) else 0
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            key_parts = [func.__name__]
-            key_parts.extend([str(arg) for arg in args])
-            key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
-            key = hashlib.md5(json.dumps(key_parts).encode()).hexdigest()
+            # Stable key from namespace, its generation and the normalized arguments
+            try:
+                key = make_key(ns, await cache.ageneration(ns), *args[skip:], **kwargs)
+            except UnkeyableArgument as e:
+                logger.warning(f"Not caching {ns}: {e}")
+                return await func(*args, **kwargs)
+
+            async def compute():
+                start = time.monotonic()
+                result = await func(*args, **kwargs)
+                # Envelope: value, absolute expiry and compute time (for early refresh)
+                entry = {"v": result, "x": time.time() + expire, "d": time.monotonic() - start}
+                await cache.aset(key, entry, expire)
+                return entry
 
             # Try to get from cache
-            result = cache.get(key)
-            if result is not None:
-                return result
-
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            cache.set(key, result, expire)
-            return result
+            entry = await cache.aget(key)
+            now = time.time()
+            if entry is not None and entry["x"] > now:
+                if early_refresh and _should_refresh(entry, now, beta):
+                    _single_flight(key, compute)
+                return entry["v"]
+
+            # Execute function (once per key across concurrent callers) and cache result
+            entry = await asyncio.shield(_single_flight(key, compute))
+            return entry["v"]
+
+        wrapper.namespace = ns
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+def cached_batch(expire: int = 3600, param: str = "items", version: str = "1", namespace: str = None):
+    """
+    Decorator to cache per-item results of a function that takes a list of inputs
+    and returns a list of results in the same order.
+
+    Every item gets its own cache entry (keyed by the item plus the other
+    arguments). Hits are fetched with one get_many; only the missing items are
+    passed to the function, and their results are written back with one set_many.
+    Results are stored in a {"v": ...} envelope, so a cached None is a hit.
+
+    Args:
+        expire (int): Seconds a result stays cached
+        param (str): Name of the list parameter
+        version (str): Bump when the function's result format changes
+        namespace (str): Override the default module.qualname@version namespace
+
+    Raises:
+        ValueError: If the function returns a different number of results than
+            the items it was given
+    """
+    def decorator(func):
+        ns = namespace or namespace_of(func, version)
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            items = list(bound.arguments[param])
+            context = {
+                name: value for name, value in bound.arguments.items()
+                if name != param and name not in RECEIVER_PARAMS
+            }
+            generation = await cache.ageneration(ns)
+            try:
+                keys = [make_key(ns, generation, item, **context) for item in items]
+            except UnkeyableArgument as e:
+                logger.warning(f"Not caching {ns}: {e}")
+                return await func(*args, **kwargs)
+
+            found = {key: _unwrap(entry) for key, entry in (await cache.aget_many(keys)).items()}
+            missing = [i for i, key in enumerate(keys) if found[key] is _MISS]
+            if missing:
+                bound.arguments[param] = [items[i] for i in missing]
+                computed = list(await func(*bound.args, **bound.kwargs))
+                if len(computed) != len(missing):
+                    raise ValueError(
+                        f"❌ {ns} returned {len(computed)} results for {len(missing)} items."
+                    )
+                fresh = {keys[i]: result for i, result in zip(missing, computed)}
+                await cache.aset_many({key: {"v": result} for key, result in fresh.items()}, expire)
+                found.update(fresh)
+            return [found[key] for key in keys]
+
+        wrapper.namespace = ns
+        return wrapper
+    return decorator
+
+def _unwrap(entry):
+    # Entries written before the envelope (bare values) count as misses
+    if isinstance(entry, dict) and entry.keys() == {"v"}:
+        return entry["v"]
+    return _MISS
+
+def _has_receiver(func):
+    params = list(inspect.signature(func).parameters)
+    return bool(params) and params[0] in RECEIVER_PARAMS
+
+def _should_refresh(entry, now, beta):
+    # XFetch: refresh with probability rising as expiry nears and with compute cost
+    return now - entry["d"] * beta * math.log(1.0 - random.random()) >= entry["x"]
+
+def _single_flight(key, compute):
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _finish(key, done))
+    return task
+
+def _finish(key, task):
+    _inflight.pop(key, None)
+    # Marks the exception retrieved even when only a background refresh was running;
+    # awaiting callers still get it raised
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Cache fill failed for {key}: {task.exception()}")
@@ -0,0 +1,77 @@
+import hashlib
+import random
+import threading
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator: depth rows of width counters. Estimates
+    never undercount; overcounting is bounded by ~(total / width) with
+    probability 1 - 0.5^depth.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key):
+        # One blake2b call, split into `depth` 8-byte hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[i * 8:(i + 1) * 8], "little") % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Counts key and returns its new estimate."""
+        estimate = None
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+class HotKeyTracker:
+    """
+    Samples cache hits into a CountMinSketch and keeps the current top
+    candidates, so /api/system/cache can report the hottest keys in O(1)
+    memory. Counts are scaled back up by the sample rate.
+    """
+
+    def __init__(self, sample_rate=0.1, top_n=20, width=2048, depth=4):
+        """
+        Args:
+            sample_rate (float): Share of hits recorded (1.0 records all)
+            top_n (int): Keys to keep as top candidates
+        """
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self._sketch = CountMinSketch(width, depth)
+        self._top = {}      # key -> estimate, at most top_n entries
+        self._lock = threading.Lock()
+
+    def record(self, key):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            estimate = self._sketch.add(key)
+            if key in self._top or len(self._top) < self.top_n:
+                self._top[key] = estimate
+                return
+            coldest = min(self._top, key=self._top.get)
+            if estimate > self._top[coldest]:
+                del self._top[coldest]
+                self._top[key] = estimate
+
+    def top(self, n=None):
+        """
+        Returns:
+            list: (key, estimated hits) pairs, hottest first
+        """
+        with self._lock:
+            ranked = sorted(self._top.items(), key=lambda item: item[1], reverse=True)
+        return [(key, round(count / self.sample_rate)) for key, count in ranked[:n or self.top_n]]
+
+    def reset(self):
+        with self._lock:
+            self._sketch = CountMinSketch(self._sketch.width, self._sketch.depth)
+            self._top = {}
@@ -0,0 +1,130 @@
+import dataclasses
+import enum
+import hashlib
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import PurePath
+from uuid import UUID
+
+# Cache keys must be identical in every worker and across restarts, so they are
+# derived from a blake2b digest of a canonical form of the arguments, never
+# from hash() (randomized per process) or default object reprs (contain ids).
+
+KEY_PREFIX = "cache"
+DIGEST_SIZE = 16
+
+# Parameter names of the receiver, which the decorators leave out of keys
+RECEIVER_PARAMS = ("self", "cls")
+
+class UnkeyableArgument(TypeError):
+    """An argument has no stable canonical form (e.g. an object with only object.__repr__)."""
+
+def namespace_of(func, version="1"):
+    """
+    Returns the cache namespace for a function: module + qualname + version tag.
+    Bump the version when the function's output format changes.
+    """
+    return f"{func.__module__}.{func.__qualname__}@{version}"
+
+# Single-key dicts normalize() tags non-JSON values with. User dicts whose
+# only key is one of these are wrapped in ESCAPE, so they can't collide.
+ESCAPE = "__escaped__"
+TAGS = frozenset({
+    ESCAPE, "__dict__", "__repr__", "__bytes__", "__enum__", "__datetime__",
+    "__date__", "__time__", "__decimal__", "__uuid__", "__path__",
+})
+
+def normalize(value):
+    """
+    Converts a value to a canonical JSON-serializable form.
+
+    dicts are key-sorted, sets sorted, tuples become lists, pydantic models and
+    dataclasses are dumped to dicts. Other typed values are tagged so they never
+    equal a plain str or number: UUID(x) -> {"__uuid__": x}, datetimes, dates,
+    times, Decimals, paths, enums and bytes likewise. Dicts with non-str keys
+    become {"__dict__": sorted [key, value] pairs}, so {1: x} and {"1": x} stay
+    distinct; other objects with a custom __repr__ are tagged with their type.
+    A user dict shaped like a tag is wrapped as {"__escaped__": ...}.
+
+    Raises:
+        UnkeyableArgument: For objects with only object's default __repr__,
+            whose state can't be told apart (the decorators skip `self`/`cls`)
+    """
+    if isinstance(value, enum.Enum):
+        return {"__enum__": [_type_name(value), normalize(value.value)]}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            normalized = {k: normalize(v) for k, v in sorted(value.items())}
+            if len(normalized) == 1 and next(iter(normalized)) in TAGS:
+                return {ESCAPE: normalized}
+            return normalized
+        pairs = [[normalize(k), normalize(v)] for k, v in value.items()]
+        return {"__dict__": sorted(pairs, key=lambda pair: json.dumps(pair, sort_keys=True))}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((normalize(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, bytes):
+        return {"__bytes__": value.hex()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, time):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, UUID):
+        return {"__uuid__": str(value)}
+    if isinstance(value, PurePath):
+        return {"__path__": str(value)}
+    if hasattr(value, "model_dump"):
+        return normalize(value.model_dump())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return normalize(dataclasses.asdict(value))
+    type_name = _type_name(value)
+    if type(value).__repr__ is object.__repr__:
+        raise UnkeyableArgument(f"❌ Can't derive a cache key from a {type_name} instance")
+    return {"__repr__": [type_name, repr(value)]}
+
+def _type_name(value):
+    return f"{type(value).__module__}.{type(value).__qualname__}"
+
+def digest_args(*args, **kwargs):
+    """
+    Returns a stable hex digest of positional and keyword arguments.
+    """
+    canonical = json.dumps([normalize(args), normalize(kwargs)], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+def make_key(namespace, generation, *args, **kwargs):
+    """
+    Builds a cache key: cache:<namespace>:g<generation>:<digest>.
+
+    Args:
+        namespace (str): Usually namespace_of(func, version)
+        generation (int): Current namespace generation (RedisCache.generation)
+
+    Returns:
+        str: Cache key
+    """
+    return f"{KEY_PREFIX}:{namespace}:g{generation}:{digest_args(*args, **kwargs)}"
+
+def namespace_from_key(key):
+    """
+    Returns the namespace a key belongs to, for metrics: the namespace of
+    make_key() keys, "generation" for generation counters, otherwise the part
+    before the first ":" (e.g. "system" for "system:metrics").
+    """
+    if key.startswith(f"{KEY_PREFIX}:gen:"):
+        return "generation"
+    if key.startswith(f"{KEY_PREFIX}:"):
+        return key[len(KEY_PREFIX) + 1:].rsplit(":", 2)[0]
+    return key.split(":", 1)[0]
+
+def generation_key(namespace):
+    """Redis key holding the generation counter of a namespace."""
+    return f"{KEY_PREFIX}:gen:{namespace}"
@@ -1,42 +1,386 @@
 import redis
-import json
-from typing import Any, Optional
-from shared.config.env_loader import get_env_variable
+import redis.asyncio as aioredis
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional, Union
+from shared.config.env_loader import get_env_variable, get_int_env
+from shared.memory.cached_memory_engine import MemoryCache, _MISSING
+from core.cache.hot_keys import HotKeyTracker
+from core.cache.keys import generation_key, namespace_from_key
+from core.cache.serializers import codec_from_env
+from core.monitoring.metrics import CACHE_HITS, CACHE_MISSES, CACHE_ERRORS, CACHE_LATENCY, CACHE_PAYLOAD_SIZE
+
+logger = logging.getLogger(__name__)
+
+# MemoryCache is keyed by (user, key); the L1 tier keeps everything under one user slot
+L1_SLOT = "redis"
+
+def redis_pool_options():
+    """
+    Connection settings shared by the sync and async pools:
+
+    - REDIS_HOST / REDIS_PORT / REDIS_DB
+    - REDIS_MAX_CONNECTIONS: pool size per process (50)
+    - REDIS_POOL_TIMEOUT_MS: wait for a free connection before failing (1000)
+    - REDIS_SOCKET_TIMEOUT_MS / REDIS_CONNECT_TIMEOUT_MS: per-command and connect deadlines (500 / 1000)
+    - REDIS_HEALTH_CHECK_INTERVAL: seconds idle before a connection is PINGed on checkout (30)
+    """
+    return {
+        "host": get_env_variable("REDIS_HOST", "localhost"),
+        "port": get_int_env("REDIS_PORT", 6379),
+        "db": get_int_env("REDIS_DB", 0),
+        "max_connections": get_int_env("REDIS_MAX_CONNECTIONS", 50),
+        "timeout": get_int_env("REDIS_POOL_TIMEOUT_MS", 1000) / 1000,
+        "socket_timeout": get_int_env("REDIS_SOCKET_TIMEOUT_MS", 500) / 1000,
+        "socket_connect_timeout": get_int_env("REDIS_CONNECT_TIMEOUT_MS", 1000) / 1000,
+        "health_check_interval": get_int_env("REDIS_HEALTH_CHECK_INTERVAL", 30),
+    }
+
+def local_cache_from_env():
+    """
+    Builds the in-process L1 tier from CACHE_L1_SIZE (2048 entries, 0 disables)
+    and CACHE_L1_TTL (30 seconds). The TTL bounds how long another worker's
+    write or delete can go unseen by this process.
+    """
+    size = get_int_env("CACHE_L1_SIZE", 2048)
+    if size <= 0:
+        return None
+    return MemoryCache(max_entries=size, ttl=get_int_env("CACHE_L1_TTL", 30), name="redis_l1")
+
+def hot_keys_from_env():
+    """Hit sampler for /api/system/cache: CACHE_HOT_KEYS_SAMPLE_RATE (0.1 = 1 in 10 hits)."""
+    return HotKeyTracker(sample_rate=float(get_env_variable("CACHE_HOT_KEYS_SAMPLE_RATE", "0.1")))
+
+@contextmanager
+def _observe(operation):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CACHE_LATENCY.labels(operation=operation).observe(time.perf_counter() - start)
 
 class RedisCache:
-    def __init__(self):
-        self.redis = redis.Redis(
-            host=get_env_variable("REDIS_HOST", "localhost"),
-            port=int(get_env_variable("REDIS_PORT", "6379")),
-            db=0,
-            decode_responses=True
-        )
+    """
+    Two-tier cache: an in-process LRU/TTL tier (L1) in front of Redis (L2).
+    Offers a blocking API (get/set/delete) and a non-blocking one
+    (aget/aset/adelete) on redis.asyncio. Async code must use the a* methods,
+    otherwise every L1 miss stalls the event loop for a Redis round-trip.
+    Values are stored as binary frames (see core/cache/serializers.py).
+
+    Cache failures never propagate: they are logged, counted in
+    cache_errors_total and treated as a miss.
+    """
+
+    def __init__(self, client=None, async_client=None, l1=_MISSING, codec=None, hot_keys=None):
+        """
+        Args:
+            client (redis.Redis): Sync client; defaults to one on a sized BlockingConnectionPool
+            async_client (redis.asyncio.Redis): Async client; defaults to one on its own pool
+            l1 (MemoryCache|None): In-process tier; defaults to local_cache_from_env(), None disables
+            codec (CacheCodec): Serializer + compression; defaults to codec_from_env()
+            hot_keys (HotKeyTracker): Hit sampler; defaults to hot_keys_from_env()
+        """
+        options = redis_pool_options()
+        self.redis = client or redis.Redis(connection_pool=redis.BlockingConnectionPool(**options))
+        self.aredis = async_client or aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**options))
+        self.l1 = local_cache_from_env() if l1 is _MISSING else l1
+        # How long L1 may keep a namespace generation (CACHE_GENERATION_TTL_MS, 0 = not at all).
+        # Much shorter than the L1 TTL: an invalidate_namespace() on another worker
+        # goes unseen here for at most this long.
+        self.generation_ttl = get_int_env("CACHE_GENERATION_TTL_MS", 1000) / 1000
+        self.codec = codec or codec_from_env()
+        self.hot_keys = hot_keys or hot_keys_from_env()
 
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        try:
-            value = self.redis.get(key)
-            return json.loads(value) if value else None
-        except Exception as e:
-            print(f"Redis get error: {e}")
-            return None
+        with _observe("get"):
+            value = self._l1_get(key)
+            if value is not _MISSING:
+                return self._hit(key, "l1", value)
+            try:
+                value = self._loads(self.redis.get(key))
+            except Exception as e:
+                return self._error("get", key, e)
+            self._l1_put(key, value)
+            return self._hit(key, "redis", value)
 
     def set(self, key: str, value: Any, expire: int = 3600):
         """Set value in cache with expiration in seconds"""
-        try:
-            self.redis.setex(
-                key,
-                expire,
-                json.dumps(value)
-            )
-        except Exception as e:
-            print(f"Redis set error: {e}")
+        with _observe("set"):
+            frame = self._encode(key, value, expire)
+            if frame is None:
+                return
+            try:
+                self.redis.setex(key, expire, frame)
+            except Exception as e:
+                self._error("set", key, e)
 
     def delete(self, key: str):
         """Delete key from cache"""
+        self._l1_drop(key)
         try:
             self.redis.delete(key)
         except Exception as e:
-            print(f"Redis delete error: {e}")
+            self._error("delete", key, e)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Get value from cache without blocking the event loop"""
+        with _observe("get"):
+            value = self._l1_get(key)
+            if value is not _MISSING:
+                return self._hit(key, "l1", value)
+            try:
+                value = self._loads(await self.aredis.get(key))
+            except Exception as e:
+                return self._error("get", key, e)
+            self._l1_put(key, value)
+            return self._hit(key, "redis", value)
+
+    async def aset(self, key: str, value: Any, expire: int = 3600):
+        """Set value in cache with expiration in seconds, without blocking the event loop"""
+        with _observe("set"):
+            frame = self._encode(key, value, expire)
+            if frame is None:
+                return
+            try:
+                await self.aredis.setex(key, expire, frame)
+            except Exception as e:
+                self._error("set", key, e)
+
+    async def adelete(self, key: str):
+        """Delete key from cache without blocking the event loop"""
+        self._l1_drop(key)
+        try:
+            await self.aredis.delete(key)
+        except Exception as e:
+            self._error("delete", key, e)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values in one MGET round-trip (L1 hits are not sent); missing keys map to None"""
+        with _observe("get_many"):
+            keys = list(keys)
+            result, missing = self._l1_get_many(keys)
+            if missing:
+                try:
+                    raw = self.redis.mget(missing)
+                except Exception as e:
+                    self._error("get_many", missing[0], e)
+                    raw = [None] * len(missing)
+                result.update(self._decode_many(missing, raw))
+            return {key: result[key] for key in keys}
+
+    def set_many(self, mapping: Dict[str, Any], expire: Union[int, Dict[str, int]] = 3600):
+        """Set several values in one pipelined round-trip; expire is seconds for all keys or {key: seconds}"""
+        with _observe("set_many"):
+            frames = self._encode_many(mapping, expire)
+            if not frames:
+                return
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, (ttl, frame) in frames.items():
+                    pipe.setex(key, ttl, frame)
+                pipe.execute()
+            except Exception as e:
+                self._error("set_many", next(iter(frames)), e)
+
+    def delete_many(self, keys: Iterable[str]):
+        """Delete several keys with one DEL"""
+        keys = list(keys)
+        if not keys:
+            return
+        self._l1_drop_many(keys)
+        try:
+            self.redis.delete(*keys)
+        except Exception as e:
+            self._error("delete_many", keys[0], e)
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """get_many without blocking the event loop"""
+        with _observe("get_many"):
+            keys = list(keys)
+            result, missing = self._l1_get_many(keys)
+            if missing:
+                try:
+                    raw = await self.aredis.mget(missing)
+                except Exception as e:
+                    self._error("get_many", missing[0], e)
+                    raw = [None] * len(missing)
+                result.update(self._decode_many(missing, raw))
+            return {key: result[key] for key in keys}
+
+    async def aset_many(self, mapping: Dict[str, Any], expire: Union[int, Dict[str, int]] = 3600):
+        """set_many without blocking the event loop"""
+        with _observe("set_many"):
+            frames = self._encode_many(mapping, expire)
+            if not frames:
+                return
+            try:
+                pipe = self.aredis.pipeline(transaction=False)
+                for key, (ttl, frame) in frames.items():
+                    pipe.setex(key, ttl, frame)
+                await pipe.execute()
+            except Exception as e:
+                self._error("set_many", next(iter(frames)), e)
+
+    async def adelete_many(self, keys: Iterable[str]):
+        """delete_many without blocking the event loop"""
+        keys = list(keys)
+        if not keys:
+            return
+        self._l1_drop_many(keys)
+        try:
+            await self.aredis.delete(*keys)
+        except Exception as e:
+            self._error("delete_many", keys[0], e)
+
+    def generation(self, namespace: str) -> int:
+        """Current generation of a namespace (part of every key built for it)"""
+        key = generation_key(namespace)
+        value = self._l1_get(key)
+        if value is _MISSING:
+            try:
+                value = int(self.redis.get(key) or 0)
+            except Exception as e:
+                self._error("get", key, e)
+                return 0
+            self._l1_put_generation(key, value)
+        return value
+
+    def invalidate_namespace(self, namespace: str):
+        """
+        Invalidates every entry of a namespace in O(1) by bumping its generation;
+        old entries become unreachable and age out through their TTL.
+        """
+        key = generation_key(namespace)
+        try:
+            self._l1_put_generation(key, self.redis.incr(key))
+        except Exception as e:
+            self._error("invalidate", key, e)
+
+    async def ageneration(self, namespace: str) -> int:
+        """Current generation of a namespace, without blocking the event loop"""
+        key = generation_key(namespace)
+        value = self._l1_get(key)
+        if value is _MISSING:
+            try:
+                value = int(await self.aredis.get(key) or 0)
+            except Exception as e:
+                self._error("get", key, e)
+                return 0
+            self._l1_put_generation(key, value)
+        return value
+
+    async def ainvalidate_namespace(self, namespace: str):
+        """invalidate_namespace without blocking the event loop"""
+        key = generation_key(namespace)
+        try:
+            self._l1_put_generation(key, await self.aredis.incr(key))
+        except Exception as e:
+            self._error("invalidate", key, e)
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Snapshot for /api/system/cache: L1 occupancy and the hottest keys by sampled hit count.
+        """
+        return {
+            "l1_entries": len(self.l1) if self.l1 is not None else 0,
+            "l1_capacity": self.l1.max_entries if self.l1 is not None else 0,
+            "hot_keys_sample_rate": self.hot_keys.sample_rate,
+            "top_keys": [
+                {"key": key, "namespace": namespace_from_key(key), "hits": hits}
+                for key, hits in self.hot_keys.top(top)
+            ],
+        }
+
+    async def aclose(self):
+        """Closes both clients and disconnects their pools (app shutdown)."""
+        self.redis.connection_pool.disconnect()
+        await self.aredis.aclose(close_connection_pool=True)
+
+    def _hit(self, key, tier, value):
+        if value is None:
+            CACHE_MISSES.labels(namespace=namespace_from_key(key)).inc()
+        else:
+            CACHE_HITS.labels(namespace=namespace_from_key(key), tier=tier).inc()
+            self.hot_keys.record(key)
+        return value
+
+    def _error(self, operation, key, error):
+        logger.error(f"Redis {operation} error for {key}: {error}")
+        CACHE_ERRORS.labels(namespace=namespace_from_key(key), operation=operation).inc()
+        return None
+
+    def _l1_get(self, key):
+        return _MISSING if self.l1 is None else self.l1.get(L1_SLOT, key)
+
+    def _l1_put(self, key, value, expire=None):
+        # Misses are not kept locally so a write from another worker shows up on the next read
+        if self.l1 is not None and value is not None:
+            self.l1.put(L1_SLOT, key, value, expire)
+
+    def _l1_put_generation(self, key, value):
+        if self.generation_ttl > 0:
+            self._l1_put(key, value, self.generation_ttl)
+        else:
+            self._l1_drop(key)
+
+    def _l1_drop(self, key):
+        if self.l1 is not None:
+            self.l1.invalidate(L1_SLOT, [key])
+
+    def _l1_get_many(self, keys):
+        result, missing = {}, []
+        for key in keys:
+            value = self._l1_get(key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                result[key] = self._hit(key, "l1", value)
+        return result, missing
+
+    def _l1_drop_many(self, keys):
+        if self.l1 is not None:
+            self.l1.invalidate(L1_SLOT, keys)
+
+    def _decode_many(self, keys, raw):
+        # One undecodable entry must not fail the whole batch
+        result = {}
+        for key, frame in zip(keys, raw):
+            try:
+                result[key] = self._hit(key, "redis", self._loads(frame))
+            except Exception as e:
+                result[key] = self._error("get", key, e)
+            self._l1_put(key, result[key])
+        return result
+
+    def _encode(self, key, value, expire):
+        # Encodes a value and mirrors it into L1; None if it cannot be serialized.
+        # L1 keeps the decoded frame, not the value, so both tiers return the same
+        # types (a datetime comes back as its string from either tier).
+        try:
+            frame = self._dumps(key, value)
+            stored = self.codec.decode(frame)
+        except Exception as e:
+            return self._error("set", key, e)
+        self._l1_put(key, stored, expire)
+        return frame
+
+    def _encode_many(self, mapping, expire):
+        frames = {}
+        for key, value in mapping.items():
+            ttl = expire.get(key, 3600) if isinstance(expire, dict) else expire
+            frame = self._encode(key, value, ttl)
+            if frame is not None:
+                frames[key] = (ttl, frame)
+        return frames
+
+    def _dumps(self, key: str, value: Any) -> bytes:
+        frame = self.codec.encode(value)
+        CACHE_PAYLOAD_SIZE.labels(namespace=namespace_from_key(key)).observe(len(frame))
+        return frame
+
+    def _loads(self, value: Optional[bytes]) -> Optional[Any]:
+        return self.codec.decode(value)
 
-cache = RedisCache()
\ No newline at end of file
+cache = RedisCache()
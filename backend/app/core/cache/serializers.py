@@ -0,0 +1,160 @@
+import json
+import pickle
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from shared.config.env_loader import get_env_variable, get_int_env
+from shared.memory.value_codec import NONE, ZLIB, ZSTD, compress, decompress, zstandard
+
+try:
+    import orjson
+except ImportError:  # Optional: faster drop-in for the JSON serializer
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for CACHE_SERIALIZER=msgpack
+    msgpack = None
+
+# --- Frame layout: MAGIC + <serializer tag> + <compression> + payload (raw bytes) ---
+#   serializer:  "j" JSON | "m" msgpack | "p" pickle
+#   compression: "-" none | "z" zlib    | "Z" zstd  (same tags as the memory value envelope)
+# Values without MAGIC are plain JSON text written before frames existed.
+MAGIC = b"\x1fC"
+HEADER_LEN = len(MAGIC) + 2
+
+def _default(value):
+    """Fallback for types JSON/msgpack do not know natively."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+class Serializer(ABC):
+    """
+    Turns cache values into bytes and back. Subclasses set a one-character tag
+    stored in every frame, so entries stay readable after CACHE_SERIALIZER changes.
+    """
+
+    tag = None
+
+    @abstractmethod
+    def dumps(self, value) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes):
+        ...
+
+class JSONSerializer(Serializer):
+    """JSON via orjson when installed, else the stdlib. datetimes/models become strings/dicts."""
+
+    tag = "j"
+
+    def dumps(self, value) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes):
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+
+class MsgpackSerializer(Serializer):
+    """Compact binary format; bytes round-trip as bytes."""
+
+    tag = "m"
+
+    def dumps(self, value) -> bytes:
+        if msgpack is None:
+            raise RuntimeError("❌ CACHE_SERIALIZER=msgpack requires the 'msgpack' package.")
+        return msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        if msgpack is None:
+            raise RuntimeError("❌ Cached value is msgpack-encoded but 'msgpack' is not installed.")
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+class PickleSerializer(Serializer):
+    """
+    Full Python fidelity. Only for caches no untrusted party can write to:
+    unpickling attacker-controlled bytes executes code.
+    """
+
+    tag = "p"
+
+    def dumps(self, value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes):
+        return pickle.loads(data)
+
+SERIALIZERS = {
+    "json": JSONSerializer(),
+    "msgpack": MsgpackSerializer(),
+    "pickle": PickleSerializer(),
+}
+
+class CacheCodec:
+    """
+    Frames values for Redis: serialize, compress when at least `threshold` bytes,
+    prefix a header. Decoding picks the serializer from the header; pickle frames
+    are only loaded when pickle is the configured serializer.
+    """
+
+    def __init__(self, serializer="json", compression="zlib", threshold=1024):
+        """
+        Args:
+            serializer (str): "json", "msgpack" or "pickle"
+            compression (str): "zlib", "zstd" or "none"
+            threshold (int): Compress payloads at least this many bytes (0 disables)
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"❌ Unknown cache serializer '{serializer}' (expected json, msgpack or pickle).")
+        self.serializer = SERIALIZERS[serializer]
+        self.compression = {"zlib": ZLIB, "zstd": ZSTD}.get(compression, NONE)
+        if self.compression == ZSTD and zstandard is None:
+            self.compression = ZLIB
+        self.threshold = threshold
+        self._by_tag = {s.tag: s for s in SERIALIZERS.values() if s.tag != "p" or serializer == "pickle"}
+
+    def encode(self, value) -> bytes:
+        payload = self.serializer.dumps(value)
+        if self.compression != NONE and self.threshold and len(payload) >= self.threshold:
+            compressed = compress(payload, self.compression)
+            if len(compressed) < len(payload):
+                return MAGIC + f"{self.serializer.tag}{self.compression}".encode() + compressed
+        return MAGIC + f"{self.serializer.tag}{NONE}".encode() + payload
+
+    def decode(self, data: bytes):
+        if not data:
+            return None
+        if not data.startswith(MAGIC):
+            return json.loads(data)
+        tag, compression = chr(data[len(MAGIC)]), chr(data[len(MAGIC) + 1])
+        serializer = self._by_tag.get(tag)
+        if serializer is None:
+            raise ValueError(f"❌ Refusing to decode cache frame with serializer tag '{tag}'.")
+        payload = data[HEADER_LEN:]
+        if compression != NONE:
+            payload = decompress(payload, compression)
+        return serializer.loads(payload)
+
+def codec_from_env():
+    """
+    Builds the cache codec from CACHE_SERIALIZER (json), CACHE_COMPRESSION (zlib)
+    and CACHE_COMPRESS_THRESHOLD (1024 bytes).
+    """
+    return CacheCodec(
+        serializer=get_env_variable("CACHE_SERIALIZER", "json").lower(),
+        compression=get_env_variable("CACHE_COMPRESSION", "zlib").lower(),
+        threshold=get_int_env("CACHE_COMPRESS_THRESHOLD", 1024),
+    )
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+import redis
+import redis.asyncio as aioredis
+from shared.config.env_loader import get_env_variable, get_int_env
+from core.cache.redis_cache import redis_pool_options
+from core.monitoring.metrics import EVENT_BUS_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+class Event(NamedTuple):
+    topic: str
+    payload: Dict[str, Any]
+    id: Optional[str] = None    # Stream entry ID (Redis Streams only)
+
+    def message(self) -> Dict[str, Any]:
+        """Payload as sent to WebSocket clients, with the ID to resume from if there is one"""
+        return self.payload if self.id is None else {**self.payload, "event_id": self.id}
+
+Handler = Callable[[List[Event]], Awaitable[None]]
+
+class EventBus:
+    """
+    Fans events out to every worker and replica. publish() may be called from
+    any worker; start(handler) delivers everything published (including this
+    worker's own events) to `handler` in batches, at most one per `tick`, so
+    a burst costs one hand-off instead of one per event.
+
+    This base class is the in-process bus: events never leave the process,
+    which is all a single worker needs.
+    """
+
+    name = "memory"
+    supports_replay = False
+
+    def __init__(self, tick_ms=None):
+        """
+        Args:
+            tick_ms (int): Batching window (EVENT_BUS_TICK_MS, 20)
+        """
+        self.tick = (tick_ms or get_int_env("EVENT_BUS_TICK_MS", 20)) / 1000
+        self._handler: Optional[Handler] = None
+        self._pending: List[Event] = []
+        self._ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        self._deliver(Event(topic, payload))
+
+    async def publish_many(self, topic: str, payloads: List[Dict[str, Any]]):
+        """Publishes several events in one round trip where the backend allows"""
+        for payload in payloads:
+            self._deliver(Event(topic, payload))
+
+    async def replay(self, last_id: str, topics: Iterable[str]) -> List[Event]:
+        """Events after `last_id` on these topics; empty unless supports_replay"""
+        return []
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        self._tasks = [asyncio.create_task(self._flush_loop()), *self._readers()]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._handler = None
+
+    def _readers(self) -> List[asyncio.Task]:
+        return []
+
+    def _deliver(self, event: Event):
+        if self._handler is None:
+            return  # Not started: nobody in this process is listening
+        self._pending.append(event)
+        self._ready.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._ready.wait()
+            # Collect whatever else arrives this tick into the same batch
+            await asyncio.sleep(self.tick)
+            self._ready.clear()
+            batch, self._pending = self._pending, []
+            EVENT_BUS_BATCH_SIZE.labels(backend=self.name).observe(len(batch))
+            try:
+                await self._handler(batch)
+            except Exception as e:
+                logger.error(f"❌ Event handler failed on a batch of {len(batch)}: {e}")
+
+    @staticmethod
+    def _encode(topic: str, payload: Dict[str, Any]) -> str:
+        return json.dumps({"t": topic, "p": payload}, separators=(",", ":"), default=str)
+
+class RedisPubSubEventBus(EventBus):
+    """
+    Redis pub/sub: every worker subscribes to one channel. Fire-and-forget,
+    so a worker that is down or reconnecting misses what was sent meanwhile.
+    """
+
+    name = "pubsub"
+
+    def __init__(self, client=None, channel="hyphaeos:events", tick_ms=None):
+        super().__init__(tick_ms)
+        self.redis = client or aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**redis_pool_options()))
+        self.channel = channel
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        try:
+            await self.redis.publish(self.channel, self._encode(topic, payload))
+        except redis.RedisError as e:
+            logger.error(f"❌ Event publish to '{self.channel}' failed: {e}")
+
+    async def publish_many(self, topic: str, payloads: List[Dict[str, Any]]):
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for payload in payloads:
+                    pipe.publish(self.channel, self._encode(topic, payload))
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"❌ Event publish to '{self.channel}' failed: {e}")
+
+    def _readers(self):
+        return [asyncio.create_task(self._read_loop())]
+
+    async def _read_loop(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        data = json.loads(message["data"])
+                        self._deliver(Event(data["t"], data["p"]))
+            except redis.RedisError as e:
+                logger.error(f"❌ Event subscription to '{self.channel}' lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        await super().close()
+        await self.redis.aclose(close_connection_pool=True)
+
+class RedisStreamEventBus(EventBus):
+    """
+    Redis Streams: events are XADDed to a capped stream (MAXLEN ~ maxlen) and
+    every worker tails it with XREAD. Entry IDs go out to clients as
+    `event_id`, and a reconnecting client can pass its last one to replay()
+    what it missed, as long as it is still within the cap.
+    """
+
+    name = "streams"
+    supports_replay = True
+
+    def __init__(self, client=None, stream="hyphaeos:events", maxlen=None, tick_ms=None):
+        """
+        Args:
+            maxlen (int): Approximate number of events kept (EVENT_BUS_STREAM_MAXLEN, 10000)
+        """
+        super().__init__(tick_ms)
+        self.redis = client or aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**redis_pool_options()))
+        self.stream = stream
+        self.maxlen = maxlen or get_int_env("EVENT_BUS_STREAM_MAXLEN", 10000)
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        try:
+            await self.redis.xadd(self.stream, {"t": topic, "p": json.dumps(payload, default=str)},
+                                  maxlen=self.maxlen, approximate=True)
+        except redis.RedisError as e:
+            logger.error(f"❌ Event publish to '{self.stream}' failed: {e}")
+
+    async def publish_many(self, topic: str, payloads: List[Dict[str, Any]]):
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for payload in payloads:
+                    pipe.xadd(self.stream, {"t": topic, "p": json.dumps(payload, default=str)},
+                              maxlen=self.maxlen, approximate=True)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"❌ Event publish to '{self.stream}' failed: {e}")
+
+    async def replay(self, last_id: str, topics: Iterable[str]) -> List[Event]:
+        topics = set(topics)
+        try:
+            entries = await self.redis.xrange(self.stream, min=f"({last_id}", max="+", count=self.maxlen)
+        except redis.RedisError as e:
+            # Also a malformed ID from the client
+            logger.warning(f"Event replay from '{last_id}' failed: {e}")
+            return []
+        events = (self._to_event(entry_id, fields) for entry_id, fields in entries)
+        return [event for event in events if event.topic in topics]
+
+    def _readers(self):
+        return [asyncio.create_task(self._read_loop())]
+
+    async def _read_loop(self):
+        last_id = None
+        # Blocking reads must return before the socket timeout
+        block_ms = max(1, int(self.tick * 1000))
+        while True:
+            try:
+                if last_id is None:
+                    # Start at the current tail; "$" would skip events between reads
+                    newest = await self.redis.xrevrange(self.stream, count=1)
+                    last_id = newest[0][0].decode() if newest else "0-0"
+                reply = await self.redis.xread({self.stream: last_id}, count=1000, block=block_ms)
+                for _, entries in reply:
+                    for entry_id, fields in entries:
+                        event = self._to_event(entry_id, fields)
+                        last_id = event.id
+                        self._deliver(event)
+            except redis.RedisError as e:
+                logger.error(f"❌ Reading '{self.stream}' failed: {e}")
+                await asyncio.sleep(1)
+
+    @staticmethod
+    def _to_event(entry_id, fields) -> Event:
+        return Event(fields[b"t"].decode(), json.loads(fields[b"p"]), entry_id.decode())
+
+    async def close(self):
+        await super().close()
+        await self.redis.aclose(close_connection_pool=True)
+
+EVENT_BUSES = {
+    "memory": EventBus,
+    "pubsub": RedisPubSubEventBus,
+    "streams": RedisStreamEventBus,
+}
+
+def event_bus_from_env() -> EventBus:
+    """EVENT_BUS: "memory" (single worker, default), "pubsub" or "streams"."""
+    name = get_env_variable("EVENT_BUS", "memory").lower()
+    if name not in EVENT_BUSES:
+        raise ValueError(f"❌ Unknown EVENT_BUS '{name}' (expected one of {', '.join(EVENT_BUSES)})")
+    return EVENT_BUSES[name]()
+
+event_bus = event_bus_from_env()
@@ -38,6 +38,116 @@ AGENT_LATENCY = Histogram(
     ['agent']
 )
 
+AGENT_TIME_TO_FIRST_TOKEN = Histogram(
+    'agent_time_to_first_token_seconds',
+    'Time from a streaming agent request to its first response token',
+    ['agent'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+
+# Database pool metrics
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting to check a connection out of the pool',
+    ['pool'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+
+DB_POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use',
+    'Pooled database connections currently checked out',
+    ['pool']
+)
+
+# Memory cache metrics
+MEMORY_CACHE_HITS = Counter(
+    'memory_cache_hits_total',
+    'Memory cache lookups served from the in-process cache',
+    ['cache']
+)
+
+MEMORY_CACHE_MISSES = Counter(
+    'memory_cache_misses_total',
+    'Memory cache lookups that fell through to the engine',
+    ['cache']
+)
+
+MEMORY_CACHE_EVICTIONS = Counter(
+    'memory_cache_evictions_total',
+    'Memory cache entries evicted by size or TTL',
+    ['cache', 'reason']
+)
+
+# Redis cache metrics (namespace = module.qualname@version of the cached function, or key prefix)
+CACHE_HITS = Counter(
+    'cache_hits_total',
+    'Cache lookups answered by the in-process tier (l1) or Redis',
+    ['namespace', 'tier']
+)
+
+CACHE_MISSES = Counter(
+    'cache_misses_total',
+    'Cache lookups that found nothing in either tier',
+    ['namespace']
+)
+
+CACHE_ERRORS = Counter(
+    'cache_errors_total',
+    'Cache operations that failed (connection, timeout, codec)',
+    ['namespace', 'operation']
+)
+
+CACHE_LATENCY = Histogram(
+    'cache_operation_duration_seconds',
+    'Latency of cache operations, including L1 hits',
+    ['operation'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+)
+
+CACHE_PAYLOAD_SIZE = Histogram(
+    'cache_payload_bytes',
+    'Serialized (and compressed) size of values written to Redis',
+    ['namespace'],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+
+# Rate limiter metrics
+CIRCUIT_BREAKER_STATE = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['breaker']
+)
+
+RATE_LIMIT_FAIL_OPEN = Counter(
+    'rate_limit_fail_open_total',
+    'Requests allowed without a rate-limit decision because Redis failed or the breaker was open',
+    ['reason']
+)
+
+# WebSocket metrics
+WS_CONNECTIONS = Gauge(
+    'websocket_connections',
+    'Open WebSocket connections'
+)
+
+WS_DROPPED_MESSAGES = Counter(
+    'websocket_dropped_messages_total',
+    'Outbound WebSocket frames dropped by backpressure (queue_full) or clients cut off (slow_consumer)',
+    ['reason']
+)
+
+EVENT_BUS_BATCH_SIZE = Histogram(
+    'event_bus_batch_size',
+    'Events handed to the WebSocket hub per event-bus tick',
+    ['backend'],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000)
+)
+
+LOG_STREAM_COALESCED = Counter(
+    'log_stream_coalesced_records_total',
+    'Live log records folded into log_summary messages (or dropped) instead of streamed one by one'
+)
+
 def track_request_metrics():
     def decorator(func):
         async def wrapper(*args, **kwargs):
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+
+from core.monitoring.metrics import CIRCUIT_BREAKER_STATE
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency after `failure_threshold` consecutive
+    errors (open), then lets a single probe through every `reset_timeout`
+    seconds (half-open) until one succeeds (closed).
+
+    The state is exported as circuit_breaker_state{breaker=name}:
+    0 = closed, 1 = half-open, 2 = open.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=5.0):
+        """
+        Args:
+            name (str): Label for logs and metrics
+            failure_threshold (int): Consecutive failures before opening
+            reset_timeout (float): Seconds to wait before probing an open circuit
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._set_state(self.CLOSED)
+
+    def allow(self):
+        """
+        Returns:
+            bool: True if the caller may try the dependency now
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(breaker=self.name).set(self._GAUGE[state])
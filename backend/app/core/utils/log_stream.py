@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+from shared.config.env_loader import get_env_variable, get_int_env
+from shared.state.session_manager import session
+from core.monitoring.metrics import LOG_STREAM_COALESCED
+
+LOGS_TOPIC = "logs"
+
+# Records from the delivery path itself are not streamed, or a failing
+# publish would log an error that is published, fails, logs...
+EXCLUDED_LOGGERS = ("core.events", "core.utils.websocket_manager", "core.utils.log_stream")
+
+def agent_of(logger_name: str) -> str:
+    """"daphne_agent" -> "daphne", "core.cache.redis_cache" -> "core" """
+    name = logger_name.split(".", 1)[0]
+    return name[:-len("_agent")] if name.endswith("_agent") else name
+
+class LogFilter(NamedTuple):
+    """Server-side filter for streamed records; hashable, so equal filters share an encoding."""
+    agents: FrozenSet[str] = frozenset()    # Empty = every agent
+    min_level: int = logging.NOTSET
+    user: Optional[str] = None
+
+    @classmethod
+    def from_params(cls, agent: str = "", level: str = "", user: str = ""):
+        """
+        Args:
+            agent (str): Comma-separated agent names
+            level (str): Minimum level name (e.g. "WARNING")
+            user (str): Only records logged for this user
+        """
+        min_level = logging.getLevelName(level.upper()) if level else logging.NOTSET
+        if not isinstance(min_level, int):
+            raise ValueError(f"❌ Unknown log level: '{level}'")
+        agents = frozenset(a.strip().lower() for a in agent.split(",") if a.strip())
+        return cls(agents, min_level, user or None)
+
+    def __call__(self, record: Dict[str, Any]) -> bool:
+        if self.agents and record.get("agent") not in self.agents:
+            return False
+        if record.get("levelno", 0) < self.min_level:
+            return False
+        return self.user is None or record.get("user") == self.user
+
+class LogRingBuffer:
+    """The last `size` records of this worker, for tail-on-connect."""
+
+    def __init__(self, size=1000):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records.append(record)
+
+    def tail(self, n: int, selector: LogFilter = None) -> List[Dict[str, Any]]:
+        """Up to n most recent records matching selector, oldest first"""
+        if n <= 0:
+            return []
+        with self._lock:
+            records = list(self._records)
+        if selector is not None:
+            records = [record for record in records if selector(record)]
+        return records[-n:]
+
+class LiveLogHandler(logging.Handler):
+    """
+    Logging handler that feeds the live log stream.
+
+    emit() (any thread) turns a record into a dict, appends it to the ring
+    buffer and to a pending queue. An asyncio task flushes the queue every
+    `flush_ms` and publishes the records on the event bus under the "logs"
+    topic. The WebSocket hub applies each client's LogFilter.
+
+    Past `max_per_flush` records in one flush, the rest are coalesced into
+    one {"type": "log_summary"} per agent and level, with a count and the
+    last message, so a log storm can't flood the clients or the bus.
+    """
+
+    def __init__(self, buffer_size=None, flush_ms=None, max_per_flush=None, level=logging.INFO):
+        """
+        Args:
+            buffer_size (int): Records kept for tail-on-connect (LOG_STREAM_BUFFER, 1000)
+            flush_ms (int): Publish interval (LOG_STREAM_FLUSH_MS, 250)
+            max_per_flush (int): Records published per flush before coalescing (LOG_STREAM_MAX_PER_FLUSH, 100)
+        """
+        super().__init__(level)
+        self.buffer = LogRingBuffer(buffer_size or get_int_env("LOG_STREAM_BUFFER", 1000))
+        self.flush_interval = (flush_ms or get_int_env("LOG_STREAM_FLUSH_MS", 250)) / 1000
+        self.max_per_flush = max_per_flush or get_int_env("LOG_STREAM_MAX_PER_FLUSH", 100)
+        # Bounded so a stalled flusher can't grow memory; overflow counts as coalesced
+        self._pending = deque(maxlen=self.max_per_flush * 100)
+        self._bus = None
+        self._task = None
+
+    def emit(self, record: logging.LogRecord):
+        if record.name.startswith(EXCLUDED_LOGGERS):
+            return
+        try:
+            entry = {
+                "type": "log",
+                "agent": agent_of(record.name),
+                "logger": record.name,
+                "level": record.levelname,
+                "levelno": record.levelno,
+                "user": getattr(record, "user", None) or session.get_user_name(),
+                "message": record.getMessage(),
+                "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
+            }
+        except Exception:
+            self.handleError(record)
+            return
+        self.buffer.append(entry)
+        if self._bus is not None:
+            if len(self._pending) == self._pending.maxlen:
+                LOG_STREAM_COALESCED.inc()
+            self._pending.append(entry)
+
+    def start(self, bus):
+        """Starts publishing to `bus` from the running event loop."""
+        self._bus = bus
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        self._bus = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def flush_pending(self):
+        """Publishes what is pending, coalescing past max_per_flush."""
+        records = []
+        while self._pending and len(records) < self.max_per_flush:
+            records.append(self._pending.popleft())
+        overflow = []
+        while self._pending:
+            overflow.append(self._pending.popleft())
+        if overflow:
+            LOG_STREAM_COALESCED.inc(len(overflow))
+            records.extend(self._summarize(overflow))
+        if records and self._bus is not None:
+            await self._bus.publish_many(LOGS_TOPIC, records)
+
+    @staticmethod
+    def _summarize(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        summaries = {}
+        for record in records:
+            key = (record["agent"], record["levelno"])
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = {
+                    "type": "log_summary",
+                    "agent": record["agent"],
+                    "level": record["level"],
+                    "levelno": record["levelno"],
+                    "count": 0,
+                }
+            summary["count"] += 1
+            summary["last_message"] = record["message"]
+            summary["timestamp"] = record["timestamp"]
+        return list(summaries.values())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_pending()
+            except Exception as e:
+                # Printed, not logged: logging here would feed the stream itself
+                self.handleError(logging.makeLogRecord({"msg": f"Live log flush failed: {e}"}))
+
+def handler_from_env() -> LiveLogHandler:
+    level = logging.getLevelName(get_env_variable("LOG_STREAM_LEVEL", "INFO").upper())
+    return LiveLogHandler(level=level if isinstance(level, int) else logging.INFO)
+
+live_log_handler = handler_from_env()
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Optional
 from fastapi import Request
 from shared.state.session_manager import session
+from core.utils.log_stream import live_log_handler
 
 class RequestContextFilter(logging.Filter):
     def filter(self, record):
@@ -48,6 +49,8 @@ def setup_logging(
     root_logger.setLevel(getattr(logging, log_level.upper()))
     root_logger.addHandler(file_handler)
     root_logger.addHandler(console_handler)
+    # Ring buffer + /api/mycocore/stream; publishing starts with the app
+    root_logger.addHandler(live_log_handler)
 
     # Add request context filter
     context_filter = RequestContextFilter()
@@ -1,95 +1,493 @@
-from fastapi import HTTPException, Request
-from typing import Dict, Tuple, Optional
+from fastapi import Request
+from fastapi.requests import HTTPConnection
+from fastapi.responses import JSONResponse
+from typing import Dict, NamedTuple
+import asyncio
+import json
+import math
 import time
 import logging
-from collections import defaultdict
+from collections import OrderedDict
 import redis
-from shared.config.env_loader import get_env_variable
+import redis.asyncio as aioredis
+from shared.config.env_loader import get_env_variable, get_int_env
+from core.cache.redis_cache import redis_pool_options
+from core.monitoring.metrics import RATE_LIMIT_FAIL_OPEN
+from core.utils.circuit_breaker import CircuitBreaker
+from core.utils.request_identity import ClientIdentity, identity_resolver
 
 logger = logging.getLogger(__name__)
 
+# GCRA (generic cell rate algorithm) in one atomic script: a single stored value,
+# the theoretical arrival time (TAT) of the next request, replaces INCR + EXPIRE.
+# Requests are spaced period/limit apart with a burst of up to `limit`, so there is
+# no window boundary to double up on. The key carries its own PX expiry.
+#   KEYS[1] = bucket key
+#   ARGV    = limit, period (ms), cost
+#   returns {allowed, remaining, retry_after_ms, reset_after_ms}
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = period / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + cost * interval
+local allow_at = new_tat - period
+if allow_at > now then
+    local remaining = math.max(0, math.floor((period - (tat - now)) / interval))
+    return {0, remaining, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+local remaining = math.max(0, math.floor((period - (new_tat - now)) / interval))
+return {1, remaining, 0, math.ceil(new_tat - now)}
+"""
+
+# Tier of the per-IP bucket that token holders are charged to as well
+CEILING = "ceiling"
+
+def chain_cost(payload: dict, tokens_per_unit: int) -> int:
+    """One unit per agent step"""
+    chain = payload.get("chain")
+    return len(chain) if isinstance(chain, list) else 1
+
+def max_tokens_cost(payload: dict, tokens_per_unit: int) -> int:
+    """One unit per `tokens_per_unit` requested completion tokens"""
+    max_tokens = payload.get("max_tokens")
+    if not isinstance(max_tokens, int) or max_tokens <= 0:
+        return 1
+    return math.ceil(max_tokens / tokens_per_unit)
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # Seconds until the request would be allowed (0 if allowed)
+    reset_after: float  # Seconds until the bucket is completely refilled
+
 class RateLimiter:
-    def __init__(self):
-        self.redis = redis.Redis(
-            host=get_env_variable("REDIS_HOST", "localhost"),
-            port=int(get_env_variable("REDIS_PORT", "6379")),
-            db=0,
-            decode_responses=True
+    """
+    Shared GCRA limiter. The middleware path (ahit) runs on redis.asyncio under
+    a short deadline (RATE_LIMIT_DEADLINE_MS) behind a circuit breaker: when
+    Redis is slow or down, requests are allowed instead of queueing on it, and
+    after RATE_LIMIT_BREAKER_FAILURES consecutive failures Redis is skipped
+    entirely, with one probe every RATE_LIMIT_BREAKER_RESET_MS until it recovers.
+    """
+
+    def __init__(self, client=None, async_client=None, breaker=None):
+        """
+        Args:
+            client (redis.Redis): Sync client; defaults to one on its own pool
+            async_client (redis.asyncio.Redis): Async client; defaults to one on its own pool
+            breaker (CircuitBreaker): Shared by hit and ahit; defaults to one configured from env
+        """
+        options = redis_pool_options()
+        self.redis = client or redis.Redis(connection_pool=redis.BlockingConnectionPool(**options))
+        self.aredis = async_client or aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**options))
+        self._gcra = self.redis.register_script(GCRA_SCRIPT)
+        self._agcra = self.aredis.register_script(GCRA_SCRIPT)
+
+        # Longest the middleware waits on Redis before failing open (seconds)
+        self.deadline = get_int_env("RATE_LIMIT_DEADLINE_MS", 50) / 1000
+        self.breaker = breaker or CircuitBreaker(
+            "rate_limiter",
+            failure_threshold=get_int_env("RATE_LIMIT_BREAKER_FAILURES", 5),
+            reset_timeout=get_int_env("RATE_LIMIT_BREAKER_RESET_MS", 5000) / 1000,
         )
-        
-        # Default limits per minute
+
+        # Window the limits below apply to (seconds)
+        self.period = get_int_env("RATE_LIMIT_PERIOD", 60)
+
+        # Default limits per period
         self.default_limits = {
             "GET": 120,
             "POST": 60,
             "PUT": 60,
             "DELETE": 30
         }
-        
-        # Special endpoint limits
+
+        # Special endpoint limits (any method)
         self.endpoint_limits = {
             "/api/chain/execute": 30,
             "/api/neuroweave/ask": 40,
-            "/api/rootbloom/generate": 40
+            "/api/neuroweave/ask/stream": 40,
+            "/api/rootbloom/generate": 40,
+            "/api/rootbloom/generate/stream": 40
+        }
+
+        # Per route + method limits ("METHOD /path"), checked first
+        self.route_limits: Dict[str, int] = {}
+
+        # Limit multiplier per UserIdentity role ("anonymous" = no valid token).
+        # "ceiling" scales the per-IP bucket token holders are charged to as well,
+        # so fresh logins from one address can't multiply its allowance.
+        self.tiers: Dict[str, float] = {
+            "owner": 10,
+            "admin": 4,
+            "guest": 2,
+            "anonymous": 1,
+            CEILING: 10
+        }
+
+        # POST endpoints whose requests cost more than one token, by JSON body
+        self.cost_rules = {
+            "/api/chain/execute": chain_cost,
+            "/api/neuroweave/ask": max_tokens_cost,
+            "/api/rootbloom/generate": max_tokens_cost,
+            "/api/sporelink/analyze": max_tokens_cost,
+            "/api/neuroweave/ask/stream": max_tokens_cost,
+            "/api/rootbloom/generate/stream": max_tokens_cost,
+            "/api/sporelink/analyze/stream": max_tokens_cost
         }
-        
+        # Completion tokens per cost unit (GPTClient asks for 500 by default)
+        self.tokens_per_unit = get_int_env("RATE_LIMIT_TOKENS_PER_UNIT", 500)
+        # Bodies larger than this are not parsed for cost (charged 1)
+        self.max_cost_body = get_int_env("RATE_LIMIT_MAX_COST_BODY", 65536)
+
+        self.load_rules(get_env_variable("RATE_LIMIT_RULES", ""))
+        self.load_tiers(get_env_variable("RATE_LIMIT_TIERS", ""))
+
+    def load_rules(self, rules: str):
+        """
+        Applies overrides such as "POST /api/chain/execute=20,/api/sporelink/analyze=30,GET=240":
+        "METHOD /path" -> route_limits, "/path" -> endpoint_limits, "METHOD" -> default_limits.
+        """
+        for rule in filter(None, (part.strip() for part in rules.split(","))):
+            target, _, limit = rule.rpartition("=")
+            target = target.strip()
+            if not target or not limit.strip().isdigit():
+                raise ValueError(f"❌ Invalid RATE_LIMIT_RULES entry: '{rule}'")
+            if " " in target:
+                method, path = target.split(None, 1)
+                self.route_limits[f"{method.upper()} {path}"] = int(limit)
+            elif target.startswith("/"):
+                self.endpoint_limits[target] = int(limit)
+            else:
+                self.default_limits[target.upper()] = int(limit)
+
+    def load_tiers(self, tiers: str):
+        """Applies overrides such as "owner=20,guest=1.5" to the role multipliers."""
+        for tier in filter(None, (part.strip() for part in tiers.split(","))):
+            role, _, factor = tier.partition("=")
+            try:
+                self.tiers[role.strip().lower()] = float(factor)
+            except ValueError:
+                raise ValueError(f"❌ Invalid RATE_LIMIT_TIERS entry: '{tier}'")
+
+    def get_limit(self, method: str, endpoint: str, role: str = None) -> int:
+        """
+        Limit per period for a request: route+method, then endpoint, then method
+        default, scaled by the role's tier.
+        """
+        limit = self.route_limits.get(f"{method} {endpoint}")
+        if limit is None:
+            limit = self.endpoint_limits.get(endpoint, self.default_limits.get(method, 60))
+        if role is not None:
+            limit = max(1, int(limit * self.tiers.get(role, 1)))
+        return limit
+
+    async def request_cost(self, request: Request) -> int:
+        """
+        Tokens a request consumes: chain length for /api/chain/execute, max_tokens
+        units for the agent endpoints, 1 for everything else. The body stays
+        readable by the route (Starlette caches it for downstream).
+        """
+        rule = self.cost_rules.get(request.url.path)
+        if rule is None or request.method != "POST":
+            return 1
+        length = request.headers.get("content-length", "")
+        if not length.isdigit() or int(length) > self.max_cost_body:
+            return 1
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            return 1
+        return self.payload_cost(request.url.path, payload)
+
+    def payload_cost(self, endpoint: str, payload) -> int:
+        """Tokens for a JSON payload sent to `endpoint` (request body or WebSocket message)"""
+        rule = self.cost_rules.get(endpoint)
+        if rule is None or not isinstance(payload, dict):
+            return 1
+        return max(1, rule(payload, self.tokens_per_unit))
+
     def _get_key(self, client_id: str, method: str, endpoint: str) -> str:
         """Generate Redis key for rate limiting"""
         return f"ratelimit:{client_id}:{method}:{endpoint}"
-        
-    def check_rate_limit(self, request: Request) -> Tuple[bool, int]:
-        """
-        Check if request should be rate limited.
-        Returns (is_allowed, requests_remaining)
-        """
-        client_id = request.client.host
-        method = request.method
-        endpoint = request.url.path
-        
-        # Get appropriate limit
-        limit = self.endpoint_limits.get(endpoint, self.default_limits.get(method, 60))
-        
-        # Generate key
+
+    def hit(self, client_id: str, method: str, endpoint: str, cost: int = 1, role: str = None) -> RateLimitResult:
+        """
+        Consumes `cost` (capped at the limit) from the client's bucket for this
+        route in one EVALSHA. Fails open (allows) when Redis is unavailable or
+        the breaker is open.
+        """
+        limit = self.get_limit(method, endpoint, role)
+        cost = min(cost, limit)
+        if not self.breaker.allow():
+            return self._fail_open(limit, "breaker_open")
+        key = self._get_key(client_id, method, endpoint)
+        try:
+            reply = self._gcra(keys=[key], args=[limit, self.period * 1000, cost])
+        except redis.RedisError as e:
+            logger.error(f"Redis error in rate limiter: {e}")
+            self.breaker.record_failure()
+            return self._fail_open(limit, "redis_error")
+        self.breaker.record_success()
+        return self._to_result(limit, reply, client_id, method, endpoint)
+
+    async def ahit(self, client_id: str, method: str, endpoint: str, cost: int = 1, role: str = None) -> RateLimitResult:
+        """
+        Async hit for the middleware: same EVALSHA on redis.asyncio, abandoned
+        after `deadline` seconds. Fails open on timeout, Redis errors or an open breaker.
+        """
+        limit = self.get_limit(method, endpoint, role)
+        cost = min(cost, limit)
+        if not self.breaker.allow():
+            return self._fail_open(limit, "breaker_open")
         key = self._get_key(client_id, method, endpoint)
-        
         try:
-            # Use Redis for tracking
-            current = self.redis.incr(key)
-            
-            # Set expiry on first request
-            if current == 1:
-                self.redis.expire(key, 60)  # 60 second window
-                
-            if current > limit:
-                logger.warning(f"Rate limit exceeded for {client_id} on {method} {endpoint}")
-                return False, 0
-                
-            remaining = limit - current
-            return True, remaining
-            
+            reply = await asyncio.wait_for(
+                self._agcra(keys=[key], args=[limit, self.period * 1000, cost]), self.deadline
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Rate limiter gave up on Redis after {self.deadline * 1000:.0f} ms")
+            self.breaker.record_failure()
+            return self._fail_open(limit, "timeout")
         except redis.RedisError as e:
             logger.error(f"Redis error in rate limiter: {e}")
-            # Fallback to allowing request
-            return True, 0
+            self.breaker.record_failure()
+            return self._fail_open(limit, "redis_error")
+        self.breaker.record_success()
+        return self._to_result(limit, reply, client_id, method, endpoint)
+
+    def charge(self, identity: ClientIdentity, method: str, endpoint: str, cost: int = 1) -> RateLimitResult:
+        """
+        Charges a request to its identity's bucket. Token holders are first
+        charged to their address's bucket at the "ceiling" tier; a denial there wins.
+        """
+        if identity.key != identity.ip:
+            ceiling = self.hit(identity.ip, method, endpoint, cost, CEILING)
+            if not ceiling.allowed:
+                return ceiling
+        return self.hit(identity.key, method, endpoint, cost, identity.role)
+
+    async def acharge(self, identity: ClientIdentity, method: str, endpoint: str, cost: int = 1) -> RateLimitResult:
+        """charge on redis.asyncio"""
+        if identity.key != identity.ip:
+            ceiling = await self.ahit(identity.ip, method, endpoint, cost, CEILING)
+            if not ceiling.allowed:
+                return ceiling
+        return await self.ahit(identity.key, method, endpoint, cost, identity.role)
+
+    def check_rate_limit(self, request: Request) -> RateLimitResult:
+        """
+        Check if request should be rate limited (identity and tier only; the
+        body is not read, so every request costs 1).
+        """
+        identity = identity_resolver.resolve(request)
+        return self.charge(identity, request.method, request.url.path)
+
+    async def acheck_rate_limit(self, request: Request) -> RateLimitResult:
+        identity = identity_resolver.resolve(request)
+        cost = await self.request_cost(request)
+        return await self.acharge(identity, request.method, request.url.path, cost)
+
+    async def acheck_message(self, connection: HTTPConnection, endpoint: str, payload) -> RateLimitResult:
+        """
+        Charges one WebSocket message as a POST of `payload` to `endpoint`.
+        The HTTP middleware never sees WebSocket traffic, so socket handlers call this per message.
+        """
+        identity = identity_resolver.resolve(connection)
+        cost = self.payload_cost(endpoint, payload)
+        return await self.acharge(identity, "POST", endpoint, cost)
+
+    async def aclose(self):
+        """Closes both clients and disconnects their pools (app shutdown)."""
+        self.redis.connection_pool.disconnect()
+        await self.aredis.aclose(close_connection_pool=True)
+
+    def _fail_open(self, limit: int, reason: str) -> RateLimitResult:
+        RATE_LIMIT_FAIL_OPEN.labels(reason=reason).inc()
+        return RateLimitResult(True, limit, 0, 0.0, 0.0)
+
+    def _to_result(self, limit, reply, client_id, method, endpoint) -> RateLimitResult:
+        allowed, remaining, retry_ms, reset_ms = reply
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {client_id} on {method} {endpoint}")
+        return RateLimitResult(bool(allowed), limit, int(remaining), retry_ms / 1000, reset_ms / 1000)
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "denied_until", "denied_cost", "result")
+
+    def __init__(self, tokens, expires_at, denied_until, result, denied_cost=0):
+        self.tokens = tokens              # Leased tokens not yet spent locally
+        self.expires_at = expires_at      # monotonic; unspent tokens are dropped after this
+        self.denied_until = denied_until  # monotonic; Redis said no until then
+        self.denied_cost = denied_cost    # ...to a request this expensive; cheaper ones may still fit
+        self.result = result              # RateLimitResult of the lease call
+
+class LeasedRateLimiter:
+    """
+    Per-worker pre-filter in front of RateLimiter. Instead of one Redis call per
+    request, a worker takes `chunk` tokens from the shared GCRA bucket at once
+    and spends them locally; denials are also remembered until Retry-After.
+    Redis sees roughly one call per chunk.
+
+    Accuracy: leased tokens are already debited in Redis, so the global limit
+    is never exceeded. The cost is under-admission: each worker can strand at
+    most chunk - 1 tokens per bucket for up to the lease TTL. chunk is capped
+    at max_fraction of the route's limit, so with W workers a client can lose
+    at most W * max_fraction of its limit per lease TTL.
+    """
+
+    def __init__(self, limiter, lease_size=None, lease_ttl_ms=None, max_fraction=None, max_buckets=10000):
+        """
+        Args:
+            limiter (RateLimiter): Shared limiter leases are taken from
+            lease_size (int): Tokens per lease (RATE_LIMIT_LEASE_SIZE, 10; 1 = exact, no leasing)
+            lease_ttl_ms (int): Lifetime of unspent leased tokens (RATE_LIMIT_LEASE_TTL_MS, 1000)
+            max_fraction (float): Cap on a lease as a share of the limit (RATE_LIMIT_LEASE_MAX_FRACTION, 0.1)
+            max_buckets (int): Local buckets kept before the least recently used is dropped
+        """
+        self.limiter = limiter
+        self.lease_size = lease_size or get_int_env("RATE_LIMIT_LEASE_SIZE", 10)
+        self.lease_ttl = (lease_ttl_ms or get_int_env("RATE_LIMIT_LEASE_TTL_MS", 1000)) / 1000
+        self.max_fraction = max_fraction or float(get_env_variable("RATE_LIMIT_LEASE_MAX_FRACTION", "0.1"))
+        self.max_buckets = max_buckets
+        self._leases = OrderedDict()
+
+    def chunk_for(self, limit: int, cost: int = 1) -> int:
+        """Tokens to lease for a route with this limit"""
+        return max(cost, min(self.lease_size, int(limit * self.max_fraction)))
+
+    def hit(self, client_id: str, method: str, endpoint: str, cost: int = 1, role: str = None) -> RateLimitResult:
+        key = self.limiter._get_key(client_id, method, endpoint)
+        limit = self.limiter.get_limit(method, endpoint, role)
+        cost = min(cost, limit)
+        now = time.monotonic()
+        result = self._local(key, cost, now)
+        if result is not None:
+            return result
+
+        chunk = self.chunk_for(limit, cost)
+        result = self.limiter.hit(client_id, method, endpoint, cost=chunk, role=role)
+        if not result.allowed and chunk > cost:
+            # Not enough left for a whole chunk; fall back to exactly this request
+            chunk = cost
+            result = self.limiter.hit(client_id, method, endpoint, cost=cost, role=role)
+        return self._store(key, now, chunk, cost, result)
+
+    async def ahit(self, client_id: str, method: str, endpoint: str, cost: int = 1, role: str = None) -> RateLimitResult:
+        key = self.limiter._get_key(client_id, method, endpoint)
+        limit = self.limiter.get_limit(method, endpoint, role)
+        cost = min(cost, limit)
+        now = time.monotonic()
+        result = self._local(key, cost, now)
+        if result is not None:
+            return result
+
+        chunk = self.chunk_for(limit, cost)
+        result = await self.limiter.ahit(client_id, method, endpoint, cost=chunk, role=role)
+        if not result.allowed and chunk > cost:
+            chunk = cost
+            result = await self.limiter.ahit(client_id, method, endpoint, cost=cost, role=role)
+        return self._store(key, now, chunk, cost, result)
+
+    def _local(self, key, cost, now):
+        """Decision from the local lease, or None if Redis has to be asked"""
+        lease = self._leases.get(key)
+        if lease is None or lease.expires_at <= now:
+            return None
+        self._leases.move_to_end(key)
+        if lease.denied_until > now:
+            if cost < lease.denied_cost:
+                return None
+            return lease.result._replace(retry_after=lease.denied_until - now)
+        if lease.tokens >= cost:
+            lease.tokens -= cost
+            return lease.result._replace(remaining=lease.result.remaining + lease.tokens)
+        return None
+
+    def _store(self, key, now, chunk, cost, result):
+        if result.allowed:
+            lease = _Lease(chunk - cost, now + self.lease_ttl, 0.0, result)
+        else:
+            lease = _Lease(0, now + result.retry_after, now + result.retry_after, result, cost)
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_buckets:
+            self._leases.popitem(last=False)
+        return result._replace(remaining=result.remaining + lease.tokens)
+
+    def charge(self, identity: ClientIdentity, method: str, endpoint: str, cost: int = 1) -> RateLimitResult:
+        """RateLimiter.charge, with both buckets leased"""
+        if identity.key != identity.ip:
+            ceiling = self.hit(identity.ip, method, endpoint, cost, CEILING)
+            if not ceiling.allowed:
+                return ceiling
+        return self.hit(identity.key, method, endpoint, cost, identity.role)
+
+    async def acharge(self, identity: ClientIdentity, method: str, endpoint: str, cost: int = 1) -> RateLimitResult:
+        if identity.key != identity.ip:
+            ceiling = await self.ahit(identity.ip, method, endpoint, cost, CEILING)
+            if not ceiling.allowed:
+                return ceiling
+        return await self.ahit(identity.key, method, endpoint, cost, identity.role)
+
+    def check_rate_limit(self, request: Request) -> RateLimitResult:
+        """
+        Check if request should be rate limited, deciding locally when possible.
+        """
+        identity = identity_resolver.resolve(request)
+        return self.charge(identity, request.method, request.url.path)
+
+    async def acheck_rate_limit(self, request: Request) -> RateLimitResult:
+        identity = identity_resolver.resolve(request)
+        cost = await self.limiter.request_cost(request)
+        return await self.acharge(identity, request.method, request.url.path, cost)
+
+    async def acheck_message(self, connection: HTTPConnection, endpoint: str, payload) -> RateLimitResult:
+        identity = identity_resolver.resolve(connection)
+        cost = self.limiter.payload_cost(endpoint, payload)
+        return await self.acharge(identity, "POST", endpoint, cost)
 
 rate_limiter = RateLimiter()
+local_rate_limiter = LeasedRateLimiter(rate_limiter)
+
+def rate_limit_headers(result: RateLimitResult) -> Dict[str, str]:
+    """X-RateLimit-* headers, plus Retry-After (whole seconds, rounded up) when denied"""
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(time.time() + result.reset_after)),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(result.retry_after)))
+    return headers
 
 async def rate_limit_middleware(request: Request, call_next):
     """Middleware to enforce rate limiting"""
-    is_allowed, remaining = rate_limiter.check_rate_limit(request)
-    
-    if not is_allowed:
-        raise HTTPException(
+    result = await local_rate_limiter.acheck_rate_limit(request)
+
+    if not result.allowed:
+        # Exceptions raised here bypass the app's exception handlers, so answer directly
+        return JSONResponse(
             status_code=429,
-            detail={
-                "error": "Too many requests",
-                "retry_after": "60 seconds"
-            }
+            content={
+                "detail": {
+                    "error": "Too many requests",
+                    "retry_after": f"{max(1, math.ceil(result.retry_after))} seconds"
+                }
+            },
+            headers=rate_limit_headers(result)
         )
-    
+
     response = await call_next(request)
-    
+
     # Add rate limit headers
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 60)
-    
-    return response
\ No newline at end of file
+    response.headers.update(rate_limit_headers(result))
+
+    return response
@@ -0,0 +1,122 @@
+from fastapi.requests import HTTPConnection
+from typing import NamedTuple, Optional
+import ipaddress
+import logging
+from jose import JWTError
+from api.services import token_service
+from shared.config.env_loader import get_env_variable
+from shared.users.user_identity import UserIdentity
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS = "anonymous"
+# Role of a valid token whose user was not verified at login (UserIdentity's default)
+UNVERIFIED = "guest"
+
+class ClientIdentity(NamedTuple):
+    key: str    # "user:<sub>" with a valid token, else "ip:<client address>"
+    role: str   # UserIdentity role of a verified user, "guest" for other tokens, "anonymous" without one
+    ip: str     # "ip:<client address>", the per-address ceiling every request is also charged to
+
+def parse_networks(value: str):
+    """
+    Parses "10.0.0.0/8, 172.16.0.1" into ip_network objects.
+
+    Raises:
+        ValueError: On an entry that is not an address or CIDR range
+    """
+    networks = []
+    for part in filter(None, (p.strip() for p in (value or "").split(","))):
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            raise ValueError(f"❌ Invalid RATE_LIMIT_TRUSTED_PROXIES entry: '{part}'")
+    return networks
+
+class IdentityResolver:
+    """
+    Works out who a request is from, for rate limiting.
+
+    - A Bearer token from /api/auth/login (token_service, JWT_SECRET) identifies the user by its `sub`
+      (or `email`) claim. The role comes from UserIdentity only when the token
+      is marked verified (token_service.VERIFIED_CLAIM); anyone can get a token
+      for any name, so a bare subject is only a guest. Invalid or expired
+      tokens are ignored rather than rejected, auth is enforced by the routes.
+    - Otherwise the client IP is used. X-Forwarded-For is only believed when
+      the peer is a trusted proxy (RATE_LIMIT_TRUSTED_PROXIES); the chain is
+      walked right to left and the first untrusted hop is the client, so a
+      client cannot pick its own address by sending the header itself.
+    """
+
+    def __init__(self, trusted_proxies=None, secret=None, users=None):
+        """
+        Args:
+            trusted_proxies (str): Comma-separated addresses/CIDRs of our load balancers
+            secret (str): JWT signing secret; defaults to the one login signs with (JWT_SECRET)
+            users (UserIdentity): Role lookup
+        """
+        if trusted_proxies is None:
+            trusted_proxies = get_env_variable("RATE_LIMIT_TRUSTED_PROXIES", "")
+        self.trusted_proxies = parse_networks(trusted_proxies)
+        self.secret = secret
+        self.users = users or UserIdentity()
+
+    def is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_ip(self, request: HTTPConnection) -> str:
+        address = request.client.host if request.client else "unknown"
+        if not self.is_trusted(address):
+            return address
+        forwarded = request.headers.get("x-forwarded-for", "")
+        for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+            try:
+                ipaddress.ip_address(hop)
+            except ValueError:
+                # Garbage in the chain; don't trust anything left of it
+                break
+            address = hop
+            if not self.is_trusted(hop):
+                break
+        return address
+
+    def claims(self, request: HTTPConnection, token: str = None) -> Optional[dict]:
+        """Claims of a valid token (`token`, else the Bearer header), or None"""
+        if token is None:
+            auth = request.headers.get("authorization", "")
+            token = auth[len("Bearer "):] if auth.startswith("Bearer ") else ""
+        secret = self.secret if self.secret is not None else token_service.SECRET_KEY
+        if not secret or not token:
+            return None
+        try:
+            return token_service.decode_token(token, secret)
+        except JWTError:
+            return None
+
+    def subject(self, request: HTTPConnection, token: str = None) -> Optional[str]:
+        """`sub` (or `email`) of a valid token, or None"""
+        return subject_of(self.claims(request, token))
+
+    def role(self, claims: dict) -> str:
+        """UserIdentity role for verified tokens, "guest" for any other valid token"""
+        if claims.get(token_service.VERIFIED_CLAIM) is not True:
+            return UNVERIFIED
+        return self.users.get_role(subject_of(claims))
+
+    def resolve(self, request: HTTPConnection) -> ClientIdentity:
+        ip = f"ip:{self.client_ip(request)}"
+        claims = self.claims(request)
+        subject = subject_of(claims)
+        if subject:
+            return ClientIdentity(f"user:{subject}", self.role(claims), ip)
+        return ClientIdentity(ip, ANONYMOUS, ip)
+
+def subject_of(claims: Optional[dict]) -> Optional[str]:
+    subject = (claims or {}).get("sub") or (claims or {}).get("email")
+    return str(subject) if subject else None
+
+identity_resolver = IdentityResolver()
@@ -0,0 +1,101 @@
+import json
+import logging
+import math
+import time
+from typing import AsyncIterator, Callable
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from core.monitoring.metrics import AGENT_TIME_TO_FIRST_TOKEN
+from core.utils import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+class StreamPromptInput(BaseModel):
+    prompt: str
+    max_tokens: int = Field(500, ge=1, le=4096)
+
+async def timed_deltas(agent: str, deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Passes deltas through, recording time to the first non-empty one per agent"""
+    start = time.perf_counter()
+    first = True
+    async for delta in deltas:
+        if not delta:
+            continue
+        if first:
+            AGENT_TIME_TO_FIRST_TOKEN.labels(agent=agent.lower()).observe(time.perf_counter() - start)
+            first = False
+        yield delta
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(agent: str, deltas: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Server-Sent Events response: one `token` event per delta ({"delta": ...}),
+    then `done` with the full response, or `error` if the agent failed.
+    """
+    async def events():
+        parts = []
+        try:
+            async for delta in timed_deltas(agent, deltas):
+                parts.append(delta)
+                yield sse_event("token", {"delta": delta})
+        except Exception as e:
+            logger.error(f"{agent} stream failed: {e}")
+            yield sse_event("error", {"detail": f"{agent} stream failed"})
+            return
+        yield sse_event("done", {"agent": agent, "response": "".join(parts)})
+
+    # X-Accel-Buffering stops nginx from holding tokens back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def serve_stream_socket(
+    websocket: WebSocket,
+    agent: str,
+    stream: Callable[[StreamPromptInput], AsyncIterator[str]]
+):
+    """
+    WebSocket variant: each {"prompt": ..., "max_tokens": ...} message from the
+    client is answered with {"type": "token", "delta": ...} messages and a
+    final {"type": "done", "response": ...}. Prompts are handled one at a time.
+
+    Each prompt is charged like a POST to the matching SSE endpoint (".../ws"
+    -> ".../stream"), sharing its bucket, limit and max_tokens cost. A denied
+    prompt gets {"type": "error", "retry_after": ...} and is not run.
+    """
+    endpoint = websocket.url.path.removesuffix("/ws") + "/stream"
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = StreamPromptInput(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            limit = await rate_limiter.local_rate_limiter.acheck_message(websocket, endpoint, request.model_dump())
+            if not limit.allowed:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "Too many requests",
+                    "retry_after": max(1, math.ceil(limit.retry_after))
+                })
+                continue
+            parts = []
+            try:
+                async for delta in timed_deltas(agent, stream(request)):
+                    parts.append(delta)
+                    await websocket.send_json({"type": "token", "delta": delta})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"{agent} stream failed: {e}")
+                await websocket.send_json({"type": "error", "detail": f"{agent} stream failed"})
+                continue
+            await websocket.send_json({"type": "done", "agent": agent, "response": "".join(parts)})
+    except WebSocketDisconnect:
+        logger.info(f"{agent} stream client disconnected")
@@ -1,17 +1,94 @@
 import asyncio
+import json
 import logging
-from typing import Dict, Set, Any
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
+from shared.config.env_loader import get_env_variable, get_int_env
+from core.monitoring.metrics import WS_CONNECTIONS, WS_DROPPED_MESSAGES
 
 logger = logging.getLogger(__name__)
 
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+BACKPRESSURE_POLICIES = (DROP_OLDEST, DISCONNECT)
+
+# Close code for clients cut off for not keeping up ("try again later")
+CLOSE_SLOW_CONSUMER = 1013
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """Encodes a message as a text frame, the way WebSocket.send_json would."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def select_frame(message: Dict[str, Any], selector: Callable[[Dict[str, Any]], bool]) -> Optional[str]:
+    """Encodes the part of a message (or of a batch's events) the selector accepts, or None"""
+    if message.get("type") == "batch":
+        events = [event for event in message["events"] if selector(event)]
+        if not events:
+            return None
+        return encode_message(events[0] if len(events) == 1 else {"type": "batch", "events": events})
+    return encode_message(message) if selector(message) else None
+
+class Outbox:
+    """
+    Bounded queue of encoded frames for one connection. Only its writer task
+    sends on the socket, so nothing else ever waits on a slow client.
+    """
+    __slots__ = ("frames", "ready", "writer", "topics", "selectors", "slot")
+
+    def __init__(self, size, slot):
+        self.frames = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.writer = None
+        self.topics: Set[str] = set()
+        self.selectors: Dict[str, Callable] = {}   # topic -> filter, for filtered subscriptions
+        self.slot = slot        # Heartbeat wheel slot
+
 class ConnectionManager:
-    def __init__(self):
+    """
+    The WebSocket hub: every fan-out socket in the app is registered here
+    (per-request agent token streams are answered directly, see core.utils.streaming).
+
+    broadcast() and publish() encode a message once and append the frame to
+    each recipient's Outbox without awaiting any socket; each connection's
+    writer task drains its own queue. When a queue is full the backpressure
+    policy decides: "drop_oldest" discards the oldest queued frame,
+    "disconnect" closes the slow consumer (code 1013). A single send taking
+    longer than send_timeout also disconnects the client.
+
+    Registration, topic subscription and removal are dict/set operations.
+    Heartbeats come from one timer wheel: connections are spread over
+    `heartbeat_slots` slots and a single task visits one slot per
+    heartbeat_interval / heartbeat_slots, so each client still gets a
+    heartbeat every heartbeat_interval without a task of its own.
+    """
+
+    def __init__(self, queue_size=None, policy=None, send_timeout_ms=None, heartbeat_interval=None, heartbeat_slots=30):
+        """
+        Args:
+            queue_size (int): Frames buffered per client (WS_QUEUE_SIZE, 256)
+            policy (str): "drop_oldest" or "disconnect" (WS_BACKPRESSURE, drop_oldest)
+            send_timeout_ms (int): Longest a single send may take (WS_SEND_TIMEOUT_MS, 5000)
+            heartbeat_interval (float): Seconds between heartbeats per client (WS_HEARTBEAT_INTERVAL, 30)
+            heartbeat_slots (int): Slots on the heartbeat wheel
+        """
+        self.queue_size = queue_size or get_int_env("WS_QUEUE_SIZE", 256)
+        self.policy = policy or get_env_variable("WS_BACKPRESSURE", DROP_OLDEST)
+        if self.policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"❌ Unknown WS_BACKPRESSURE policy: '{self.policy}'")
+        self.send_timeout = (send_timeout_ms or get_int_env("WS_SEND_TIMEOUT_MS", 5000)) / 1000
+        self.heartbeat_interval = heartbeat_interval or get_int_env("WS_HEARTBEAT_INTERVAL", 30)
         self.active_connections: Dict[str, WebSocket] = {}
         self.connection_stats: Dict[str, Dict[str, Any]] = {}
-        self.heartbeat_tasks: Dict[str, asyncio.Task] = {}
-        
+        self.outboxes: Dict[str, Outbox] = {}
+        self.topics: Dict[str, Set[str]] = {}     # topic -> subscribed client ids
+        self._wheel = [set() for _ in range(heartbeat_slots)]
+        self._next_slot = 0
+        self._wheel_task = None
+        self._closing: Set[asyncio.Task] = set()
+
     async def connect(self, websocket: WebSocket, client_id: str):
         """Handle new WebSocket connection"""
         try:
@@ -21,81 +98,291 @@ class ConnectionManager:
                 "connected_at": datetime.utcnow(),
                 "messages_received": 0,
                 "messages_sent": 0,
+                "messages_dropped": 0,
                 "last_heartbeat": datetime.utcnow()
             }
-            
-            # Start heartbeat for this connection
-            self.heartbeat_tasks[client_id] = asyncio.create_task(
-                self._heartbeat_loop(client_id)
-            )
-            
+            outbox = self.outboxes[client_id] = Outbox(self.queue_size, self._next_slot)
+            outbox.writer = asyncio.create_task(self._writer_loop(client_id, websocket, outbox))
+
+            # Put this connection on the next heartbeat slot
+            self._wheel[outbox.slot].add(client_id)
+            self._next_slot = (self._next_slot + 1) % len(self._wheel)
+            if self._wheel_task is None or self._wheel_task.done():
+                self._wheel_task = asyncio.create_task(self._heartbeat_wheel())
+            WS_CONNECTIONS.inc()
+
             logger.info(f"New WebSocket connection: {client_id}")
-            
+
         except Exception as e:
             logger.error(f"Connection error: {e}")
             await self.disconnect(client_id)
-            
-    async def disconnect(self, client_id: str):
+
+    async def disconnect(self, client_id: str, code: int = 1000):
         """Handle WebSocket disconnection"""
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].close()
-            except Exception as e:
-                logger.error(f"Error closing connection: {e}")
-            finally:
-                # Cleanup
-                if client_id in self.heartbeat_tasks:
-                    self.heartbeat_tasks[client_id].cancel()
-                    del self.heartbeat_tasks[client_id]
-                del self.active_connections[client_id]
-                del self.connection_stats[client_id]
-                logger.info(f"Client disconnected: {client_id}")
-                
+        websocket = self.active_connections.pop(client_id, None)
+        if websocket is None:
+            return
+        # Cleanup first, so nothing is queued for a closing socket
+        current = asyncio.current_task()
+        outbox = self.outboxes.pop(client_id)
+        if outbox.writer is not None and outbox.writer is not current:
+            outbox.writer.cancel()
+        self._wheel[outbox.slot].discard(client_id)
+        for topic in outbox.topics:
+            self._leave(topic, client_id)
+        del self.connection_stats[client_id]
+        WS_CONNECTIONS.dec()
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception as e:
+            logger.error(f"Error closing connection: {e}")
+        logger.info(f"Client disconnected: {client_id}")
+
+    def send(self, client_id: str, message: Dict[str, Any]) -> bool:
+        """
+        Queues a message for one client.
+
+        Returns:
+            bool: False if the client is unknown or was cut off as a slow consumer
+        """
+        return self.send_text(client_id, encode_message(message))
+
+    def send_text(self, client_id: str, frame: str) -> bool:
+        outbox = self.outboxes.get(client_id)
+        if outbox is None:
+            return False
+        if self._enqueue(client_id, outbox, frame):
+            return True
+        self._disconnect_later(client_id)
+        return False
+
+    def subscribe(self, client_id: str, topic: str, selector: Callable[[Dict[str, Any]], bool] = None) -> bool:
+        """
+        Adds a client to a topic (e.g. "system", "agent:neuroweave").
+
+        Args:
+            selector: Optional server-side filter on the topic's messages. It should
+                be hashable by value, so clients with equal filters share one encoding.
+                Without one, an existing filter for the topic is kept.
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is None:
+            return False
+        outbox.topics.add(topic)
+        if selector is not None:
+            outbox.selectors[topic] = selector
+        self.topics.setdefault(topic, set()).add(client_id)
+        return True
+
+    def unsubscribe(self, client_id: str, topic: str):
+        outbox = self.outboxes.get(client_id)
+        if outbox is not None and topic in outbox.topics:
+            outbox.topics.discard(topic)
+            outbox.selectors.pop(topic, None)
+            self._leave(topic, client_id)
+
+    def _leave(self, topic: str, client_id: str):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client_id)
+            if not subscribers:
+                del self.topics[topic]
+
+    def publish(self, topic: str, message: Dict[str, Any]) -> int:
+        """
+        Queues a message for the topic's subscribers. It is encoded once, plus
+        once per distinct selector among filtered subscriptions.
+
+        Returns:
+            int: Number of clients it was queued for
+        """
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+        frame = None
+        selected: Dict[Callable, Optional[str]] = {}
+        slow = []
+        queued = 0
+        for client_id in subscribers:
+            outbox = self.outboxes[client_id]
+            selector = outbox.selectors.get(topic) if outbox.selectors else None
+            if selector is None:
+                if frame is None:
+                    frame = encode_message(message)
+                client_frame = frame
+            else:
+                if selector not in selected:
+                    selected[selector] = select_frame(message, selector)
+                client_frame = selected[selector]
+                if client_frame is None:
+                    continue
+            if self._enqueue(client_id, outbox, client_frame):
+                queued += 1
+            else:
+                slow.append(client_id)
+        for client_id in slow:
+            self._disconnect_later(client_id)
+        return queued
+
     async def broadcast(self, message: Dict[str, Any], exclude: Set[str] = None):
-        """Broadcast message to all connected clients"""
+        """Broadcast message to all connected clients (encoded once, never waits on a socket)"""
+        frame = encode_message(message)
         exclude = exclude or set()
-        disconnected = []
-        
-        for client_id, websocket in self.active_connections.items():
-            if client_id not in exclude:
-                try:
-                    await websocket.send_json(message)
-                    self.connection_stats[client_id]["messages_sent"] += 1
-                except Exception as e:
-                    logger.error(f"Broadcast error for {client_id}: {e}")
-                    disconnected.append(client_id)
-                    
-        # Cleanup disconnected clients
-        for client_id in disconnected:
+        slow = [
+            client_id
+            for client_id, outbox in self.outboxes.items()
+            if client_id not in exclude and not self._enqueue(client_id, outbox, frame)
+        ]
+        for client_id in slow:
+            self._disconnect_later(client_id)
+
+    def _enqueue(self, client_id: str, outbox: Outbox, frame: str) -> bool:
+        """Appends a frame, applying the backpressure policy; False = disconnect the client"""
+        if len(outbox.frames) == self.queue_size:
+            if self.policy == DISCONNECT:
+                WS_DROPPED_MESSAGES.labels(reason="slow_consumer").inc()
+                return False
+            # deque(maxlen) discards the oldest frame on append
+            WS_DROPPED_MESSAGES.labels(reason="queue_full").inc()
+            self.connection_stats[client_id]["messages_dropped"] += 1
+        outbox.frames.append(frame)
+        outbox.ready.set()
+        return True
+
+    def _disconnect_later(self, client_id: str):
+        """Closes a slow consumer in the background; the close itself may be slow."""
+        logger.warning(f"Disconnecting slow WebSocket consumer: {client_id}")
+        task = asyncio.create_task(self.disconnect(client_id, code=CLOSE_SLOW_CONSUMER))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _writer_loop(self, client_id: str, websocket: WebSocket, outbox: Outbox):
+        """Drains one client's queue; the only place that sends on its socket"""
+        try:
+            while True:
+                while not outbox.frames:
+                    outbox.ready.clear()
+                    await outbox.ready.wait()
+                frame = outbox.frames.popleft()
+                # asyncio.timeout, unlike wait_for, doesn't spawn a task per send
+                async with asyncio.timeout(self.send_timeout):
+                    await websocket.send_text(frame)
+                stats = self.connection_stats.get(client_id)
+                if stats is not None:
+                    stats["messages_sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except (WebSocketDisconnect, asyncio.TimeoutError) as e:
+            logger.info(f"Send to {client_id} failed ({type(e).__name__}), dropping connection")
             await self.disconnect(client_id)
-            
-    async def _heartbeat_loop(self, client_id: str):
-        """Send periodic heartbeats to maintain connection"""
+        except Exception as e:
+            logger.error(f"Send error for {client_id}: {e}")
+            await self.disconnect(client_id)
+
+    async def _heartbeat_wheel(self):
+        """Single heartbeat task: one wheel slot per tick, one encoded frame per slot"""
+        tick = self.heartbeat_interval / len(self._wheel)
+        position = 0
         while True:
-            try:
-                if client_id not in self.active_connections:
+            await asyncio.sleep(tick)
+            position = (position + 1) % len(self._wheel)
+            slot = self._wheel[position]
+            if not slot:
+                continue
+            now = datetime.utcnow()
+            frame = encode_message({"type": "heartbeat", "timestamp": now.isoformat()})
+            for client_id in list(slot):
+                if self.send_text(client_id, frame):
+                    self.connection_stats[client_id]["last_heartbeat"] = now
+
+    async def attach(self, bus):
+        """Delivers everything published on an EventBus (from any worker) to topic subscribers."""
+        await bus.start(self.dispatch)
+
+    async def dispatch(self, events):
+        """
+        Hands one tick's events to subscribers: a topic with a single event gets
+        that message, one with several gets one {"type": "batch", "events": [...]}
+        frame, so a burst costs each client one frame per topic.
+        """
+        by_topic: Dict[str, list] = {}
+        for event in events:
+            by_topic.setdefault(event.topic, []).append(event.message())
+        for topic, messages in by_topic.items():
+            self.publish(topic, messages[0] if len(messages) == 1 else {"type": "batch", "events": messages})
+
+    async def serve(
+        self,
+        websocket: WebSocket,
+        client_id: str = None,
+        topics: Iterable[str] = (),
+        initial: Iterable[Dict[str, Any]] = (),
+        selectors: Dict[str, Callable] = None
+    ):
+        """
+        Runs a client connection until it goes away: registers it, queues the
+        `initial` messages, subscribes it to `topics` (filtered by `selectors`
+        per topic, if given) and handles what the client sends:
+            "ping"                                   -> {"type": "pong"}
+            {"action": "subscribe", "topic": "..."}  -> subscribe (likewise "unsubscribe")
+        The `selectors` stay in force for the whole connection, also when the
+        client unsubscribes and subscribes to a topic again.
+        """
+        client_id = client_id or uuid.uuid4().hex
+        await self.connect(websocket, client_id)
+        if client_id not in self.active_connections:
+            return
+        for message in initial:
+            self.send(client_id, message)
+        selectors = selectors or {}
+        for topic in topics:
+            self.subscribe(client_id, topic, selectors.get(topic))
+        try:
+            while True:
+                data = await websocket.receive_text()
+                stats = self.connection_stats.get(client_id)
+                if stats is None:
                     break
-                    
-                websocket = self.active_connections[client_id]
-                await websocket.send_json({
-                    "type": "heartbeat",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                
-                self.connection_stats[client_id]["last_heartbeat"] = datetime.utcnow()
-                await asyncio.sleep(30)  # Heartbeat every 30 seconds
-                
-            except Exception as e:
-                logger.error(f"Heartbeat error for {client_id}: {e}")
-                await self.disconnect(client_id)
-                break
-                
+                stats["messages_received"] += 1
+                self._handle_client_message(client_id, data, selectors)
+        except WebSocketDisconnect:
+            logger.info(f"WebSocket client disconnected: {client_id}")
+        except Exception as e:
+            logger.error(f"WebSocket error for {client_id}: {e}")
+        finally:
+            await self.disconnect(client_id)
+
+    def _handle_client_message(self, client_id: str, data: str, selectors: Dict[str, Callable]):
+        if data == "ping":
+            self.send(client_id, {"type": "pong", "timestamp": datetime.utcnow().isoformat()})
+            return
+        try:
+            command = json.loads(data)
+        except ValueError:
+            return
+        if not isinstance(command, dict) or not isinstance(command.get("topic"), str):
+            return
+        if command.get("action") == "subscribe":
+            self.subscribe(client_id, command["topic"], selectors.get(command["topic"]))
+        elif command.get("action") == "unsubscribe":
+            self.unsubscribe(client_id, command["topic"])
+
+    async def close_all(self):
+        """Disconnects every client and stops the heartbeat wheel (app shutdown)."""
+        await asyncio.gather(*(self.disconnect(client_id, code=1001) for client_id in list(self.active_connections)))
+        if self._wheel_task is not None:
+            self._wheel_task.cancel()
+            self._wheel_task = None
+
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get current WebSocket connection statistics"""
         return {
             "total_connections": len(self.active_connections),
+            "backpressure_policy": self.policy,
+            "queued_frames": sum(len(outbox.frames) for outbox in self.outboxes.values()),
+            "topics": {topic: len(subscribers) for topic, subscribers in self.topics.items()},
             "connections": self.connection_stats
         }
 
 # Global WebSocket manager instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -13,20 +13,30 @@ Responsibilities:
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import logging
 import time
 
 from .version import __version__
 from .core.utils.error_handlers import setup_error_handlers
 from .core.utils.logger import setup_logging
-from .core.utils.rate_limiter import rate_limit_middleware
+from .core.utils.rate_limiter import rate_limit_middleware, rate_limiter
+from shared.memory.sql_memory_engine import init_engine, dispose_engine
+from shared.memory.async_sql_memory_engine import dispose_async_engine
+from shared.memory.encrypted_memory_engine import reencrypt_records
+from shared.memory.memory_sweeper import run_expiry_sweeper
+from shared.config.env_loader import get_bool_env
+from core.cache.redis_cache import cache
+from core.utils.websocket_manager import manager as websocket_hub
+from core.events.event_bus import event_bus
+from core.utils.log_stream import live_log_handler
 
 # Import all routes
 from .api.routes import (
     auth_routes,
     chain_routes,
     log_routes,
-    mycocore_routes,
+    myocore_routes as mycocore_routes,
     neuroweave_routes,
     plugin_routes,
     rootbloom_routes,
@@ -100,10 +110,26 @@ app.mount("/", StaticFiles(directory="static", html=True), name="static")
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Starting HyphaeOS API v{__version__}")
+    # Memory DB engine + pool (and table DDL) are owned by the app lifecycle
+    init_engine()
+    if get_bool_env("FERNET_REENCRYPT_ON_STARTUP", False):
+        # Rotate rows onto the newest FERNET_KEYS entry without blocking startup
+        asyncio.get_running_loop().run_in_executor(None, reencrypt_records)
+    app.state.memory_sweeper = asyncio.create_task(run_expiry_sweeper())
+    await websocket_hub.attach(event_bus)
+    live_log_handler.start(event_bus)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down HyphaeOS API")
+    app.state.memory_sweeper.cancel()
+    dispose_engine()
+    await dispose_async_engine()
+    await cache.aclose()
+    await rate_limiter.aclose()
+    await live_log_handler.stop()
+    await websocket_hub.close_all()
+    await event_bus.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,23 @@
+"""Add expires_at to memory for per-key TTLs
+
+Revision ID: 3c4d5e6f7a81
+Revises: 2b3c4d5e6f70
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3c4d5e6f7a81'
+down_revision = '2b3c4d5e6f70'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('memory', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_memory_expires_at', 'memory', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_memory_expires_at', table_name='memory')
+    op.drop_column('memory', 'expires_at')
@@ -0,0 +1,62 @@
+"""Wrap memory values in the typed value envelope
+
+Revision ID: 2b3c4d5e6f70
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from shared.memory.value_codec import wrap_legacy, unwrap_legacy
+
+# revision identifiers, used by Alembic.
+revision = '2b3c4d5e6f70'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+memory = sa.table(
+    'memory',
+    sa.column('user', sa.String()),
+    sa.column('key', sa.String()),
+    sa.column('value', sa.Text()),
+)
+
+def _rewrite(convert):
+    # Keyset pagination over the (user, key) primary key, one UPDATE batch per page
+    bind = op.get_bind()
+    swap = (
+        sa.update(memory)
+        .where(sa.and_(
+            memory.c.user == sa.bindparam('b_user'),
+            memory.c.key == sa.bindparam('b_key'),
+        ))
+        .values(value=sa.bindparam('b_value'))
+    )
+    last = None
+    while True:
+        query = sa.select(memory.c.user, memory.c.key, memory.c.value)
+        if last is not None:
+            query = query.where(sa.tuple_(memory.c.user, memory.c.key) > last)
+        rows = bind.execute(query.order_by(memory.c.user, memory.c.key).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        updates = []
+        for user, key, value in rows:
+            converted = convert(value)
+            if converted != value:
+                updates.append({'b_user': user, 'b_key': key, 'b_value': converted})
+        if updates:
+            bind.execute(swap, updates)
+        last = (rows[-1].user, rows[-1].key)
+
+def upgrade():
+    # Legacy rows keep decoding to the same value; encrypted payloads are left as-is
+    # (EncryptedMemoryEngine still reads pre-envelope plaintext inside the ciphertext).
+    _rewrite(wrap_legacy)
+
+def downgrade():
+    _rewrite(unwrap_legacy)
@@ -1,4 +1,3 @@
-```python
 from typing import Dict, List, Optional
 from datetime import datetime
 import logging
@@ -6,11 +5,15 @@ from shared.agents.agent_base import AgentBase
 from shared.agents.cortexa_agent import CortexaAgent
 from shared.agents.daphne_agent import DaphneAgent
 from core.cache.redis_cache import cache
+from core.cache.keys import namespace_of, make_key
 from core.monitoring.metrics import AGENT_REQUESTS, AGENT_LATENCY
 import time
 
 logger = logging.getLogger(__name__)
 
+# Bump when the cached result format changes
+AGENT_CACHE_VERSION = "1"
+
 class AgentService:
     def __init__(self):
         self._agents: Dict[str, AgentBase] = {
@@ -38,9 +41,10 @@ class AgentService:
         start_time = time.time()
         
         try:
-            # Check cache first
-            cache_key = f"agent:{agent_id}:prompt:{hash(prompt)}"
-            cached_response = cache.get(cache_key)
+            # Check cache first (key is stable across workers and restarts)
+            namespace = self.cache_namespace(agent_id)
+            cache_key = make_key(namespace, await cache.ageneration(namespace), prompt)
+            cached_response = await cache.aget(cache_key)
             if cached_response:
                 AGENT_REQUESTS.labels(agent=agent_id, status="cache_hit").inc()
                 return cached_response
@@ -64,7 +68,7 @@ class AgentService:
             }
             
             # Cache successful response
-            cache.set(cache_key, result, expire=3600)
+            await cache.aset(cache_key, result, expire=3600)
             
             # Record metrics
             AGENT_REQUESTS.labels(agent=agent_id, status="success").inc()
@@ -77,6 +81,11 @@ class AgentService:
             AGENT_REQUESTS.labels(agent=agent_id, status="error").inc()
             raise
 
+    @staticmethod
+    def cache_namespace(agent_id: str) -> str:
+        """Cache namespace of one agent's responses (see cache.invalidate_namespace)"""
+        return f"{namespace_of(AgentService.process_request, AGENT_CACHE_VERSION)}:{agent_id}"
+
     async def get_agent_status(self, agent_id: str) -> Dict:
         """Get current status of an agent"""
         agent = self._agents.get(agent_id)
@@ -92,4 +101,3 @@ class AgentService:
 
 # Global service instance
 agent_service = AgentService()
-```
\ No newline at end of file
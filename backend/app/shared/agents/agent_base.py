@@ -1,3 +1,6 @@
+import asyncio
+from typing import AsyncIterator
+
 class AgentBase:
     def __init__(self, name: str):
         """
@@ -23,6 +26,22 @@ class AgentBase:
         """
         raise NotImplementedError("Agent must implement ask() method.")
 
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Streams the reply to a prompt as text deltas.
+        Agents that can produce tokens incrementally should override this;
+        by default ask() runs in a worker thread and its reply is one delta.
+
+        Args:
+            prompt (str): The input string to process
+
+        Yields:
+            str: Pieces of the response, in order
+        """
+        reply = await asyncio.to_thread(self.ask, prompt)
+        if reply:
+            yield reply
+
     def respond(self, input_text: str) -> str:
         """
         Responds to a user message or input query.
@@ -0,0 +1,31 @@
+from typing import AsyncIterator
+from shared.agents.agent_base import AgentBase
+from shared.ai.gpt_client import GPTClient
+
+class PromptAgent(AgentBase):
+    def __init__(self, name: str, system_message: str, max_tokens: int = 500):
+        """
+        A GPT agent defined only by its system prompt (Neuroweave, RootBloom, SporeLink).
+
+        Args:
+            name (str): Display name of the agent
+            system_message (str): System prompt describing the agent's role
+            max_tokens (int): Default completion budget
+        """
+        super().__init__(name=name)
+        self.system_message = system_message
+        self.max_tokens = max_tokens
+        self.gpt = GPTClient(agent=name)
+
+    def ask(self, prompt: str, max_tokens: int = None) -> str:
+        return self.gpt.ask(prompt, system_message=self.system_message, max_tokens=max_tokens or self.max_tokens)
+
+    def respond(self, input_text: str) -> str:
+        return self.ask(input_text)
+
+    async def stream(self, prompt: str, max_tokens: int = None) -> AsyncIterator[str]:
+        """Streams GPT deltas as they arrive"""
+        async for delta in self.gpt.astream(
+            prompt, system_message=self.system_message, max_tokens=max_tokens or self.max_tokens
+        ):
+            yield delta
@@ -1,7 +1,13 @@
 import os
-from openai import OpenAI
+import logging
+from openai import AsyncOpenAI, OpenAI
 from shared.config.env_loader import get_env_variable, is_test_env
 
+logger = logging.getLogger(__name__)
+
+class GPTStreamError(RuntimeError):
+    """A streamed completion could not be started or broke off midway."""
+
 class GPTClient:
     def __init__(self, agent="HyphaeOS", model="gpt-4"):
         """
@@ -19,13 +25,16 @@ class GPTClient:
             print(f"⚠️ GPTClient initialized in test mode for {agent}")
             self.api_key = "test-key"
             self.client = None
+            self.async_client = None
         else:
             try:
                 self.api_key = get_env_variable("OPENAI_API_KEY", optional=False)
                 self.client = OpenAI(api_key=self.api_key)
+                self.async_client = AsyncOpenAI(api_key=self.api_key)
             except Exception as e:
                 print(f"❌ GPTClient init failed: {e}")
                 self.client = None
+                self.async_client = None
 
     def ask(self, prompt, temperature=0.7, system_message=None, max_tokens=500):
         """
@@ -41,21 +50,70 @@ class GPTClient:
             str or None: Response string
         """
         if self.test_mode or self.client is None:
-            return f"[TEST MODE] {self.agent_name} would reply to: '{prompt}'"
-
-        messages = []
-        if system_message:
-            messages.append({"role": "system", "content": system_message})
-        messages.append({"role": "user", "content": prompt})
+            return self._test_reply(prompt)
 
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._messages(prompt, system_message),
                 temperature=temperature,
                 max_tokens=max_tokens,
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"❌ GPTClient[{self.agent_name}] failed: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    async def astream(self, prompt, temperature=0.7, system_message=None, max_tokens=500):
+        """
+        Streams the completion as it is generated (or the test-mode reply word by word).
+
+        Args:
+            Same as ask()
+
+        Yields:
+            str: Text deltas, in order
+
+        Raises:
+            GPTStreamError: If the client is not configured, the request fails or the stream breaks off
+        """
+        if self.test_mode:
+            for i, word in enumerate(self._test_reply(prompt).split(" ")):
+                yield word if i == 0 else f" {word}"
+            return
+        if self.async_client is None:
+            # Outside test mode a canned reply would look like a real completion
+            logger.error(f"GPTClient[{self.agent_name}] has no OpenAI client to stream from")
+            raise GPTStreamError(f"❌ {self.agent_name} has no OpenAI client (check OPENAI_API_KEY).")
+
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system_message),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+        except Exception as e:
+            logger.error(f"GPTClient[{self.agent_name}] stream failed: {e}")
+            raise GPTStreamError(f"❌ {self.agent_name} completion failed: {e}") from e
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logger.error(f"GPTClient[{self.agent_name}] stream interrupted: {e}")
+            raise GPTStreamError(f"❌ {self.agent_name} completion interrupted: {e}") from e
+        finally:
+            # Also runs when the caller stops early (client went away)
+            await stream.close()
+
+    def _messages(self, prompt, system_message=None):
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _test_reply(self, prompt):
+        return f"[TEST MODE] {self.agent_name} would reply to: '{prompt}'"
\ No newline at end of file
@@ -26,6 +26,36 @@ def get_env_variable(key: str, default=None, optional=True):
         raise KeyError(f"❌ Required environment variable '{key}' is missing.")
     return value
 
+def get_int_env(key: str, default: int) -> int:
+    """
+    get_int_env() 🔢
+
+    Reads an integer environment variable, falling back to `default`
+    when it is missing or blank.
+
+    Raises:
+        ValueError: If the variable is set but not an integer.
+    """
+    value = get_env_variable(key)
+    if value is None or str(value).strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"❌ Environment variable '{key}' must be an integer, got {value!r}.") from e
+
+def get_bool_env(key: str, default: bool) -> bool:
+    """
+    get_bool_env() 🔘
+
+    Reads a boolean environment variable ("1/true/yes/on" vs "0/false/no/off"),
+    falling back to `default` when it is missing or blank.
+    """
+    value = get_env_variable(key)
+    if value is None or str(value).strip() == "":
+        return default
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
 def is_test_env():
     """
     is_test_env() 🧪
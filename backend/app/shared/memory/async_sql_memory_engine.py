@@ -0,0 +1,259 @@
+from datetime import datetime
+from sqlalchemy import delete, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.monitoring.metrics import DB_POOL_IN_USE
+from shared.memory.sql_memory_engine import (
+    Base,
+    MemoryRecord,
+    engine_options,
+    ensure_sqlite_dir,
+    get_database_url,
+    instrument_pool,
+    _decode,
+    _live,
+    _page_stmt,
+    _remaining,
+    _rows,
+    _upsert_stmt,
+)
+
+# --- Async drivers for the same MEMORY_DB_URL: aiosqlite locally, asyncpg for Postgres ---
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+def to_async_url(url):
+    """
+    Rewrites a sync SQLAlchemy URL (e.g. postgresql://, sqlite:///) to its async driver.
+
+    Args:
+        url (str): Database URL as configured in MEMORY_DB_URL
+
+    Returns:
+        str: URL using the matching async DBAPI
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for '{parsed.get_backend_name()}'")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+AsyncSessionLocal = async_sessionmaker(expire_on_commit=False)  # Bound by init_async_engine()
+
+async_engine = None
+_schema_ready = False
+
+def init_async_engine(url=None):
+    """
+    Creates the async memory engine and binds AsyncSessionLocal to it.
+    The memory table is created on first use.
+
+    Args:
+        url (str): Async database URL (defaults to MEMORY_DB_URL rewritten by to_async_url)
+
+    Returns:
+        AsyncEngine: The new engine
+    """
+    global async_engine, _schema_ready
+    url = url or to_async_url(get_database_url())
+    ensure_sqlite_dir(url)
+    async_engine = create_async_engine(
+        url, **engine_options(url, pool_class=AsyncAdaptedQueuePool, label="memory_async")
+    )
+    instrument_pool(async_engine.sync_engine, "memory_async")
+    AsyncSessionLocal.configure(bind=async_engine)
+    _schema_ready = False
+    return async_engine
+
+def get_async_engine():
+    """
+    Returns the async memory engine, creating it on first use.
+    """
+    if async_engine is None:
+        init_async_engine()
+    return async_engine
+
+async def dispose_async_engine():
+    """
+    Closes all pooled async connections. Called from app shutdown.
+    """
+    global async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+        DB_POOL_IN_USE.labels(pool="memory_async").set(0)
+        async_engine = None
+
+async def _ensure_schema():
+    """Creates the memory table on first use of the async engine."""
+    global _schema_ready
+    engine = get_async_engine()
+    if not _schema_ready:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        _schema_ready = True
+
+class AsyncSQLMemoryEngine:
+    """
+    Non-blocking SQL memory engine on SQLAlchemy's AsyncEngine.
+    Same storage format and table as SQLMemoryEngine, but every call is awaitable
+    so a slow query does not stall the event loop.
+    """
+
+    async def save(self, user, key, value, ttl=None):
+        """
+        Stores a value for user+key in a single upsert.
+
+        Args:
+            user (str): Username/session ID
+            key (str): Memory key
+            value (Any): Data (str or json-serializable) to store
+            ttl (int): Optional lifetime in seconds
+        """
+        await self.save_many(user, {key: value}, ttl)
+
+    async def save_many(self, user, mapping, ttl=None):
+        """
+        Stores several key/value pairs for a user in one bulk upsert.
+
+        Args:
+            user (str): Username/session ID
+            mapping (dict): {key: value} pairs to store
+            ttl (int): Optional lifetime in seconds for every pair
+        """
+        rows = _rows(user, mapping, ttl)
+        if not rows:
+            return
+        await _ensure_schema()
+        stmt = _upsert_stmt(get_async_engine().dialect.name, rows)
+        async with AsyncSessionLocal() as db:
+            if stmt is None:
+                for row in rows:
+                    await db.merge(MemoryRecord(**row))
+            else:
+                await db.execute(stmt)
+            await db.commit()
+
+    async def fetch(self, user, key):
+        """
+        Fetches a value for user+key.
+
+        Args:
+            user (str): Username/session
+            key (str): Key to lookup
+
+        Returns:
+            The original value, or None
+        """
+        await _ensure_schema()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(MemoryRecord.value).where(MemoryRecord.user == user, MemoryRecord.key == key, _live())
+            )
+            return _decode(result.scalar_one_or_none())
+
+    async def fetch_many(self, user, keys):
+        """
+        Fetches several keys for a user with a single IN query.
+
+        Args:
+            user (str): Username/session
+            keys (Iterable[str]): Keys to lookup
+
+        Returns:
+            dict: {key: value} for every requested key (None when missing)
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        await _ensure_schema()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(MemoryRecord.key, MemoryRecord.value).where(
+                    MemoryRecord.user == user, MemoryRecord.key.in_(keys), _live()
+                )
+            )
+            found = {key: _decode(value) for key, value in result.all()}
+        return {key: found.get(key) for key in keys}
+
+    async def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (value, seconds left or None)}.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        await _ensure_schema()
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(MemoryRecord.key, MemoryRecord.value, MemoryRecord.expires_at).where(
+                    MemoryRecord.user == user, MemoryRecord.key.in_(keys), _live(now)
+                )
+            )
+            found = {key: (_decode(value), _remaining(expires_at, now)) for key, value, expires_at in result.all()}
+        return {key: found.get(key, (None, None)) for key in keys}
+
+    async def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of (key, value) pairs, ordered by key.
+
+        Args:
+            user (str): Username/session
+            prefix (str): Only keys starting with this
+            after (str): Cursor: the last key of the previous page
+            limit (int): Page size
+
+        Returns:
+            list[tuple]: (key, value) pairs
+        """
+        await _ensure_schema()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                _page_stmt([MemoryRecord.key, MemoryRecord.value], user, prefix, after, limit)
+            )
+            return [(key, _decode(value)) for key, value in result.all()]
+
+    async def iter_keys(self, user, prefix=None, page_size=500):
+        """
+        Async generator over a user's keys in order, one page_size query at a time.
+        """
+        await _ensure_schema()
+        after = None
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(_page_stmt([MemoryRecord.key], user, prefix, after, page_size))
+                keys = result.scalars().all()
+            for key in keys:
+                yield key
+            if len(keys) < page_size:
+                return
+            after = keys[-1]
+
+    async def scan(self, user, prefix=None, page_size=500):
+        """
+        Async generator over a user's (key, value) pairs in key order.
+        """
+        after = None
+        while True:
+            page = await self.scan_page(user, prefix, after, page_size)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    async def clear(self, user):
+        """
+        Deletes all memory for the given user.
+
+        Args:
+            user (str): Username/session
+        """
+        await _ensure_schema()
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MemoryRecord).where(MemoryRecord.user == user))
+            await db.commit()
@@ -0,0 +1,370 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+import redis
+
+from core.monitoring.metrics import MEMORY_CACHE_HITS, MEMORY_CACHE_MISSES, MEMORY_CACHE_EVICTIONS
+from shared.config.env_loader import get_env_variable, get_int_env, get_bool_env
+from shared.memory.value_codec import copy_value, stored_form
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class MemoryCache:
+    """
+    Per-process, size-bounded LRU cache with a TTL for (user, key) -> value.
+    Thread-safe; shared by every CachedMemoryEngine in the process, each of
+    which passes (namespace, user) as the user so engines never share entries.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, name="memory"):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted
+            ttl (float): Seconds an entry stays valid (0 disables expiry)
+            name (str): Label used for Prometheus metrics
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()          # (user, key) -> (expires_at, value)
+        self._by_user = defaultdict(set)    # user -> {key}, for O(keys) clear(user)
+        self._fills = {}                    # (user, key) -> [reads in flight, written since]
+        self._lock = threading.Lock()
+
+    def get(self, user, key):
+        """
+        Returns the cached value, or the module-level _MISSING sentinel.
+        None is a valid cached value (negative cache for absent keys).
+        """
+        with self._lock:
+            entry = self._data.get((user, key))
+            if entry is not None and entry[0] and entry[0] < time.monotonic():
+                self._drop(user, key)
+                MEMORY_CACHE_EVICTIONS.labels(cache=self.name, reason="ttl").inc()
+                entry = None
+            if entry is None:
+                MEMORY_CACHE_MISSES.labels(cache=self.name).inc()
+                return _MISSING
+            self._data.move_to_end((user, key))
+        MEMORY_CACHE_HITS.labels(cache=self.name).inc()
+        return copy_value(entry[1])
+
+    def put(self, user, key, value, ttl=None):
+        """
+        Stores a value, evicting least recently used entries past max_entries.
+        A per-entry ttl (e.g. the record's own TTL) can only shorten the cache TTL.
+        """
+        with self._lock:
+            self._mark_written(user, [key])
+            self._store(user, key, value, ttl)
+
+    def begin_fill(self, user, keys):
+        """
+        Registers a read-through of keys that is about to query the engine.
+        A put() or invalidate() of one of them before fill() means the read may
+        be stale, and fill() then leaves the key alone. Pair with end_fill().
+        """
+        with self._lock:
+            for key in keys:
+                self._fills.setdefault((user, key), [0, False])[0] += 1
+
+    def fill(self, user, key, value, ttl=None):
+        """put() for a read-through result; skipped if the key was written since begin_fill()"""
+        with self._lock:
+            pending = self._fills.get((user, key))
+            if pending is None or not pending[1]:
+                self._store(user, key, value, ttl)
+
+    def end_fill(self, user, keys):
+        with self._lock:
+            for key in keys:
+                pending = self._fills.get((user, key))
+                if pending is not None:
+                    pending[0] -= 1
+                    if pending[0] <= 0:
+                        del self._fills[(user, key)]
+
+    def invalidate(self, user, keys=None):
+        """
+        Drops the given keys for a user, or all of the user's keys when keys is None.
+        """
+        with self._lock:
+            if keys is None:
+                self._mark_written(user, [k for u, k in self._fills if u == user])
+                keys = list(self._by_user.get(user, ()))
+            else:
+                self._mark_written(user, keys)
+            for key in keys:
+                self._drop(user, key)
+
+    def clear(self):
+        """Empties the whole cache."""
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+            for pending in self._fills.values():
+                pending[1] = True
+
+    def __len__(self):
+        return len(self._data)
+
+    def _store(self, user, key, value, ttl):
+        ttl = min(self.ttl, ttl) if self.ttl and ttl else (self.ttl or ttl)
+        expires_at = time.monotonic() + ttl if ttl else 0
+        self._data[(user, key)] = (expires_at, copy_value(value))
+        self._data.move_to_end((user, key))
+        self._by_user[user].add(key)
+        while len(self._data) > self.max_entries:
+            (old_user, old_key), _ = self._data.popitem(last=False)
+            self._forget(old_user, old_key)
+            MEMORY_CACHE_EVICTIONS.labels(cache=self.name, reason="size").inc()
+
+    def _mark_written(self, user, keys):
+        for key in keys:
+            pending = self._fills.get((user, key))
+            if pending is not None:
+                pending[1] = True
+
+    def _drop(self, user, key):
+        if self._data.pop((user, key), None) is not None:
+            self._forget(user, key)
+
+    def _forget(self, user, key):
+        keys = self._by_user.get(user)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user]
+
+class RedisInvalidator:
+    """
+    Broadcasts cache invalidations over Redis pub/sub so every uvicorn worker
+    drops the same entries. Messages from this process are ignored on receipt.
+    """
+
+    CHANNEL = "hyphaeos:memory:invalidate"
+
+    def __init__(self, cache, channel=CHANNEL):
+        self.cache = cache
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.redis = redis.Redis(
+            host=get_env_variable("REDIS_HOST", "localhost"),
+            port=int(get_env_variable("REDIS_PORT", "6379")),
+            db=0,
+            decode_responses=True
+        )
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, namespace, user, keys=None):
+        """
+        Announces that keys (or all keys, if None) of a user changed in one engine namespace.
+        """
+        message = json.dumps({"origin": self.origin, "namespace": namespace, "user": user, "keys": keys})
+        try:
+            self.redis.publish(self.channel, message)
+        except redis.RedisError as e:
+            logger.error(f"Memory cache invalidation publish failed: {e}")
+
+    def _on_message(self, message):
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") != self.origin:
+            self.cache.invalidate((payload.get("namespace"), payload["user"]), payload.get("keys"))
+
+    def close(self):
+        self._thread.stop()
+        self._pubsub.close()
+
+_shared_cache = None
+_shared_invalidator = None
+_shared_lock = threading.Lock()
+
+def get_shared_cache():
+    """
+    Returns the process-wide MemoryCache (and its Redis invalidator, if enabled).
+
+    Configured via MEMORY_CACHE_SIZE (1024), MEMORY_CACHE_TTL (300 seconds) and
+    MEMORY_CACHE_REDIS_INVALIDATION (false).
+
+    Returns:
+        tuple: (MemoryCache, RedisInvalidator or None)
+    """
+    global _shared_cache, _shared_invalidator
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MemoryCache(
+                max_entries=get_int_env("MEMORY_CACHE_SIZE", 1024),
+                ttl=get_int_env("MEMORY_CACHE_TTL", 300),
+            )
+            if get_bool_env("MEMORY_CACHE_REDIS_INVALIDATION", False):
+                try:
+                    _shared_invalidator = RedisInvalidator(_shared_cache)
+                except redis.RedisError as e:
+                    logger.error(f"Memory cache running without Redis invalidation: {e}")
+        return _shared_cache, _shared_invalidator
+
+def default_namespace(engine):
+    """The wrapper chain plus the innermost engine's id, e.g. EncryptedMemoryEngine/InMemoryEngine@140..."""
+    chain = [type(engine).__name__]
+    while hasattr(engine, "engine"):
+        engine = engine.engine
+        chain.append(type(engine).__name__)
+    return f"{'/'.join(chain)}@{id(engine)}"
+
+class CachedMemoryEngine:
+    """
+    Read-through cache around any memory engine (plain, encrypted, ...).
+    Writes go through to the engine and then update the cache; clear() invalidates.
+    Reads use the engine's fetch_many_with_ttl, so an entry filled from a
+    record with a TTL expires no later than the record itself. Writes cache the
+    value in its stored form, so hits return what the engine would.
+    """
+
+    def __init__(self, underlying_engine, cache=None, invalidator=None, namespace=None):
+        """
+        Args:
+            underlying_engine: Any engine with save/fetch/clear, *_many and fetch_many_with_ttl methods
+            cache (MemoryCache): Cache to use; defaults to the process-wide one
+            invalidator (RedisInvalidator): Cross-worker invalidation; defaults to the shared one
+            namespace (str): Partition of the cache holding this engine's entries. Engines
+                over the same data should share one (MemoryRouter uses the mode); the
+                default is private to underlying_engine and never matches other workers.
+        """
+        self.engine = underlying_engine
+        self.namespace = namespace or default_namespace(underlying_engine)
+        if cache is None:
+            cache, invalidator = get_shared_cache()
+        self.cache = cache
+        self.invalidator = invalidator
+
+    def save(self, user, key, value, ttl=None):
+        self.engine.save(user, key, value, ttl=ttl)
+        self.cache.put(self._slot(user), key, stored_form(value), ttl)
+        self._publish(user, [key])
+
+    def fetch(self, user, key):
+        value = self.cache.get(self._slot(user), key)
+        if value is _MISSING:
+            self.cache.begin_fill(self._slot(user), [key])
+            try:
+                value = self._store_many(user, self.engine.fetch_many_with_ttl(user, [key]))[key]
+            finally:
+                self.cache.end_fill(self._slot(user), [key])
+        return value
+
+    def save_many(self, user, mapping, ttl=None):
+        self.engine.save_many(user, mapping, ttl=ttl)
+        for key, value in mapping.items():
+            self.cache.put(self._slot(user), key, stored_form(value), ttl)
+        self._publish(user, list(mapping))
+
+    def fetch_many(self, user, keys):
+        keys = list(keys)
+        result, missing = self._lookup_many(user, keys)
+        if missing:
+            self.cache.begin_fill(self._slot(user), missing)
+            try:
+                result.update(self._store_many(user, self.engine.fetch_many_with_ttl(user, missing)))
+            finally:
+                self.cache.end_fill(self._slot(user), missing)
+        return {key: result[key] for key in keys}
+
+    def clear(self, user):
+        self.engine.clear(user)
+        self.cache.invalidate(self._slot(user))
+        self._publish(user, None)
+
+    def iter_keys(self, user, prefix=None, page_size=500):
+        # Scans always go to the engine; the cache only holds point lookups
+        return self.engine.iter_keys(user, prefix=prefix, page_size=page_size)
+
+    def scan(self, user, prefix=None, page_size=500):
+        return self.engine.scan(user, prefix=prefix, page_size=page_size)
+
+    def scan_page(self, user, prefix=None, after=None, limit=500):
+        return self.engine.scan_page(user, prefix, after, limit)
+
+    def _lookup_many(self, user, keys):
+        result, missing = {}, []
+        for key in keys:
+            value = self.cache.get(self._slot(user), key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                result[key] = value
+        return result, missing
+
+    def _store_many(self, user, fetched):
+        """
+        Caches {key: (value, seconds left or None)} and returns {key: value}.
+        Keys written while the engine was queried keep the newer cache entry.
+        """
+        values = {}
+        for key, (value, ttl) in fetched.items():
+            if ttl is not None and ttl <= 0:
+                values[key] = None  # Expired since the query; not cached
+                continue
+            self.cache.fill(self._slot(user), key, value, ttl)
+            values[key] = value
+        return values
+
+    def _slot(self, user):
+        return (self.namespace, user)
+
+    def _publish(self, user, keys):
+        if self.invalidator is not None:
+            self.invalidator.publish(self.namespace, user, keys)
+
+class AsyncCachedMemoryEngine(CachedMemoryEngine):
+    """
+    CachedMemoryEngine for awaitable engines (e.g. AsyncSQLMemoryEngine).
+    Cache hits return without touching the database or the event loop.
+    """
+
+    async def save(self, user, key, value, ttl=None):
+        await self.engine.save(user, key, value, ttl=ttl)
+        self.cache.put(self._slot(user), key, stored_form(value), ttl)
+        self._publish(user, [key])
+
+    async def fetch(self, user, key):
+        value = self.cache.get(self._slot(user), key)
+        if value is _MISSING:
+            self.cache.begin_fill(self._slot(user), [key])
+            try:
+                value = self._store_many(user, await self.engine.fetch_many_with_ttl(user, [key]))[key]
+            finally:
+                self.cache.end_fill(self._slot(user), [key])
+        return value
+
+    async def save_many(self, user, mapping, ttl=None):
+        await self.engine.save_many(user, mapping, ttl=ttl)
+        for key, value in mapping.items():
+            self.cache.put(self._slot(user), key, stored_form(value), ttl)
+        self._publish(user, list(mapping))
+
+    async def fetch_many(self, user, keys):
+        keys = list(keys)
+        result, missing = self._lookup_many(user, keys)
+        if missing:
+            self.cache.begin_fill(self._slot(user), missing)
+            try:
+                result.update(self._store_many(user, await self.engine.fetch_many_with_ttl(user, missing)))
+            finally:
+                self.cache.end_fill(self._slot(user), missing)
+        return {key: result[key] for key in keys}
+
+    async def clear(self, user):
+        await self.engine.clear(user)
+        self.cache.invalidate(self._slot(user))
+        self._publish(user, None)
@@ -1,6 +1,60 @@
 import os
-import json
-from cryptography.fernet import Fernet
+import hashlib
+import logging
+import threading
+import time
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+
+from shared.config.env_loader import get_int_env
+from shared.memory.cached_memory_engine import MemoryCache, _MISSING
+from shared.memory.value_codec import encode_value, decode_value
+
+logger = logging.getLogger(__name__)
+
+_transient_key = None
+_decrypt_cache = None
+_decrypt_cache_lock = threading.Lock()
+
+def load_fernets():
+    """
+    Reads FERNET_KEYS (comma-separated, newest first) or FERNET_KEY.
+
+    Returns:
+        list[Fernet]: One Fernet per configured key, primary key first
+    """
+    global _transient_key
+    raw = os.environ.get("FERNET_KEYS") or os.environ.get("FERNET_KEY")
+    if not raw:
+        # Strongly recommended: set FERNET_KEY in prod (never commit to source!)
+        if _transient_key is None:
+            _transient_key = Fernet.generate_key().decode()
+            print(f"WARNING: FERNET_KEY not set! Using transient key: {_transient_key}")
+        raw = _transient_key
+    try:
+        return [Fernet(key.strip()) for key in raw.split(",") if key.strip()]
+    except Exception as e:
+        raise RuntimeError("❌ Invalid FERNET_KEY(S) in env. Each must be 32-byte Base64!") from e
+
+def load_cipher():
+    """
+    Builds a MultiFernet over load_fernets(). New values are encrypted with the
+    first key; any listed key can decrypt, so old keys stay readable until
+    reencrypt_records() has rotated them out.
+    """
+    return MultiFernet(load_fernets())
+
+def get_decrypt_cache():
+    """
+    Returns the process-wide plaintext cache keyed by ciphertext digest,
+    sized by FERNET_DECRYPT_CACHE_SIZE (512, 0 disables). A given ciphertext
+    always decrypts to the same value, so entries never need invalidating.
+    """
+    global _decrypt_cache
+    with _decrypt_cache_lock:
+        if _decrypt_cache is None:
+            size = get_int_env("FERNET_DECRYPT_CACHE_SIZE", 512)
+            _decrypt_cache = MemoryCache(max_entries=size, ttl=0, name="decrypt") if size > 0 else False
+        return _decrypt_cache or None
 
 class EncryptedMemoryEngine:
     """
@@ -8,26 +62,20 @@ class EncryptedMemoryEngine:
     and decrypt them on fetch. Usernames and keys are not encrypted.
     """
 
-    def __init__(self, underlying_engine):
+    def __init__(self, underlying_engine, cipher=None, decrypt_cache=_MISSING):
         """
         Create an encrypted memory engine wrapper.
 
         Args:
             underlying_engine: Any engine with save/fetch/clear methods
+            cipher (MultiFernet): Cipher to use; defaults to load_cipher()
+            decrypt_cache (MemoryCache|None): Plaintext cache; defaults to the shared one, None disables
         """
         self.engine = underlying_engine
-        key = os.environ.get("FERNET_KEY")
-        if not key:
-            # Strongly recommended: set FERNET_KEY in prod (never commit to source!)
-            key = Fernet.generate_key()
-            print(f"WARNING: FERNET_KEY not set! Using transient key: {key.decode()}")
-        self.cipher = Fernet(key)
-        try:
-            Fernet(os.environ["FERNET_KEY"])
-        except Exception as e:
-            raise RuntimeError("❌ Invalid FERNET_KEY in env. Must be 32-byte Base64!") from e
+        self.cipher = cipher or load_cipher()
+        self.decrypt_cache = get_decrypt_cache() if decrypt_cache is _MISSING else decrypt_cache
 
-    def save(self, user, key, value):
+    def save(self, user, key, value, ttl=None):
         """
         Encrypt and store value for the user+key.
 
@@ -35,10 +83,9 @@ class EncryptedMemoryEngine:
             user (str): Username
             key (str): Memory key
             value (str|json): Data to store (auto-serialized)
+            ttl (int): Optional lifetime in seconds
         """
-        plaintext = value.encode() if isinstance(value, str) else json.dumps(value).encode()
-        ciphertext = self.cipher.encrypt(plaintext)
-        self.engine.save(user, key, ciphertext.decode())
+        self.engine.save(user, key, self._encrypt(value), ttl=ttl)
 
     def fetch(self, user, key):
         """
@@ -51,20 +98,210 @@ class EncryptedMemoryEngine:
         Returns:
             Original decoded value, or None
         """
-        ciphertext = self.engine.fetch(user, key)
-        if ciphertext:
-            try:
-                plaintext = self.cipher.decrypt(ciphertext.encode())
-                try:
-                    return json.loads(plaintext)
-                except Exception:
-                    return plaintext.decode()
-            except Exception:
-                return None
-        return None
+        return self._decrypt(self.engine.fetch(user, key))
+
+    def save_many(self, user, mapping, ttl=None):
+        """
+        Encrypt and store several values in one batch on the underlying engine.
+
+        Args:
+            user (str): Username
+            mapping (dict): {key: value} pairs (auto-serialized)
+            ttl (int): Optional lifetime in seconds for every pair
+        """
+        self.engine.save_many(user, {key: self._encrypt(value) for key, value in mapping.items()}, ttl=ttl)
+
+    def fetch_many(self, user, keys):
+        """
+        Fetch several values in one batch, decrypting each.
+
+        Args:
+            user (str): Username/session
+            keys (Iterable[str]): Memory keys
+
+        Returns:
+            dict: {key: decoded value or None}
+        """
+        return {key: self._decrypt(ciphertext) for key, ciphertext in self.engine.fetch_many(user, keys).items()}
+
+    def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (decoded value, seconds left or None)}.
+        """
+        fetched = self.engine.fetch_many_with_ttl(user, keys)
+        return {key: (self._decrypt(ciphertext), ttl) for key, (ciphertext, ttl) in fetched.items()}
+
+    def iter_keys(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's keys (keys are stored in plaintext, so no decryption).
+        """
+        return self.engine.iter_keys(user, prefix=prefix, page_size=page_size)
+
+    def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of decrypted (key, value) pairs, ordered by key.
+        """
+        return [(key, self._decrypt(ciphertext)) for key, ciphertext in self.engine.scan_page(user, prefix, after, limit)]
+
+    def scan(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's decrypted (key, value) pairs in key order.
+        """
+        for key, ciphertext in self.engine.scan(user, prefix=prefix, page_size=page_size):
+            yield key, self._decrypt(ciphertext)
+
+    def _encrypt(self, value):
+        # Envelope inside the ciphertext (compression only helps before encryption)
+        return self.cipher.encrypt(encode_value(value).encode()).decode()
+
+    def _decrypt(self, ciphertext):
+        if not ciphertext:
+            return None
+        if self.decrypt_cache is None:
+            return self._decrypt_uncached(ciphertext)
+        digest = hashlib.blake2b(ciphertext.encode(), digest_size=16).digest()
+        value = self.decrypt_cache.get("", digest)
+        if value is _MISSING:
+            value = self._decrypt_uncached(ciphertext)
+            if value is not None:
+                self.decrypt_cache.put("", digest, value)
+        return value
+
+    def _decrypt_uncached(self, ciphertext):
+        try:
+            plaintext = self.cipher.decrypt(ciphertext.encode())
+        except Exception:
+            return None
+        return decode_value(plaintext.decode())
 
     def clear(self, user):
         """
         Clear all memory for a user.
         """
-        self.engine.clear(user)
\ No newline at end of file
+        self.engine.clear(user)
+
+class AsyncEncryptedMemoryEngine(EncryptedMemoryEngine):
+    """
+    EncryptedMemoryEngine for awaitable engines such as AsyncSQLMemoryEngine.
+    """
+
+    async def save(self, user, key, value, ttl=None):
+        """
+        Encrypt and store value for the user+key.
+        """
+        await self.engine.save(user, key, self._encrypt(value), ttl=ttl)
+
+    async def fetch(self, user, key):
+        """
+        Fetch value, decrypting it before returning.
+        """
+        return self._decrypt(await self.engine.fetch(user, key))
+
+    async def save_many(self, user, mapping, ttl=None):
+        """
+        Encrypt and store several values in one batch on the underlying engine.
+        """
+        await self.engine.save_many(user, {key: self._encrypt(value) for key, value in mapping.items()}, ttl=ttl)
+
+    async def fetch_many(self, user, keys):
+        """
+        Fetch several values in one batch, decrypting each.
+        """
+        fetched = await self.engine.fetch_many(user, keys)
+        return {key: self._decrypt(ciphertext) for key, ciphertext in fetched.items()}
+
+    async def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (decoded value, seconds left or None)}.
+        """
+        fetched = await self.engine.fetch_many_with_ttl(user, keys)
+        return {key: (self._decrypt(ciphertext), ttl) for key, (ciphertext, ttl) in fetched.items()}
+
+    async def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of decrypted (key, value) pairs, ordered by key.
+        """
+        page = await self.engine.scan_page(user, prefix, after, limit)
+        return [(key, self._decrypt(ciphertext)) for key, ciphertext in page]
+
+    async def scan(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's decrypted (key, value) pairs in key order.
+        """
+        async for key, ciphertext in self.engine.scan(user, prefix=prefix, page_size=page_size):
+            yield key, self._decrypt(ciphertext)
+
+    async def clear(self, user):
+        """
+        Clear all memory for a user.
+        """
+        await self.engine.clear(user)
+
+
+def reencrypt_records(fernets=None, batch_size=500, pause=0.0):
+    """
+    Re-encrypts SQL memory rows that are not yet under the primary (first) key.
+    Walks MemoryRecord in (user, key) order with keyset pagination, one batch per
+    transaction, and only overwrites a row if its value is unchanged since it was read.
+
+    Args:
+        fernets (list[Fernet]): Primary key first, then old keys; defaults to load_fernets()
+        batch_size (int): Rows read per batch
+        pause (float): Seconds to sleep between batches to limit DB load
+
+    Returns:
+        dict: {"scanned", "rotated", "skipped"} counts (skipped = not decryptable)
+    """
+    from sqlalchemy import and_, bindparam, tuple_, update
+    from shared.memory.sql_memory_engine import MemoryRecord, _session
+
+    fernets = fernets or load_fernets()
+    primary, cipher = fernets[0], MultiFernet(fernets)
+    table = MemoryRecord.__table__
+    swap = (
+        update(table)
+        .where(and_(
+            table.c.user == bindparam("b_user"),
+            table.c.key == bindparam("b_key"),
+            table.c.value == bindparam("b_old"),
+        ))
+        .values(value=bindparam("b_new"))
+    )
+    stats = {"scanned": 0, "rotated": 0, "skipped": 0}
+    last = None
+    while True:
+        with _session() as db:
+            query = db.query(MemoryRecord.user, MemoryRecord.key, MemoryRecord.value)
+            if last is not None:
+                query = query.filter(tuple_(MemoryRecord.user, MemoryRecord.key) > last)
+            rows = query.order_by(MemoryRecord.user, MemoryRecord.key).limit(batch_size).all()
+            if not rows:
+                break
+            updates = []
+            for user, key, value in rows:
+                ciphertext = decode_value(value)
+                if not isinstance(ciphertext, str):
+                    stats["skipped"] += 1
+                    continue
+                token = ciphertext.encode()
+                try:
+                    primary.decrypt(token)
+                    continue  # Already under the current key
+                except InvalidToken:
+                    pass
+                try:
+                    rotated = cipher.rotate(token).decode()
+                except InvalidToken:
+                    stats["skipped"] += 1
+                    continue
+                updates.append({"b_user": user, "b_key": key, "b_old": value, "b_new": encode_value(rotated)})
+            if updates:
+                db.execute(swap, updates)
+                db.commit()
+            stats["scanned"] += len(rows)
+            stats["rotated"] += len(updates)
+            last = (rows[-1].user, rows[-1].key)
+        if pause:
+            time.sleep(pause)
+    logger.info(f"Fernet re-encryption finished: {stats}")
+    return stats
@@ -0,0 +1,326 @@
+import bisect
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+
+from shared.config.env_loader import get_env_variable, get_int_env, get_bool_env
+from shared.memory.value_codec import encode_value, decode_value
+
+logger = logging.getLogger(__name__)
+
+class FileMemoryEngine:
+    """
+    Single-node persistent memory engine on an append-only log file.
+
+    Every save appends one JSON line ({"u", "k", "v", "x"}), clear() appends a
+    tombstone ({"u", "clear"}). An in-memory index maps (user, key) to the byte
+    range of the latest record, and reads slice that range out of an mmap of the
+    log. Once enough of the file is superseded records, compaction rewrites only
+    the live records and atomically swaps the file in.
+
+    One process should own a given log file.
+    """
+
+    def __init__(self, path=None, compact_ratio=0.5, compact_min_bytes=1 << 20, compact_check_every=1000, fsync=None):
+        """
+        Args:
+            path (str): Log file (MEMORY_FILE_PATH, default data/hyphaeos_memory.log)
+            compact_ratio (float): Compact when this share of the file is dead records
+            compact_min_bytes (int): Never compact files smaller than this
+            compact_check_every (int): Check the compaction condition every N appends
+            fsync (bool): fsync after each append (MEMORY_FILE_FSYNC, default false)
+        """
+        self.path = path or get_env_variable("MEMORY_FILE_PATH", "data/hyphaeos_memory.log")
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = get_int_env("MEMORY_FILE_COMPACT_MIN_BYTES", compact_min_bytes)
+        self.compact_check_every = compact_check_every
+        self.fsync = get_bool_env("MEMORY_FILE_FSYNC", False) if fsync is None else fsync
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._index = {}        # user -> {key: (offset, length, expires_at)}
+        self._size = 0          # Bytes in the log file
+        self._live_bytes = 0    # Bytes referenced by the index
+        self._appends = 0
+        self._mm = None
+        self._load()
+        self._file = open(self.path, "a+b")
+
+    # === Log handling ===
+
+    def _load(self):
+        """
+        Replays the log into the index. A torn final line (unterminated or
+        unparseable, from a crash mid-append) is truncated; an unparseable line
+        elsewhere is logged and skipped, so the records after it are kept.
+        """
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        size = os.path.getsize(self.path)
+        good = 0
+        if size:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while good < size:
+                    end = mm.find(b"\n", good)
+                    if end == -1:
+                        break
+                    try:
+                        record = json.loads(mm[good:end])
+                        self._apply(record, good, end + 1 - good)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        if end + 1 == size:
+                            break
+                        logger.warning(f"Skipping corrupt record at byte {good} of {self.path}")
+                    good = end + 1
+        if good < size:
+            logger.warning(f"Truncating torn final record of {self.path} ({size - good} bytes)")
+            os.truncate(self.path, good)
+        self._size = good
+
+    def _apply(self, record, offset, length):
+        user = record["u"]
+        if record.get("clear"):
+            for old in self._index.pop(user, {}).values():
+                self._live_bytes -= old[1]
+            return
+        records = self._index.setdefault(user, {})
+        old = records.get(record["k"])
+        if old is not None:
+            self._live_bytes -= old[1]
+        records[record["k"]] = (offset, length, record.get("x"))
+        self._live_bytes += length
+
+    def _append(self, records):
+        """Writes records as one contiguous append and indexes them."""
+        lines = [json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records]
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        offset = self._size
+        for record, line in zip(records, lines):
+            self._apply(record, offset, len(line))
+            offset += len(line)
+        self._size = offset
+        self._appends += 1
+        if self._appends % self.compact_check_every == 0:
+            self._maybe_compact()
+
+    def _read(self, entry):
+        offset, length, _ = entry
+        if self._mm is None or len(self._mm) < offset + length:
+            if self._mm is not None:
+                self._mm.close()
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return decode_value(json.loads(self._mm[offset:offset + length])["v"])
+
+    def _maybe_compact(self):
+        dead = self._size - self._live_bytes
+        if self._size >= self.compact_min_bytes and dead >= self._size * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the log with only live, unexpired records and swaps it in atomically.
+
+        Returns:
+            int: Bytes reclaimed
+        """
+        with self._lock:
+            before = self._size
+            now = time.time()
+            tmp_path = f"{self.path}.compact"
+            new_index, offset = {}, 0
+            with open(tmp_path, "wb") as out:
+                if self._size:
+                    with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        for user, records in self._index.items():
+                            for key, (start, length, expires_at) in records.items():
+                                if expires_at is not None and expires_at <= now:
+                                    continue
+                                out.write(mm[start:start + length])
+                                new_index.setdefault(user, {})[key] = (offset, length, expires_at)
+                                offset += length
+                out.flush()
+                os.fsync(out.fileno())
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a+b")
+            self._index = new_index
+            self._size = self._live_bytes = offset
+            return before - offset
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            self._file.close()
+
+    # === Engine API ===
+
+    def save(self, user, key, value, ttl=None):
+        """
+        Appends a value for user+key.
+
+        Args:
+            user (str): Username/session ID
+            key (str): Memory key
+            value (Any): Data to store
+            ttl (int): Optional lifetime in seconds
+        """
+        self.save_many(user, {key: value}, ttl)
+
+    def save_many(self, user, mapping, ttl=None):
+        """
+        Appends several key/value pairs for a user in one write.
+        """
+        if not mapping:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        records = [{"u": user, "k": key, "v": encode_value(value), "x": expires_at} for key, value in mapping.items()]
+        with self._lock:
+            self._append(records)
+
+    def fetch(self, user, key):
+        """
+        Returns the latest value for user+key, or None if missing/expired.
+        """
+        with self._lock:
+            entry = self._index.get(user, {}).get(key)
+            if entry is None or _expired(entry, time.time()):
+                return None
+            return self._read(entry)
+
+    def fetch_many(self, user, keys):
+        """
+        Returns {key: value or None} for every requested key.
+        """
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            records = self._index.get(user, {})
+            result = {}
+            for key in keys:
+                entry = records.get(key)
+                result[key] = None if entry is None or _expired(entry, now) else self._read(entry)
+        return result
+
+    def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (value, seconds left or None)}.
+        """
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            records = self._index.get(user, {})
+            result = {}
+            for key in keys:
+                entry = records.get(key)
+                if entry is None or _expired(entry, now):
+                    result[key] = (None, None)
+                else:
+                    result[key] = (self._read(entry), entry[2] - now if entry[2] is not None else None)
+        return result
+
+    def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of (key, value) pairs in key order (same contract as SQLMemoryEngine).
+        """
+        now = time.time()
+        with self._lock:
+            records = self._index.get(user, {})
+            keys = sorted(records)
+            start = bisect.bisect_right(keys, after) if after is not None else 0
+            if prefix and (after is None or after < prefix):
+                start = max(start, bisect.bisect_left(keys, prefix))
+            page = []
+            for key in keys[start:]:
+                if prefix and not key.startswith(prefix):
+                    break
+                if _expired(records[key], now):
+                    continue
+                page.append((key, self._read(records[key])))
+                if len(page) >= limit:
+                    break
+        return page
+
+    def iter_keys(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's live keys in order.
+        """
+        for key, _ in self.scan(user, prefix, page_size):
+            yield key
+
+    def scan(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's live (key, value) pairs in key order, page by page.
+        """
+        after = None
+        while True:
+            page = self.scan_page(user, prefix, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    def clear(self, user):
+        """
+        Appends a tombstone that drops all memory for the given user.
+        """
+        with self._lock:
+            if user in self._index:
+                self._append([{"u": user, "clear": True}])
+
+    def sweep_expired(self):
+        """
+        Drops expired records from the index; their bytes become dead and are
+        reclaimed by the next compaction.
+
+        Returns:
+            int: Number of records removed
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for user in list(self._index):
+                records = self._index[user]
+                expired = [key for key, entry in records.items() if _expired(entry, now)]
+                for key in expired:
+                    self._live_bytes -= records.pop(key)[1]
+                removed += len(expired)
+                if not records:
+                    del self._index[user]
+            if removed:
+                self._maybe_compact()
+        return removed
+
+def _expired(entry, now):
+    return entry[2] is not None and entry[2] <= now
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+def opened_file_engine():
+    """The process-wide FileMemoryEngine if something has opened it, else None (never creates the log)."""
+    return _default_engine
+
+def get_file_engine():
+    """
+    Returns the process-wide FileMemoryEngine used by MemoryRouter(mode="file"),
+    opening (and replaying) the log on first use.
+    """
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = FileMemoryEngine()
+        return _default_engine
@@ -0,0 +1,166 @@
+import bisect
+import threading
+import time
+
+from shared.memory.value_codec import copy_value
+
+class InMemoryEngine:
+    """
+    Process-local memory engine backed by plain dicts.
+    Users are spread over lock stripes so concurrent requests for different
+    users never contend on the same lock. Nothing is persisted.
+    Used for tests and single-node, low-latency deployments.
+    """
+
+    def __init__(self, stripes=16):
+        """
+        Args:
+            stripes (int): Number of independently locked partitions
+        """
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+
+    def _stripe(self, user):
+        return self._stripes[hash(user) % len(self._stripes)]
+
+    def save(self, user, key, value, ttl=None):
+        """
+        Stores a copy of value for user+key.
+
+        Args:
+            user (str): Username/session ID
+            key (str): Memory key
+            value (Any): Data to store
+            ttl (int): Optional lifetime in seconds
+        """
+        self.save_many(user, {key: value}, ttl)
+
+    def save_many(self, user, mapping, ttl=None):
+        """
+        Stores several key/value pairs for a user under one lock acquisition.
+        """
+        expires_at = time.monotonic() + ttl if ttl else None
+        entries = {key: (copy_value(value), expires_at) for key, value in mapping.items()}
+        data, lock = self._stripe(user)
+        with lock:
+            data.setdefault(user, {}).update(entries)
+
+    def fetch(self, user, key):
+        """
+        Returns a copy of the stored value, or None if missing/expired.
+        """
+        data, lock = self._stripe(user)
+        with lock:
+            entry = data.get(user, {}).get(key)
+        return _live_value(entry, time.monotonic())
+
+    def fetch_many(self, user, keys):
+        """
+        Returns {key: value or None} for every requested key.
+        """
+        keys = list(keys)
+        data, lock = self._stripe(user)
+        with lock:
+            records = data.get(user, {})
+            entries = [(key, records.get(key)) for key in keys]
+        now = time.monotonic()
+        return {key: _live_value(entry, now) for key, entry in entries}
+
+    def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (value, seconds left or None)}
+        so a cache in front of the engine can expire together with the record.
+        """
+        keys = list(keys)
+        data, lock = self._stripe(user)
+        with lock:
+            records = data.get(user, {})
+            entries = [(key, records.get(key)) for key in keys]
+        now = time.monotonic()
+        return {key: _live_entry(entry, now) for key, entry in entries}
+
+    def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of (key, value) pairs in key order (same contract as SQLMemoryEngine).
+        """
+        data, lock = self._stripe(user)
+        with lock:
+            records = data.get(user, {})
+            keys = sorted(records)
+            start = bisect.bisect_right(keys, after) if after is not None else 0
+            if prefix and (after is None or after < prefix):
+                start = max(start, bisect.bisect_left(keys, prefix))
+            now = time.monotonic()
+            page = []
+            for key in keys[start:]:
+                if prefix and not key.startswith(prefix):
+                    break
+                value, expires_at = records[key]
+                if expires_at is not None and expires_at <= now:
+                    continue
+                page.append((key, copy_value(value)))
+                if len(page) >= limit:
+                    break
+        return page
+
+    def iter_keys(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's live keys in order.
+        """
+        for key, _ in self.scan(user, prefix, page_size):
+            yield key
+
+    def scan(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's live (key, value) pairs in key order, page by page.
+        """
+        after = None
+        while True:
+            page = self.scan_page(user, prefix, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    def clear(self, user):
+        """
+        Deletes all memory for the given user.
+        """
+        data, lock = self._stripe(user)
+        with lock:
+            data.pop(user, None)
+
+    def sweep_expired(self):
+        """
+        Drops expired entries, one stripe at a time.
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        for data, lock in self._stripes:
+            with lock:
+                now = time.monotonic()
+                for user in list(data):
+                    records = data[user]
+                    expired = [key for key, (_, expires_at) in records.items() if expires_at is not None and expires_at <= now]
+                    for key in expired:
+                        del records[key]
+                    removed += len(expired)
+                    if not records:
+                        del data[user]
+        return removed
+
+def _live_value(entry, now):
+    return _live_entry(entry, now)[0]
+
+def _live_entry(entry, now):
+    """(copy of the value, seconds left or None), or (None, None) if missing/expired"""
+    if entry is None:
+        return None, None
+    value, expires_at = entry
+    if expires_at is not None and expires_at <= now:
+        return None, None
+    return copy_value(value), (expires_at - now if expires_at is not None else None)
+
+# Process-wide store used by MemoryRouter(mode="memory")
+memory_store = InMemoryEngine()
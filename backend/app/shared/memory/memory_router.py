@@ -1,5 +1,5 @@
-from shared.memory.in_memory_engine import InMemoryEngine
-from shared.memory.file_memory_engine import FileMemoryEngine
+from shared.memory.in_memory_engine import memory_store
+from shared.memory.file_memory_engine import get_file_engine
 from shared.state.session_manager import session
 
 class MemoryRouter:
@@ -7,22 +7,49 @@ class MemoryRouter:
     Central abstraction for memory. Supports:
     - Plaintext SQL
     - Encrypted SQL
+    - Async SQL (mode="sql_async"): every call returns an awaitable
+    - In-process dicts (mode="memory"): lock-striped, not persisted
+    - Append-only log file (mode="file"): single node, MEMORY_FILE_PATH
+    - Optional read-through LRU/TTL cache in front of any of the above (cache=True)
     """
-    def __init__(self, mode="sql", encrypt=True):
+    def __init__(self, mode="sql", encrypt=True, cache=False):
         if mode == "sql":
             from shared.memory.sql_memory_engine import SQLMemoryEngine
             engine = SQLMemoryEngine()
+        elif mode == "sql_async":
+            from shared.memory.async_sql_memory_engine import AsyncSQLMemoryEngine
+            engine = AsyncSQLMemoryEngine()
+        elif mode == "memory":
+            engine = memory_store
+        elif mode == "file":
+            engine = get_file_engine()
         else:
-            raise ValueError("Only 'sql' mode implemented in this setup.")
+            raise ValueError(f"❌ Unknown memory mode '{mode}' (expected sql, sql_async, memory or file).")
         if encrypt:
-            from shared.memory.encrypted_memory_engine import EncryptedMemoryEngine
-            self.engine = EncryptedMemoryEngine(engine)
-        else:
-            self.engine = engine
+            from shared.memory.encrypted_memory_engine import EncryptedMemoryEngine, AsyncEncryptedMemoryEngine
+            wrapper = AsyncEncryptedMemoryEngine if mode == "sql_async" else EncryptedMemoryEngine
+            engine = wrapper(engine)
+        if cache:
+            from shared.memory.cached_memory_engine import CachedMemoryEngine, AsyncCachedMemoryEngine
+            cached = AsyncCachedMemoryEngine if mode == "sql_async" else CachedMemoryEngine
+            # sql and sql_async share one table, so they share cache entries too
+            namespace = f"{'sql' if mode == 'sql_async' else mode}:{'encrypted' if encrypt else 'plain'}"
+            engine = cached(engine, namespace=namespace)
+        self.engine = engine
         self.user = session.get_user_name()
-    def save(self, key, value):
-        return self.engine.save(self.user, key, value)
+    def save(self, key, value, ttl=None):
+        return self.engine.save(self.user, key, value, ttl=ttl)
     def fetch(self, key):
         return self.engine.fetch(self.user, key)
+    def save_many(self, mapping, ttl=None):
+        return self.engine.save_many(self.user, mapping, ttl=ttl)
+    def fetch_many(self, keys):
+        return self.engine.fetch_many(self.user, keys)
+    def iter_keys(self, prefix=None, page_size=500):
+        return self.engine.iter_keys(self.user, prefix=prefix, page_size=page_size)
+    def scan(self, prefix=None, page_size=500):
+        return self.engine.scan(self.user, prefix=prefix, page_size=page_size)
+    def scan_page(self, prefix=None, after=None, limit=500):
+        return self.engine.scan_page(self.user, prefix=prefix, after=after, limit=limit)
     def clear(self):
-        self.engine.clear(self.user)
\ No newline at end of file
+        return self.engine.clear(self.user)
\ No newline at end of file
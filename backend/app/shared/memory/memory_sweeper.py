@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+from shared.config.env_loader import get_int_env
+from shared.memory.file_memory_engine import opened_file_engine
+from shared.memory.in_memory_engine import memory_store
+from shared.memory.sql_memory_engine import check_sweep_limits, sweep_expired
+
+logger = logging.getLogger(__name__)
+
+def sweep_engines(batch_size, max_batches):
+    """
+    One sweep of every engine MemoryRouter can be using: the SQL table, the
+    in-process memory_store and, once opened, the file engine's index.
+    A failing engine is logged and does not stop the others.
+
+    Returns:
+        dict: {engine: expired records removed}
+    """
+    sweeps = {
+        "sql": lambda: sweep_expired(batch_size, max_batches),
+        "memory": memory_store.sweep_expired,
+    }
+    file_engine = opened_file_engine()
+    if file_engine is not None:
+        sweeps["file"] = file_engine.sweep_expired
+    removed = {}
+    for name, sweep in sweeps.items():
+        try:
+            removed[name] = sweep()
+        except Exception as e:
+            logger.error(f"Memory sweeper error ({name}): {e}")
+    return removed
+
+async def run_expiry_sweeper(interval=None, batch_size=None, max_batches=None):
+    """
+    Background loop that deletes expired memory records so the table (and its
+    indexes) stay flat under long-running load, and expired entries of the
+    in-process and file engines are reclaimed too. Each tick deletes at most
+    max_batches * batch_size SQL rows in a worker thread, then sleeps.
+
+    Configured via MEMORY_SWEEP_INTERVAL (60 seconds), MEMORY_SWEEP_BATCH_SIZE (1000)
+    and MEMORY_SWEEP_MAX_BATCHES (10); explicit arguments win.
+
+    Raises:
+        ValueError: If interval <= 0, batch_size < 1 or max_batches < 1
+    """
+    if interval is None:
+        interval = get_int_env("MEMORY_SWEEP_INTERVAL", 60)
+    if batch_size is None:
+        batch_size = get_int_env("MEMORY_SWEEP_BATCH_SIZE", 1000)
+    if max_batches is None:
+        max_batches = get_int_env("MEMORY_SWEEP_MAX_BATCHES", 10)
+    if interval <= 0:
+        raise ValueError(f"❌ Memory sweep interval must be positive, got {interval}.")
+    check_sweep_limits(batch_size, max_batches)
+    while True:
+        removed = await asyncio.to_thread(sweep_engines, batch_size, max_batches)
+        for name, count in removed.items():
+            if count:
+                logger.info(f"Memory sweeper deleted {count} expired {name} records")
+        await asyncio.sleep(interval)
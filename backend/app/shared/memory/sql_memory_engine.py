@@ -1,15 +1,23 @@
 import os
-import json
-from sqlalchemy import create_engine, Column, String, Text
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, delete, or_, select, tuple_, Column, DateTime, String, Text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+
+from core.monitoring.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE
+from shared.config.env_loader import get_env_variable, get_int_env, get_bool_env
+from shared.memory.value_codec import encode_value, decode_value
 
 # --- Database URL: SQLite by default, set MEMORY_DB_URL for Postgres/cloud ---
-DATABASE_URL = os.environ.get("MEMORY_DB_URL", "sqlite:///data/hyphaeos_memory.db")
-os.makedirs("data", exist_ok=True)  # Ensures storage folder exists for local
+DEFAULT_DATABASE_URL = "sqlite:///data/hyphaeos_memory.db"
 
-engine = create_engine(DATABASE_URL, future=True)
 Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
+SessionLocal = sessionmaker()  # Bound to the engine by init_engine()
+
+_engine = None
 
 class MemoryRecord(Base):
     """
@@ -18,10 +26,258 @@ class MemoryRecord(Base):
     __tablename__ = "memory"
     user = Column(String, primary_key=True)
     key = Column(String, primary_key=True)
-    value = Column(Text)  # Stores JSON or encrypted string
+    value = Column(Text)  # Typed envelope (see value_codec), may wrap an encrypted string
+    expires_at = Column(DateTime, nullable=True, index=True)  # UTC; NULL = never expires
+
+def get_database_url():
+    """
+    Returns the configured memory database URL (MEMORY_DB_URL, SQLite by default).
+    """
+    return get_env_variable("MEMORY_DB_URL", DEFAULT_DATABASE_URL)
+
+def timed_pool_class(base, label):
+    """
+    Returns a subclass of the given pool that records checkout wait time
+    in DB_POOL_CHECKOUT_WAIT under the given pool label.
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return base._do_get(self)
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(pool=label).observe(time.perf_counter() - start)
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
+
+def engine_options(url, pool_class=QueuePool, label="memory"):
+    """
+    Builds create_engine()/create_async_engine() keyword arguments from env:
+
+    - MEMORY_DB_POOL_SIZE (5), MEMORY_DB_MAX_OVERFLOW (10), MEMORY_DB_POOL_TIMEOUT (30s)
+    - MEMORY_DB_POOL_PRE_PING (true), MEMORY_DB_POOL_RECYCLE (1800s, -1 disables)
+    - MEMORY_DB_STATEMENT_TIMEOUT_MS (0 = server default, Postgres only)
+
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool.
+    """
+    parsed = make_url(url)
+    options = {
+        "future": True,
+        "pool_pre_ping": get_bool_env("MEMORY_DB_POOL_PRE_PING", True),
+    }
+    backend = parsed.get_backend_name()
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=timed_pool_class(pool_class, label),
+        pool_size=get_int_env("MEMORY_DB_POOL_SIZE", 5),
+        max_overflow=get_int_env("MEMORY_DB_MAX_OVERFLOW", 10),
+        pool_timeout=get_int_env("MEMORY_DB_POOL_TIMEOUT", 30),
+        pool_recycle=get_int_env("MEMORY_DB_POOL_RECYCLE", 1800),
+    )
+    timeout_ms = get_int_env("MEMORY_DB_STATEMENT_TIMEOUT_MS", 0)
+    if backend == "postgresql" and timeout_ms > 0:
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+def instrument_pool(engine, label):
+    """
+    Tracks checked-out connections for a (sync) engine in DB_POOL_IN_USE.
+    """
+    gauge = DB_POOL_IN_USE.labels(pool=label)
+    gauge.set(0)
+    event.listen(engine, "checkout", lambda *args: gauge.inc())
+    event.listen(engine, "checkin", lambda *args: gauge.dec())
+
+def ensure_sqlite_dir(url):
+    """
+    Creates the parent folder of a file-backed SQLite database (e.g. data/).
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:"):
+        folder = os.path.dirname(parsed.database)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+def init_engine(url=None, create_tables=True):
+    """
+    Creates the memory engine and binds SessionLocal to it.
+    Called from app startup; engines are otherwise created lazily on first use.
+
+    Args:
+        url (str): Database URL (defaults to MEMORY_DB_URL)
+        create_tables (bool): Run create_all for the memory table
+
+    Returns:
+        Engine: The new engine
+    """
+    global _engine
+    dispose_engine()
+    url = url or get_database_url()
+    ensure_sqlite_dir(url)
+    _engine = create_engine(url, **engine_options(url))
+    instrument_pool(_engine, "memory")
+    SessionLocal.configure(bind=_engine)
+    if create_tables:
+        Base.metadata.create_all(_engine)
+    return _engine
+
+def get_engine():
+    """
+    Returns the memory engine, creating it on first use.
+    """
+    if _engine is None:
+        init_engine()
+    return _engine
+
+def dispose_engine():
+    """
+    Closes all pooled connections and forgets the engine. Called from app shutdown.
+    """
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        DB_POOL_IN_USE.labels(pool="memory").set(0)
+        _engine = None
+
+def _session():
+    get_engine()
+    return SessionLocal()
+
+# Dialects with a native INSERT ... ON CONFLICT on the (user, key) primary key
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+def _encode(value):
+    """Serialize a value to the typed envelope stored in MemoryRecord.value."""
+    return encode_value(value)
+
+def _decode(raw):
+    """Inverse of _encode; legacy (pre-envelope) rows are still understood."""
+    return decode_value(raw)
+
+def _expires_at(ttl):
+    """UTC expiry for a TTL in seconds, or None for no expiry."""
+    return datetime.utcnow() + timedelta(seconds=ttl) if ttl else None
+
+def _rows(user, mapping, ttl=None):
+    """Row dicts for _upsert/_upsert_stmt."""
+    expires_at = _expires_at(ttl)
+    return [
+        {"user": user, "key": key, "value": _encode(value), "expires_at": expires_at}
+        for key, value in mapping.items()
+    ]
+
+def _remaining(expires_at, now=None):
+    """Seconds until a row expires, or None for no expiry."""
+    if expires_at is None:
+        return None
+    return (expires_at - (now or datetime.utcnow())).total_seconds()
+
+def _live(now=None):
+    """Filter matching rows that have no TTL or have not expired yet."""
+    return or_(MemoryRecord.expires_at.is_(None), MemoryRecord.expires_at > (now or datetime.utcnow()))
+
+def _upsert_stmt(dialect_name, rows):
+    """
+    Builds a single INSERT ... ON CONFLICT (user, key) DO UPDATE for rows
+    ({"user", "key", "value", "expires_at"} dicts), or None if the dialect has no native upsert.
+    """
+    insert = UPSERT_DIALECTS.get(dialect_name)
+    if insert is None:
+        return None
+    stmt = insert(MemoryRecord).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[MemoryRecord.user, MemoryRecord.key],
+        set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at},
+    )
+
+def _prefix_end(prefix):
+    """Smallest string greater than every string starting with prefix (code point order)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _page_stmt(columns, user, prefix=None, after=None, limit=500):
+    """
+    Builds one page of a (user, key) primary-key range scan, ordered by key.
+    The prefix is applied as a key range so the composite index is used, plus a
+    LIKE guard for databases whose collation does not sort by code point.
+
+    Args:
+        columns (list): Columns to select (key first)
+        user (str): Username/session
+        prefix (str): Only keys starting with this
+        after (str): Exclusive cursor: only keys sorting after this one
+        limit (int): Page size
+    """
+    stmt = select(*columns).where(MemoryRecord.user == user, _live())
+    if prefix:
+        stmt = stmt.where(
+            MemoryRecord.key >= prefix,
+            MemoryRecord.key < _prefix_end(prefix),
+            MemoryRecord.key.startswith(prefix, autoescape=True),
+        )
+    if after is not None:
+        stmt = stmt.where(MemoryRecord.key > after)
+    return stmt.order_by(MemoryRecord.key).limit(limit)
+
+def _expired_batch_stmt(batch_size, now=None):
+    """DELETE for at most batch_size expired rows (bounded, so each statement stays short)."""
+    expired = (
+        select(MemoryRecord.user, MemoryRecord.key)
+        .where(MemoryRecord.expires_at <= (now or datetime.utcnow()))
+        .limit(batch_size)
+    )
+    return delete(MemoryRecord).where(tuple_(MemoryRecord.user, MemoryRecord.key).in_(expired))
 
-# --- Ensure table exists on first import/startup ---
-Base.metadata.create_all(engine)
+def check_sweep_limits(batch_size, max_batches=None):
+    """Rejects batch limits that would never delete anything or never finish."""
+    if batch_size < 1:
+        raise ValueError(f"❌ Sweep batch_size must be at least 1, got {batch_size}.")
+    if max_batches is not None and max_batches < 1:
+        raise ValueError(f"❌ Sweep max_batches must be at least 1 (or None), got {max_batches}.")
+
+def sweep_expired(batch_size=1000, max_batches=None):
+    """
+    Deletes expired memory rows in bounded batches, one transaction each.
+
+    Args:
+        batch_size (int): Rows deleted per statement
+        max_batches (int): Stop after this many batches (None = until none are left)
+
+    Returns:
+        int: Number of rows deleted
+
+    Raises:
+        ValueError: If batch_size < 1 or max_batches < 1
+    """
+    check_sweep_limits(batch_size, max_batches)
+    deleted, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        with _session() as db:
+            count = db.execute(_expired_batch_stmt(batch_size)).rowcount
+            db.commit()
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            break
+    return deleted
+
+def _upsert(db, rows):
+    """
+    Writes rows in a single statement on Postgres/SQLite, falls back to merge() elsewhere.
+    """
+    if not rows:
+        return
+    stmt = _upsert_stmt(db.get_bind().dialect.name, rows)
+    if stmt is None:
+        for row in rows:
+            db.merge(MemoryRecord(**row))
+        return
+    db.execute(stmt)
 
 class SQLMemoryEngine:
     """
@@ -29,24 +285,20 @@ class SQLMemoryEngine:
     Can be used directly or as a backend for EncryptedMemoryEngine.
     """
 
-    def save(self, user, key, value):
+    def save(self, user, key, value, ttl=None):
         """
-        Stores a value for user+key.
+        Stores a value for user+key in a single upsert statement,
+        so concurrent writers to a new key never race on the primary key.
         Converts non-string (JSON) to string for storage.
 
         Args:
             user (str): Username/session ID
             key (str): Memory key
             value (Any): Data (str or json-serializable) to store
+            ttl (int): Optional lifetime in seconds; expired rows are ignored by fetch
         """
-        val = json.dumps(value) if not isinstance(value, str) else value
-        with SessionLocal() as db:
-            rec = db.query(MemoryRecord).filter_by(user=user, key=key).first()
-            if rec:
-                rec.value = val
-            else:
-                rec = MemoryRecord(user=user, key=key, value=val)
-                db.add(rec)
+        with _session() as db:
+            _upsert(db, _rows(user, {key: value}, ttl))
             db.commit()
 
     def fetch(self, user, key):
@@ -61,14 +313,121 @@ class SQLMemoryEngine:
         Returns:
             The original value, or None
         """
-        with SessionLocal() as db:
-            rec = db.query(MemoryRecord).filter_by(user=user, key=key).first()
-            if rec and rec.value:
-                try:
-                    return json.loads(rec.value)
-                except Exception:
-                    return rec.value
-            return None
+        with _session() as db:
+            rec = db.query(MemoryRecord).filter_by(user=user, key=key).filter(_live()).first()
+            return _decode(rec.value) if rec else None
+
+    def save_many(self, user, mapping, ttl=None):
+        """
+        Stores several key/value pairs for a user in one bulk upsert.
+
+        Args:
+            user (str): Username/session ID
+            mapping (dict): {key: value} pairs to store
+            ttl (int): Optional lifetime in seconds for every pair
+        """
+        rows = _rows(user, mapping, ttl)
+        if not rows:
+            return
+        with _session() as db:
+            _upsert(db, rows)
+            db.commit()
+
+    def fetch_many(self, user, keys):
+        """
+        Fetches several keys for a user with a single IN query.
+
+        Args:
+            user (str): Username/session
+            keys (Iterable[str]): Keys to lookup
+
+        Returns:
+            dict: {key: value} for every requested key (None when missing)
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        with _session() as db:
+            rows = (
+                db.query(MemoryRecord.key, MemoryRecord.value)
+                .filter(MemoryRecord.user == user, MemoryRecord.key.in_(keys), _live())
+                .all()
+            )
+        found = {key: _decode(value) for key, value in rows}
+        return {key: found.get(key) for key in keys}
+
+    def fetch_many_with_ttl(self, user, keys):
+        """
+        Like fetch_many, but returns {key: (value, seconds left or None)}
+        so a cache in front of the engine can expire together with the row.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = datetime.utcnow()
+        with _session() as db:
+            rows = (
+                db.query(MemoryRecord.key, MemoryRecord.value, MemoryRecord.expires_at)
+                .filter(MemoryRecord.user == user, MemoryRecord.key.in_(keys), _live(now))
+                .all()
+            )
+        found = {key: (_decode(value), _remaining(expires_at, now)) for key, value, expires_at in rows}
+        return {key: found.get(key, (None, None)) for key in keys}
+
+    def scan_page(self, user, prefix=None, after=None, limit=500):
+        """
+        Returns one page of (key, value) pairs, ordered by key.
+
+        Args:
+            user (str): Username/session
+            prefix (str): Only keys starting with this
+            after (str): Cursor: the last key of the previous page
+            limit (int): Page size
+
+        Returns:
+            list[tuple]: (key, value) pairs
+        """
+        with _session() as db:
+            rows = db.execute(
+                _page_stmt([MemoryRecord.key, MemoryRecord.value], user, prefix, after, limit)
+            ).all()
+        return [(key, _decode(value)) for key, value in rows]
+
+    def iter_keys(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's keys in order, one page_size query at a time.
+
+        Args:
+            user (str): Username/session
+            prefix (str): Only keys starting with this
+            page_size (int): Keys fetched per query
+
+        Yields:
+            str: Memory keys
+        """
+        after = None
+        while True:
+            with _session() as db:
+                keys = db.execute(_page_stmt([MemoryRecord.key], user, prefix, after, page_size)).scalars().all()
+            yield from keys
+            if len(keys) < page_size:
+                return
+            after = keys[-1]
+
+    def scan(self, user, prefix=None, page_size=500):
+        """
+        Streams a user's (key, value) pairs in key order, one page at a time.
+
+        Yields:
+            tuple: (key, value)
+        """
+        after = None
+        while True:
+            page = self.scan_page(user, prefix, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
 
     def clear(self, user):
         """
@@ -77,6 +436,6 @@ class SQLMemoryEngine:
         Args:
             user (str): Username/session
         """
-        with SessionLocal() as db:
+        with _session() as db:
             db.query(MemoryRecord).filter_by(user=user).delete()
             db.commit()
\ No newline at end of file
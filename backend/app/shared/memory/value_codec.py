@@ -0,0 +1,177 @@
+import base64
+import json
+import zlib
+from functools import lru_cache
+
+from shared.config.env_loader import get_env_variable, get_int_env
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for MEMORY_VALUE_FORMAT=msgpack
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for MEMORY_COMPRESSION=zstd
+    zstandard = None
+
+# --- Envelope layout: MAGIC + <encoding> + <compression> + payload ---
+#   encoding:    "s" raw str | "j" JSON | "m" msgpack
+#   compression: "-" none    | "z" zlib | "Z" zstd
+# Binary payloads (msgpack or compressed) are base64 so the value fits a TEXT column.
+# Values without MAGIC are legacy rows written before the envelope existed.
+MAGIC = "\x1fH"
+HEADER_LEN = len(MAGIC) + 2
+
+RAW, JSON, MSGPACK = "s", "j", "m"
+NONE, ZLIB, ZSTD = "-", "z", "Z"
+
+@lru_cache(maxsize=1)
+def codec_settings():
+    """
+    Reads the codec configuration once per process:
+
+    - MEMORY_VALUE_FORMAT: "json" (default) or "msgpack" for non-string values
+    - MEMORY_COMPRESSION: "zlib" (default), "zstd" or "none"
+    - MEMORY_COMPRESS_THRESHOLD: payload size in bytes before compressing (4096)
+    """
+    fmt = get_env_variable("MEMORY_VALUE_FORMAT", "json").lower()
+    compression = get_env_variable("MEMORY_COMPRESSION", "zlib").lower()
+    return {
+        "format": MSGPACK if fmt == "msgpack" else JSON,
+        "compression": {"zlib": ZLIB, "zstd": ZSTD}.get(compression, NONE),
+        "threshold": get_int_env("MEMORY_COMPRESS_THRESHOLD", 4096),
+    }
+
+def encode_value(value, fmt=None, compression=None, threshold=None):
+    """
+    Wraps a value in a typed envelope string.
+
+    Args:
+        value (Any): str, or a JSON/msgpack-serializable value
+        fmt (str): JSON or MSGPACK for non-string values (default from env)
+        compression (str): NONE, ZLIB or ZSTD (default from env)
+        threshold (int): Compress payloads at least this many bytes (default from env)
+
+    Returns:
+        str: Envelope text for storage
+    """
+    settings = codec_settings()
+    fmt = fmt or settings["format"]
+    compression = compression or settings["compression"]
+    threshold = settings["threshold"] if threshold is None else threshold
+    if compression == ZSTD and zstandard is None:
+        compression = ZLIB
+
+    if isinstance(value, str):
+        encoding, payload = RAW, value.encode()
+    elif fmt == MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("❌ MEMORY_VALUE_FORMAT=msgpack requires the 'msgpack' package.")
+        encoding, payload = MSGPACK, msgpack.packb(value, use_bin_type=True)
+    else:
+        encoding, payload = JSON, json.dumps(value, separators=(",", ":")).encode()
+
+    if compression != NONE and threshold and len(payload) >= threshold:
+        compressed = compress(payload, compression)
+        if len(compressed) < len(payload):
+            return f"{MAGIC}{encoding}{compression}{base64.b64encode(compressed).decode()}"
+
+    if encoding == MSGPACK:
+        return f"{MAGIC}{encoding}{NONE}{base64.b64encode(payload).decode()}"
+    return f"{MAGIC}{encoding}{NONE}{payload.decode()}"
+
+def decode_value(text):
+    """
+    Decodes an envelope (one deterministic decode), or a legacy row.
+
+    Args:
+        text (str|None): Stored value
+
+    Returns:
+        The original value, or None
+    """
+    if not text:
+        return None
+    if not text.startswith(MAGIC):
+        return decode_legacy(text)
+
+    encoding, compression = text[len(MAGIC)], text[len(MAGIC) + 1]
+    body = text[HEADER_LEN:]
+    if compression == NONE:
+        if encoding == RAW:
+            return body
+        if encoding == JSON:
+            return json.loads(body)
+        payload = base64.b64decode(body)
+    else:
+        payload = decompress(base64.b64decode(body), compression)
+
+    if encoding == RAW:
+        return payload.decode()
+    if encoding == JSON:
+        return json.loads(payload)
+    if msgpack is None:
+        raise RuntimeError("❌ Stored value is msgpack-encoded but 'msgpack' is not installed.")
+    return msgpack.unpackb(payload, raw=False)
+
+def decode_legacy(text):
+    """Pre-envelope behaviour: JSON if it parses, otherwise the raw string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def wrap_legacy(text):
+    """
+    Converts a legacy stored value to an envelope without changing what it decodes to.
+    Used by the memory_value_envelope migration.
+    """
+    if not text or text.startswith(MAGIC):
+        return text
+    try:
+        json.loads(text)
+        return f"{MAGIC}{JSON}{NONE}{text}"
+    except ValueError:
+        return f"{MAGIC}{RAW}{NONE}{text}"
+
+def unwrap_legacy(text):
+    """Inverse of wrap_legacy, for downgrading to the pre-envelope format."""
+    if not text or not text.startswith(MAGIC):
+        return text
+    value = decode_value(text)
+    return value if isinstance(value, str) else json.dumps(value)
+
+def stored_form(value):
+    """
+    The value as a persisted engine returns it after storing it (tuples become
+    lists, JSON dict keys strings, ...), for caches that must agree with reads.
+    """
+    if isinstance(value, str):
+        return value
+    return decode_value(encode_value(value, compression=NONE))
+
+def copy_value(value):
+    """
+    Copies a JSON-shaped value so callers can mutate what they fetched without
+    touching a cached/stored object. Much cheaper than copy.deepcopy.
+    """
+    if isinstance(value, dict):
+        return {k: copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_value(v) for v in value]
+    return value
+
+def compress(payload, compression):
+    """Compresses bytes with ZLIB or ZSTD (also used by the Redis cache codec)."""
+    if compression == ZSTD:
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+def decompress(payload, compression):
+    """Inverse of compress()."""
+    if compression == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("❌ Stored value is zstd-compressed but 'zstandard' is not installed.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return zlib.decompress(payload)
@@ -0,0 +1,146 @@
+import json
+import fakeredis
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.routes import neuroweave_routes, rootbloom_routes, sporelink_routes
+from core.utils import rate_limiter as rl
+from prometheus_client import REGISTRY
+from shared.agents.agent_base import AgentBase
+from shared.ai.gpt_client import GPTClient, GPTStreamError
+
+class EchoAgent(AgentBase):
+    def ask(self, prompt):
+        return f"echo {prompt}"
+
+class BrokenStream:
+    """OpenAI stream stand-in: yields `deltas`, then fails"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.closed = False
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        raise ConnectionError("upstream reset")
+
+    async def close(self):
+        self.closed = True
+
+def _failing_gpt(agent, stream=None):
+    async def create(**kwargs):
+        if stream is None:
+            raise ConnectionError("upstream down")
+        return stream
+
+    gpt = GPTClient(agent=agent)
+    gpt.test_mode = False
+    gpt.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return gpt
+
+def _sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def _ttft_count(agent):
+    return REGISTRY.get_sample_value("agent_time_to_first_token_seconds_count", {"agent": agent}) or 0
+
+@pytest.fixture
+def limiter(monkeypatch):
+    server = fakeredis.FakeServer()
+    limiter = rl.RateLimiter(
+        client=fakeredis.FakeRedis(server=server),
+        async_client=fakeredis.aioredis.FakeRedis(server=server),
+    )
+    monkeypatch.setattr(rl, "local_rate_limiter", rl.LeasedRateLimiter(limiter, lease_size=1))
+    return limiter
+
+@pytest.fixture
+def client(monkeypatch, limiter):
+    monkeypatch.setenv("ENVIRONMENT", "test")
+    app = FastAPI()
+    for module in (neuroweave_routes, rootbloom_routes, sporelink_routes):
+        monkeypatch.setattr(module.agent, "gpt", GPTClient(agent=module.agent.name))
+        app.include_router(module.router, prefix="/api")
+    return TestClient(app)
+
+@pytest.mark.asyncio
+async def test_astream_yields_the_reply_in_pieces(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "test")
+    gpt = GPTClient(agent="Neuroweave")
+    deltas = [delta async for delta in gpt.astream("hello there")]
+    assert len(deltas) > 1
+    assert "".join(deltas) == gpt.ask("hello there")
+
+@pytest.mark.asyncio
+async def test_agent_base_stream_falls_back_to_ask():
+    assert [delta async for delta in EchoAgent("Echo").stream("hi")] == ["echo hi"]
+
+def test_sse_streams_tokens_then_done(client):
+    before = _ttft_count("rootbloom")
+    response = client.post("/api/rootbloom/generate/stream", json={"prompt": "a poem"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    tokens = [data["delta"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    assert events[-1] == ("done", {"agent": "RootBloom", "response": "".join(tokens)})
+    assert _ttft_count("rootbloom") == before + 1
+
+def test_sse_rejects_an_oversized_budget(client):
+    response = client.post("/api/neuroweave/ask/stream", json={"prompt": "x", "max_tokens": 100000})
+    assert response.status_code == 422
+
+def test_websocket_streams_each_prompt(client):
+    with client.websocket_connect("/api/sporelink/analyze/ws") as ws:
+        for prompt in ("first", "second"):
+            ws.send_json({"prompt": prompt})
+            tokens = []
+            while (message := ws.receive_json())["type"] == "token":
+                tokens.append(message["delta"])
+            assert message["type"] == "done"
+            assert message["response"] == "".join(tokens)
+            assert prompt in message["response"]
+        ws.send_json({"max_tokens": 10})
+        assert ws.receive_json()["type"] == "error"
+
+def test_websocket_prompts_are_rate_limited(client, limiter):
+    limiter.endpoint_limits["/api/sporelink/analyze/stream"] = 1
+    with client.websocket_connect("/api/sporelink/analyze/ws") as ws:
+        ws.send_json({"prompt": "first"})
+        while ws.receive_json()["type"] == "token":
+            pass
+        ws.send_json({"prompt": "second"})
+        denied = ws.receive_json()
+        assert denied["type"] == "error" and denied["retry_after"] >= 1
+    # Charged to the SSE endpoint's bucket, which the socket shares
+    assert not limiter.hit("ip:unknown", "POST", "/api/sporelink/analyze/stream").allowed
+
+@pytest.mark.asyncio
+async def test_astream_raises_on_upstream_failure():
+    with pytest.raises(GPTStreamError):
+        [delta async for delta in _failing_gpt("Neuroweave").astream("hi")]
+    stream = BrokenStream(["par", "tial"])
+    deltas = []
+    with pytest.raises(GPTStreamError):
+        async for delta in _failing_gpt("Neuroweave", stream).astream("hi"):
+            deltas.append(delta)
+    assert deltas == ["par", "tial"] and stream.closed
+    unconfigured = _failing_gpt("Neuroweave")
+    unconfigured.async_client = None
+    with pytest.raises(GPTStreamError):
+        [delta async for delta in unconfigured.astream("hi")]
+
+def test_upstream_failure_reaches_sse_and_websocket_clients(client, monkeypatch):
+    monkeypatch.setattr(rootbloom_routes.agent, "gpt", _failing_gpt("RootBloom", BrokenStream(["par", "tial"])))
+    events = _sse_events(client.post("/api/rootbloom/generate/stream", json={"prompt": "x"}).text)
+    assert [event for event, _ in events] == ["token", "token", "error"]
+    monkeypatch.setattr(sporelink_routes.agent, "gpt", _failing_gpt("SporeLink"))
+    with client.websocket_connect("/api/sporelink/analyze/ws") as ws:
+        ws.send_json({"prompt": "x"})
+        assert ws.receive_json() == {"type": "error", "detail": "SporeLink stream failed"}
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import pytest
+import enum
+from datetime import datetime
+from decimal import Decimal
+from pathlib import PurePosixPath
+from uuid import UUID
+from core.cache.keys import UnkeyableArgument, namespace_of, make_key, digest_args, normalize
+
+class _Color(enum.IntEnum):
+    RED = 1
+
+class _Service:
+    async def lookup(self, query):
+        return query
+
+def test_digest_ignores_dict_and_set_order():
+    assert digest_args({"a": 1, "b": {2, 1}}) == digest_args({"b": {1, 2}, "a": 1})
+    assert digest_args((1, 2)) == digest_args([1, 2])
+    assert digest_args(1, x=2) != digest_args(1, 2)
+
+def test_normalize_rejects_default_reprs_and_keeps_types_apart():
+    with pytest.raises(UnkeyableArgument):
+        normalize(_Service())
+    assert digest_args({1: "x"}) != digest_args({"1": "x"})
+    assert digest_args({2: "b", 1: "a"}) == digest_args({1: "a", 2: "b"})
+    assert normalize(datetime(2026, 1, 1)) == {"__datetime__": "2026-01-01T00:00:00"}
+    assert normalize(b"\x01") == {"__bytes__": "01"}
+
+def test_typed_values_never_match_their_plain_forms():
+    uid = UUID(int=7)
+    at = datetime(2026, 1, 1)
+    assert digest_args(uid) != digest_args(str(uid))
+    assert digest_args(at) != digest_args(at.isoformat())
+    assert digest_args(at.date()) != digest_args(at.date().isoformat())
+    assert digest_args(Decimal("1.5")) != digest_args("1.5")
+    assert digest_args(PurePosixPath("/a")) != digest_args("/a")
+    assert digest_args(_Color.RED) != digest_args(1)
+    # Literal dicts shaped like a tag are escaped
+    assert digest_args({"__bytes__": "ab"}) != digest_args(b"\xab")
+    assert digest_args({"__escaped__": {"__bytes__": "ab"}}) != digest_args({"__bytes__": "ab"})
+
+def test_namespace_and_generation_are_part_of_the_key():
+    ns = namespace_of(_Service.lookup, version="2")
+    assert ns == f"{__name__}._Service.lookup@2"
+    assert make_key(ns, 0, "q").startswith(f"cache:{ns}:g0:")
+    assert make_key(ns, 0, "q") != make_key(ns, 1, "q")
+
+def test_digest_is_stable_across_processes():
+    code = "from core.cache.keys import digest_args; print(digest_args('prompt', {'k': [1, 2]}))"
+    env = {**os.environ, "PYTHONHASHSEED": "123", "PYTHONPATH": os.getcwd()}
+    other = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert other.stdout.strip() == digest_args("prompt", {"k": [1, 2]})
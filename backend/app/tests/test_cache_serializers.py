@@ -0,0 +1,45 @@
+import pytest
+from datetime import datetime
+from pydantic import BaseModel
+from core.cache.serializers import CacheCodec, MAGIC
+
+class _Result(BaseModel):
+    agent_id: str
+    created: datetime
+
+RESULT = {"agent_id": "cortexa", "response": "spores " * 400, "processing_time": 0.42}
+
+@pytest.mark.parametrize("serializer", ["json", "msgpack", "pickle"])
+def test_roundtrip(serializer):
+    codec = CacheCodec(serializer=serializer, compression="none")
+    frame = codec.encode(RESULT)
+    assert frame.startswith(MAGIC)
+    assert codec.decode(frame) == RESULT
+
+def test_non_json_types_serialize():
+    codec = CacheCodec()
+    value = {"when": datetime(2026, 1, 1), "model": _Result(agent_id="daphne", created=datetime(2026, 1, 1))}
+    assert codec.decode(codec.encode(value)) == {
+        "when": "2026-01-01T00:00:00",
+        "model": {"agent_id": "daphne", "created": "2026-01-01T00:00:00"},
+    }
+    binary = CacheCodec(serializer="msgpack")
+    assert binary.decode(binary.encode({"raw": b"\x00\xff"})) == {"raw": b"\x00\xff"}
+
+def test_compression_above_threshold():
+    codec = CacheCodec(compression="zlib", threshold=256)
+    frame = codec.encode(RESULT)
+    assert frame[len(MAGIC) + 1:len(MAGIC) + 2] == b"z"
+    assert len(frame) < len(RESULT["response"])
+    assert codec.decode(frame) == RESULT
+    assert codec.encode("short")[len(MAGIC) + 1:len(MAGIC) + 2] == b"-"
+
+def test_decodes_other_serializers_and_legacy_json():
+    json_codec = CacheCodec()
+    assert json_codec.decode(CacheCodec(serializer="msgpack").encode([1, 2])) == [1, 2]
+    assert json_codec.decode(b'{"legacy": true}') == {"legacy": True}
+
+def test_pickle_frames_need_pickle_configured():
+    frame = CacheCodec(serializer="pickle").encode({"n": 1})
+    with pytest.raises(ValueError):
+        CacheCodec().decode(frame)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+import fakeredis
+from core.events.event_bus import Event, EventBus, RedisPubSubEventBus, RedisStreamEventBus
+from core.utils.websocket_manager import ConnectionManager
+
+class Collector:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, batch):
+        self.batches.append(batch)
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+@pytest_asyncio.fixture
+async def server():
+    return fakeredis.FakeServer()
+
+async def _settle(seconds=0.1):
+    await asyncio.sleep(seconds)
+
+@pytest.mark.asyncio
+async def test_in_process_bus_batches_per_tick():
+    bus = EventBus(tick_ms=20)
+    collector = Collector()
+    await bus.publish("system", {"n": 0})   # Not started yet: dropped
+    await bus.start(collector)
+    for n in range(5):
+        await bus.publish("system", {"n": n})
+    await _settle(0.05)
+    await bus.close()
+    assert len(collector.batches) == 1
+    assert [e.payload["n"] for e in collector.events] == [0, 1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_pubsub_reaches_every_worker(server):
+    workers = [RedisPubSubEventBus(client=fakeredis.aioredis.FakeRedis(server=server), tick_ms=10) for _ in range(2)]
+    collectors = [Collector() for _ in workers]
+    for bus, collector in zip(workers, collectors):
+        await bus.start(collector)
+    await _settle()   # Subscriptions in place
+    await workers[0].publish("agent:neuroweave", {"msg": "hi"})
+    await _settle()
+    for bus in workers:
+        await bus.close()
+    assert all(c.events == [Event("agent:neuroweave", {"msg": "hi"})] for c in collectors)
+
+@pytest.mark.asyncio
+async def test_streams_deliver_with_ids_and_replay(server):
+    publisher = RedisStreamEventBus(client=fakeredis.aioredis.FakeRedis(server=server), maxlen=100, tick_ms=10)
+    await publisher.publish("system", {"n": 0})     # Before the reader started: not delivered live
+    reader = RedisStreamEventBus(client=fakeredis.aioredis.FakeRedis(server=server), tick_ms=10)
+    collector = Collector()
+    await reader.start(collector)
+    await _settle()
+    for n in range(1, 4):
+        await publisher.publish("system" if n != 2 else "agent:rootbloom", {"n": n})
+    await _settle()
+    await reader.close()
+    assert [e.payload["n"] for e in collector.events] == [1, 2, 3]
+    first = collector.events[0]
+    assert first.message() == {"n": 1, "event_id": first.id}
+
+    missed = await publisher.replay(first.id, ["system"])
+    assert [e.payload["n"] for e in missed] == [3]
+    assert await publisher.replay("not-an-id", ["system"]) == []
+    await publisher.close()
+
+@pytest.mark.asyncio
+async def test_hub_sends_one_frame_per_topic_per_tick():
+    hub = ConnectionManager(heartbeat_interval=3600)
+    frames = []
+
+    class Socket:
+        async def accept(self):
+            pass
+
+        async def close(self, code=1000):
+            pass
+
+        async def send_text(self, frame):
+            frames.append(json.loads(frame))
+
+    await hub.connect(Socket(), "c0")
+    hub.subscribe("c0", "system")
+    await hub.dispatch([
+        Event("system", {"n": 1}),
+        Event("agent:sporelink", {"n": 2}),
+        Event("system", {"n": 3}),
+    ])
+    await asyncio.sleep(0.01)
+    await hub.close_all()
+    assert frames == [{"type": "batch", "events": [{"n": 1}, {"n": 3}]}]
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from api.routes import myocore_routes
+from api.services import token_service
+from core.events.event_bus import Event, EventBus
+from core.utils.log_stream import LOGS_TOPIC, LiveLogHandler, LogFilter, agent_of
+from core.utils.websocket_manager import ConnectionManager
+
+@pytest.fixture
+def handler():
+    handler = LiveLogHandler(buffer_size=50, flush_ms=10, max_per_flush=3, level=logging.DEBUG)
+    loggers = [logging.getLogger(name) for name in ("daphne_agent", "cortexa_agent")]
+    for logger in loggers:
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+    yield handler
+    for logger in loggers:
+        logger.removeHandler(handler)
+
+@pytest.fixture
+def stream_client(monkeypatch, handler):
+    monkeypatch.setattr(myocore_routes, "manager", ConnectionManager(heartbeat_interval=3600))
+    monkeypatch.setattr(myocore_routes, "live_log_handler", handler)
+    monkeypatch.setattr(token_service, "SECRET_KEY", "s3cret")
+    app = FastAPI()
+    app.include_router(myocore_routes.router, prefix="/api")
+    client = TestClient(app)
+    client.token = token_service.create_access_token({"sub": "Atlas", token_service.VERIFIED_CLAIM: True})
+    return client
+
+def test_filter_params_and_matching():
+    log_filter = LogFilter.from_params("Daphne, cortexa", "warning", "atlas")
+    record = {"agent": "daphne", "levelno": logging.ERROR, "user": "atlas"}
+    assert log_filter(record)
+    assert not log_filter({**record, "levelno": logging.INFO})
+    assert not log_filter({**record, "agent": "rootbloom"})
+    assert not log_filter({**record, "user": "guest"})
+    assert LogFilter.from_params()(record)
+    with pytest.raises(ValueError):
+        LogFilter.from_params(level="LOUD")
+    assert agent_of("daphne_agent") == "daphne" and agent_of("core.cache.redis_cache") == "core"
+
+def test_ring_buffer_tail_is_filtered(handler):
+    for n in range(5):
+        logging.getLogger("daphne_agent").info(f"info {n}")
+    logging.getLogger("cortexa_agent").warning("careful")
+    logging.getLogger("daphne_agent").error("broken")
+    assert [r["message"] for r in handler.buffer.tail(3)] == ["info 4", "careful", "broken"]
+    warnings = handler.buffer.tail(10, LogFilter.from_params(level="WARNING"))
+    assert [r["message"] for r in warnings] == ["careful", "broken"]
+    assert [r["message"] for r in handler.buffer.tail(2, LogFilter.from_params("daphne"))] == ["info 4", "broken"]
+
+@pytest.mark.asyncio
+async def test_flush_coalesces_past_the_limit(handler):
+    published = []
+
+    class Bus:
+        async def publish_many(self, topic, payloads):
+            published.append((topic, payloads))
+
+    handler._bus = Bus()
+    for n in range(10):
+        logging.getLogger("daphne_agent").info(f"step {n}")
+    await handler.flush_pending()
+    (topic, records), = published
+    assert topic == LOGS_TOPIC
+    assert [r["message"] for r in records[:3]] == ["step 0", "step 1", "step 2"]
+    assert records[3]["type"] == "log_summary"
+    assert records[3]["count"] == 7 and records[3]["last_message"] == "step 9"
+
+@pytest.mark.asyncio
+async def test_live_records_are_filtered_per_client(handler):
+    hub = ConnectionManager(heartbeat_interval=3600)
+    bus = EventBus(tick_ms=5)
+    received = {"all": [], "daphne_errors": []}
+
+    class Socket:
+        def __init__(self, name):
+            self.name = name
+
+        async def accept(self):
+            pass
+
+        async def close(self, code=1000):
+            pass
+
+        async def send_text(self, frame):
+            received[self.name].append(frame)
+
+    for name, selector in (("all", None), ("daphne_errors", LogFilter.from_params("daphne", "ERROR"))):
+        await hub.connect(Socket(name), name)
+        hub.subscribe(name, LOGS_TOPIC, selector)
+    await hub.attach(bus)
+    handler.start(bus)
+    logging.getLogger("daphne_agent").info("fine")
+    logging.getLogger("cortexa_agent").error("not daphne")
+    logging.getLogger("daphne_agent").error("daphne broke")
+    await asyncio.sleep(0.1)
+    await handler.stop()
+    await bus.close()
+    await hub.close_all()
+    assert len(received["all"]) == 1 and '"not daphne"' in received["all"][0]
+    assert len(received["daphne_errors"]) == 1
+    assert '"daphne broke"' in received["daphne_errors"][0] and "batch" not in received["daphne_errors"][0]
+
+def test_stream_sends_the_tail_on_connect(stream_client):
+    for n in range(3):
+        logging.getLogger("cortexa_agent").warning(f"warn {n}")
+    with stream_client.websocket_connect(f"/api/mycocore/stream?token={stream_client.token}&agent=cortexa&level=warning&tail=2") as ws:
+        assert ws.receive_json()["type"] == "connection_established"
+        recent = ws.receive_json()
+        assert [r["message"] for r in recent["events"]] == ["warn 1", "warn 2"]
+    with pytest.raises(WebSocketDisconnect):
+        with stream_client.websocket_connect(f"/api/mycocore/stream?token={stream_client.token}&level=loud") as ws:
+            ws.receive_json()
+
+def test_stream_requires_a_login_token(stream_client):
+    for query in ("", "?token=forged"):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with stream_client.websocket_connect(f"/api/mycocore/stream{query}") as ws:
+                ws.receive_json()
+        assert closed.value.code == 1008
+    headers = {"Authorization": f"Bearer {stream_client.token}"}
+    with stream_client.websocket_connect("/api/mycocore/stream", headers=headers) as ws:
+        assert ws.receive_json()["type"] == "connection_established"
+
+def test_non_admins_only_stream_their_own_records(stream_client):
+    logging.getLogger("daphne_agent").warning("theirs", extra={"user": "dustin"})
+    logging.getLogger("daphne_agent").warning("mine", extra={"user": "spore"})
+    # Unverified token claiming the owner's name, and a plain user
+    for sub in ("dustin", "spore"):
+        token = token_service.create_access_token({"sub": sub})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with stream_client.websocket_connect(f"/api/mycocore/stream?token={token}&user=other") as ws:
+                ws.receive_json()
+        assert closed.value.code == 1008
+    token = token_service.create_access_token({"sub": "spore"})
+    with stream_client.websocket_connect(f"/api/mycocore/stream?token={token}&tail=10") as ws:
+        ws.receive_json()
+        assert [r["message"] for r in ws.receive_json()["events"]] == ["mine"]
+    # Verified admins may read everyone's
+    with stream_client.websocket_connect(f"/api/mycocore/stream?token={stream_client.token}&tail=10") as ws:
+        ws.receive_json()
+        assert [r["message"] for r in ws.receive_json()["events"]] == ["theirs", "mine"]
+
+def test_replay_and_resubscribe_keep_the_log_filter(stream_client, monkeypatch):
+    records = [
+        Event(LOGS_TOPIC, {"type": "log", "agent": "daphne", "levelno": logging.INFO, "message": "chatter"}, "1-0"),
+        Event(LOGS_TOPIC, {"type": "log", "agent": "daphne", "levelno": logging.ERROR, "message": "broken"}, "2-0"),
+        Event("system", {"type": "notice"}, "3-0"),
+    ]
+
+    async def replay(last_id, topics):
+        return records
+
+    monkeypatch.setattr(myocore_routes.event_bus, "replay", replay)
+    with stream_client.websocket_connect(f"/api/mycocore/stream?token={stream_client.token}&level=error&last_event_id=0-0") as ws:
+        ws.receive_json()
+        missed = ws.receive_json()
+        assert [event.get("message", event["type"]) for event in missed["events"]] == ["broken", "notice"]
+        ws.send_text('{"action": "unsubscribe", "topic": "logs"}')
+        ws.send_text('{"action": "subscribe", "topic": "logs"}')
+        ws.send_text("ping")
+        assert ws.receive_json()["type"] == "pong"
+        (client_id,) = myocore_routes.manager.outboxes
+        assert myocore_routes.manager.outboxes[client_id].selectors[LOGS_TOPIC].min_level == logging.ERROR
@@ -0,0 +1,130 @@
+import json
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet
+from shared.memory import sql_memory_engine
+from shared.memory.sql_memory_engine import SQLMemoryEngine
+from shared.memory.in_memory_engine import InMemoryEngine
+from shared.memory.file_memory_engine import FileMemoryEngine
+from shared.memory.value_codec import encode_value
+from shared.memory.encrypted_memory_engine import EncryptedMemoryEngine
+from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+
+# Every engine MemoryRouter can hand out must pass this same suite.
+
+@pytest.fixture(params=["sql", "memory", "file", "encrypted", "cached"])
+def engine(request, tmp_path, monkeypatch):
+    if request.param == "sql":
+        sql_memory_engine.init_engine(f"sqlite:///{tmp_path}/memory.db")
+        yield SQLMemoryEngine()
+        sql_memory_engine.dispose_engine()
+    elif request.param == "file":
+        engine = FileMemoryEngine(str(tmp_path / "memory.log"))
+        yield engine
+        engine.close()
+    elif request.param == "encrypted":
+        monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+        yield EncryptedMemoryEngine(InMemoryEngine(), decrypt_cache=None)
+    elif request.param == "cached":
+        yield CachedMemoryEngine(InMemoryEngine(), cache=MemoryCache(name="conformance"))
+    else:
+        yield InMemoryEngine()
+
+def test_roundtrip_and_overwrite(engine):
+    engine.save("alice", "a", "plain")
+    engine.save("alice", "b", {"n": [1, 2]})
+    engine.save("alice", "a", "new")
+    assert engine.fetch("alice", "a") == "new"
+    assert engine.fetch("alice", "b") == {"n": [1, 2]}
+    assert engine.fetch("alice", "missing") is None
+    assert engine.fetch("bob", "a") is None
+
+def test_fetched_values_are_copies(engine):
+    engine.save("alice", "d", {"n": 1})
+    engine.fetch("alice", "d")["n"] = 2
+    assert engine.fetch("alice", "d") == {"n": 1}
+
+def test_batch_calls(engine):
+    engine.save_many("alice", {"a": 1, "b": "two"})
+    assert engine.fetch_many("alice", ["a", "b", "c"]) == {"a": 1, "b": "two", "c": None}
+    assert engine.fetch_many("alice", []) == {}
+
+def test_scan_pages_in_key_order(engine):
+    engine.save_many("alice", {f"k{i:02d}": i for i in range(7)})
+    engine.save("alice", "other", 0)
+    assert list(engine.iter_keys("alice", prefix="k", page_size=3)) == [f"k{i:02d}" for i in range(7)]
+    assert engine.scan_page("alice", prefix="k", after="k04", limit=2) == [("k05", 5), ("k06", 6)]
+    assert dict(engine.scan("alice")) == {**{f"k{i:02d}": i for i in range(7)}, "other": 0}
+
+def test_ttl(engine):
+    engine.save("alice", "short", "x", ttl=1)
+    engine.save("alice", "long", "y")
+    assert engine.fetch("alice", "short") == "x"
+    time.sleep(1.1)
+    assert engine.fetch_many("alice", ["short", "long"]) == {"short": None, "long": "y"}
+    assert list(engine.iter_keys("alice")) == ["long"]
+
+def test_fetch_many_with_ttl_reports_time_left(engine):
+    if isinstance(engine, CachedMemoryEngine):
+        pytest.skip("cache entries do not track the record TTL")
+    engine.save("alice", "short", "x", ttl=30)
+    engine.save("alice", "long", "y")
+    fetched = engine.fetch_many_with_ttl("alice", ["short", "long", "missing"])
+    assert fetched["short"][0] == "x" and 25 < fetched["short"][1] <= 30
+    assert fetched["long"] == ("y", None)
+    assert fetched["missing"] == (None, None)
+
+def test_clear(engine):
+    engine.save_many("alice", {"a": 1, "b": 2})
+    engine.save("bob", "a", 3)
+    engine.clear("alice")
+    assert engine.fetch_many("alice", ["a", "b"]) == {"a": None, "b": None}
+    assert engine.fetch("bob", "a") == 3
+
+def test_concurrent_writers(engine):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: engine.save(f"user{n % 4}", f"k{n}", n), range(64)))
+    for n in range(64):
+        assert engine.fetch(f"user{n % 4}", f"k{n}") == n
+
+def test_file_engine_replays_and_compacts(tmp_path):
+    path = str(tmp_path / "memory.log")
+    engine = FileMemoryEngine(path, compact_min_bytes=0)
+    for n in range(50):
+        engine.save("alice", "counter", n)
+    engine.save("bob", "gone", 1)
+    engine.clear("bob")
+    engine.close()
+
+    with open(path, "ab") as f:
+        f.write(b'{"u":"alice","k":"torn"')  # Crash mid-append
+
+    engine = FileMemoryEngine(path, compact_min_bytes=0)
+    assert engine.fetch("alice", "counter") == 49
+    assert engine.fetch("alice", "torn") is None
+    assert engine.fetch("bob", "gone") is None
+    assert engine.compact() > 0
+    assert engine.fetch("alice", "counter") == 49
+    engine.save("alice", "after", True)
+    engine.close()
+
+    engine = FileMemoryEngine(path)
+    assert engine.fetch_many("alice", ["counter", "after"]) == {"counter": 49, "after": True}
+    engine.close()
+
+def test_file_engine_skips_corrupt_records_mid_log(tmp_path):
+    path = str(tmp_path / "memory.log")
+    engine = FileMemoryEngine(path)
+    engine.save("alice", "before", 1)
+    engine.close()
+    after = json.dumps({"u": "alice", "k": "after", "v": encode_value(2), "x": None}).encode()
+    with open(path, "ab") as f:
+        f.write(b'{"u":"alice","k":\n' + after + b"\n")  # Corrupt line with a valid record after it
+        f.write(b'{"u":"alice","k":"torn"\n')                 # Bad final line: truncated
+
+    engine = FileMemoryEngine(path)
+    assert engine.fetch_many("alice", ["before", "after"]) == {"before": 1, "after": 2}
+    engine.close()
+    with open(path, "rb") as f:
+        assert f.read().endswith(after + b"\n")
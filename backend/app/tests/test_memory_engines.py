@@ -0,0 +1,292 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet
+from shared.memory import memory_sweeper, sql_memory_engine
+from shared.memory.sql_memory_engine import SQLMemoryEngine
+from shared.memory.encrypted_memory_engine import EncryptedMemoryEngine
+
+@pytest.fixture
+def sql_engine(tmp_path):
+    sql_memory_engine.init_engine(f"sqlite:///{tmp_path}/memory.db")
+    yield SQLMemoryEngine()
+    sql_memory_engine.dispose_engine()
+
+@pytest.fixture
+def encrypted_engine(sql_engine, monkeypatch):
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    return EncryptedMemoryEngine(sql_engine)
+
+def test_save_many_fetch_many(sql_engine):
+    sql_engine.save_many("alice", {"a": "plain", "b": {"n": 1}, "c": [1, 2]})
+    assert sql_engine.fetch_many("alice", ["a", "b", "c", "missing"]) == {
+        "a": "plain",
+        "b": {"n": 1},
+        "c": [1, 2],
+        "missing": None,
+    }
+    assert sql_engine.fetch("alice", "b") == {"n": 1}
+
+def test_save_many_overwrites_existing_keys(sql_engine):
+    sql_engine.save("alice", "a", "old")
+    sql_engine.save_many("alice", {"a": "new", "b": "added"})
+    assert sql_engine.fetch_many("alice", ["a", "b"]) == {"a": "new", "b": "added"}
+    assert sql_engine.fetch_many("bob", ["a"]) == {"a": None}
+
+def test_fetch_many_empty(sql_engine):
+    assert sql_engine.fetch_many("alice", []) == {}
+    sql_engine.save_many("alice", {})
+
+def test_save_upserts_existing_key(sql_engine):
+    sql_engine.save("alice", "a", "old")
+    sql_engine.save("alice", "a", {"v": 2})
+    assert sql_engine.fetch("alice", "a") == {"v": 2}
+
+def test_concurrent_saves_to_new_key(sql_engine):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: sql_engine.save("alice", "fresh", n), range(32)))
+    assert sql_engine.fetch("alice", "fresh") in range(32)
+
+def test_engine_options_from_env(monkeypatch):
+    monkeypatch.setenv("MEMORY_DB_POOL_SIZE", "20")
+    monkeypatch.setenv("MEMORY_DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("MEMORY_DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("MEMORY_DB_STATEMENT_TIMEOUT_MS", "5000")
+    options = sql_memory_engine.engine_options("postgresql://u:p@db/mem")
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 0
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+    assert "pool_size" not in sql_memory_engine.engine_options("sqlite://")
+
+def test_encrypted_batch_roundtrip(encrypted_engine, sql_engine):
+    encrypted_engine.save_many("alice", {"a": "secret", "b": {"n": 2}})
+    assert encrypted_engine.fetch_many("alice", ["a", "b", "x"]) == {"a": "secret", "b": {"n": 2}, "x": None}
+    assert sql_engine.fetch("alice", "a") != "secret"
+
+@pytest_asyncio.fixture
+async def async_sql_engine(tmp_path):
+    from shared.memory import async_sql_memory_engine
+    async_sql_memory_engine.init_async_engine(f"sqlite+aiosqlite:///{tmp_path}/memory_async.db")
+    yield async_sql_memory_engine.AsyncSQLMemoryEngine()
+    await async_sql_memory_engine.dispose_async_engine()
+
+def test_to_async_url():
+    from shared.memory.async_sql_memory_engine import to_async_url
+    assert to_async_url("sqlite:///data/x.db") == "sqlite+aiosqlite:///data/x.db"
+    assert to_async_url("postgresql://u:p@db:5432/mem") == "postgresql+asyncpg://u:p@db:5432/mem"
+
+@pytest.mark.asyncio
+async def test_async_engine_roundtrip(async_sql_engine):
+    await async_sql_engine.save("alice", "a", {"n": 1})
+    await async_sql_engine.save("alice", "a", {"n": 2})
+    await async_sql_engine.save_many("alice", {"b": "text"})
+    assert await async_sql_engine.fetch("alice", "a") == {"n": 2}
+    assert await async_sql_engine.fetch_many("alice", ["a", "b", "c"]) == {"a": {"n": 2}, "b": "text", "c": None}
+    await async_sql_engine.save("alice", "t", 1, ttl=30)
+    fetched = await async_sql_engine.fetch_many_with_ttl("alice", ["a", "t"])
+    assert fetched["a"] == ({"n": 2}, None) and 25 < fetched["t"][1] <= 30
+    await async_sql_engine.clear("alice")
+    assert await async_sql_engine.fetch("alice", "a") is None
+
+def test_cached_engine_read_through_and_invalidation(sql_engine, monkeypatch):
+    from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+    cached = CachedMemoryEngine(sql_engine, cache=MemoryCache(max_entries=2, ttl=60))
+    calls = []
+    fetch = sql_engine.fetch_many_with_ttl
+    monkeypatch.setattr(sql_engine, "fetch_many_with_ttl", lambda user, keys: calls.extend(keys) or fetch(user, keys))
+
+    cached.save("alice", "a", {"n": 1})
+    assert cached.fetch("alice", "a") == {"n": 1}
+    assert calls == []  # write-through
+
+    cached.fetch("alice", "a")["n"] = 99  # callers get copies
+    assert cached.fetch("alice", "a") == {"n": 1}
+
+    assert cached.fetch("alice", "missing") is None
+    assert cached.fetch("alice", "missing") is None
+    assert calls == ["missing"]  # absent keys are cached too
+
+    cached.save("alice", "b", "x")  # evicts least recently used ("a") past max_entries=2
+    assert len(cached.cache) == 2
+    assert cached.fetch("alice", "a") == {"n": 1}
+    assert calls == ["missing", "a"]
+
+    assert cached.fetch_many("alice", ["a", "b", "c"]) == {"a": {"n": 1}, "b": "x", "c": None}
+    cached.clear("alice")
+    assert len(cached.cache) == 0
+    assert cached.fetch("alice", "a") is None
+
+def test_cached_read_through_expires_with_the_record(sql_engine):
+    from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+    sql_engine.save("alice", "short", "x", ttl=1)
+    cached = CachedMemoryEngine(sql_engine, cache=MemoryCache(ttl=300))
+    assert cached.fetch("alice", "short") == "x"    # Filled by read-through, not by save
+    assert cached.fetch_many("alice", ["short"]) == {"short": "x"}
+    time.sleep(1.1)
+    assert sql_engine.fetch("alice", "short") is None
+    assert cached.fetch("alice", "short") is None
+
+def test_cached_writes_match_engine_reads(sql_engine):
+    from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+    cached = CachedMemoryEngine(sql_engine, cache=MemoryCache(ttl=60))
+    cached.save("alice", "k", (1, {2: 3}))
+    from_cache = cached.fetch("alice", "k")
+    cached.cache.clear()
+    assert cached.fetch("alice", "k") == from_cache == [1, {"2": 3}]
+
+def test_read_through_does_not_overwrite_a_newer_write(sql_engine, monkeypatch):
+    from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+    cached = CachedMemoryEngine(sql_engine, cache=MemoryCache(ttl=60))
+    sql_engine.save("alice", "k", "old")
+    fetch = sql_engine.fetch_many_with_ttl
+
+    def slow_read(user, keys):
+        stale = fetch(user, keys)
+        cached.save("alice", "k", "new")  # Lands while the read is in flight
+        return stale
+
+    monkeypatch.setattr(sql_engine, "fetch_many_with_ttl", slow_read)
+    assert cached.fetch("alice", "k") == "old"
+    monkeypatch.setattr(sql_engine, "fetch_many_with_ttl", fetch)
+    assert cached.fetch("alice", "k") == "new"
+    assert cached.cache._fills == {}
+
+def test_cached_engines_do_not_share_entries():
+    from shared.memory.in_memory_engine import InMemoryEngine
+    from shared.memory.cached_memory_engine import CachedMemoryEngine, MemoryCache
+    cache = MemoryCache(ttl=60)
+    a = CachedMemoryEngine(InMemoryEngine(), cache=cache)
+    b = CachedMemoryEngine(InMemoryEngine(), cache=cache)
+    a.save("alice", "k", "from a")
+    assert b.fetch("alice", "k") is None
+    b.clear("alice")
+    assert a.fetch("alice", "k") == "from a"
+    # Same namespace = same data: engines share entries and invalidations
+    c = CachedMemoryEngine(a.engine, cache=cache, namespace=a.namespace)
+    assert c.fetch("alice", "k") == "from a"
+
+def test_memory_router_namespaces_cache_by_mode(monkeypatch):
+    from shared.memory.memory_router import MemoryRouter
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    plain = MemoryRouter(mode="memory", encrypt=False, cache=True)
+    encrypted = MemoryRouter(mode="memory", encrypt=True, cache=True)
+    assert (plain.engine.namespace, encrypted.engine.namespace) == ("memory:plain", "memory:encrypted")
+    plain.save("k", "plain value")
+    assert encrypted.fetch("k") is None
+    plain.clear()
+
+def test_memory_cache_ttl():
+    from shared.memory.cached_memory_engine import MemoryCache, _MISSING
+    cache = MemoryCache(ttl=0.01)
+    cache.put("alice", "a", 1)
+    assert cache.get("alice", "a") == 1
+    time.sleep(0.02)
+    assert cache.get("alice", "a") is _MISSING
+
+def test_key_rotation_reencrypts_old_rows(sql_engine, monkeypatch):
+    from shared.memory.encrypted_memory_engine import reencrypt_records
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    monkeypatch.setenv("FERNET_KEY", old_key)
+    EncryptedMemoryEngine(sql_engine, decrypt_cache=None).save_many("alice", {"a": "one", "b": {"n": 2}})
+
+    monkeypatch.setenv("FERNET_KEYS", f"{new_key},{old_key}")
+    rotated = EncryptedMemoryEngine(sql_engine, decrypt_cache=None)
+    assert rotated.fetch("alice", "a") == "one"
+
+    assert reencrypt_records(batch_size=1) == {"scanned": 2, "rotated": 2, "skipped": 0}
+    assert reencrypt_records(batch_size=1)["rotated"] == 0
+
+    monkeypatch.setenv("FERNET_KEYS", new_key)
+    assert EncryptedMemoryEngine(sql_engine, decrypt_cache=None).fetch_many("alice", ["a", "b"]) == {"a": "one", "b": {"n": 2}}
+
+def test_decrypt_cache_skips_cipher(encrypted_engine, monkeypatch):
+    from shared.memory.cached_memory_engine import MemoryCache
+    encrypted_engine.decrypt_cache = MemoryCache(max_entries=8, ttl=0, name="decrypt")
+    encrypted_engine.save("alice", "a", {"n": 1})
+    assert encrypted_engine.fetch("alice", "a") == {"n": 1}
+    monkeypatch.setattr(encrypted_engine, "_decrypt_uncached", lambda ciphertext: pytest.fail("cache miss"))
+    assert encrypted_engine.fetch("alice", "a") == {"n": 1}
+
+def test_iter_keys_and_scan_paginate(sql_engine):
+    sql_engine.save_many("alice", {f"ctx:{i:02d}": i for i in range(7)})
+    sql_engine.save_many("alice", {"other": 1, "ctx_": "underscore is not a wildcard"})
+    sql_engine.save("bob", "ctx:00", "bob")
+    assert list(sql_engine.iter_keys("alice", prefix="ctx:", page_size=3)) == [f"ctx:{i:02d}" for i in range(7)]
+    assert list(sql_engine.scan("alice", prefix="ctx:", page_size=2))[-1] == ("ctx:06", 6)
+    assert len(list(sql_engine.iter_keys("alice", page_size=4))) == 9
+    assert sql_engine.scan_page("alice", prefix="ctx:", after="ctx:04", limit=10) == [("ctx:05", 5), ("ctx:06", 6)]
+
+def test_encrypted_scan(encrypted_engine):
+    encrypted_engine.save_many("alice", {"a": {"n": 1}, "b": "two"})
+    assert list(encrypted_engine.scan("alice", page_size=1)) == [("a", {"n": 1}), ("b", "two")]
+    assert list(encrypted_engine.iter_keys("alice")) == ["a", "b"]
+
+@pytest.mark.asyncio
+async def test_async_scan(async_sql_engine):
+    await async_sql_engine.save_many("alice", {f"k{i}": i for i in range(5)})
+    assert [key async for key in async_sql_engine.iter_keys("alice", page_size=2)] == [f"k{i}" for i in range(5)]
+    assert [item async for item in async_sql_engine.scan("alice", prefix="k3")] == [("k3", 3)]
+
+def test_ttl_expiry_and_sweep(sql_engine):
+    sql_engine.save("alice", "keep", "forever")
+    sql_engine.save("alice", "short", "gone soon", ttl=1)
+    sql_engine.save_many("alice", {"a": 1, "b": 2}, ttl=1)
+    assert sql_engine.fetch("alice", "short") == "gone soon"
+    time.sleep(1.1)
+    assert sql_engine.fetch("alice", "short") is None
+    assert sql_engine.fetch_many("alice", ["a", "keep"]) == {"a": None, "keep": "forever"}
+    assert list(sql_engine.iter_keys("alice")) == ["keep"]
+
+    assert sql_memory_engine.sweep_expired(batch_size=2) == 3
+    assert sql_memory_engine.sweep_expired(batch_size=2) == 0
+    assert sql_engine.fetch("alice", "keep") == "forever"
+
+@pytest.mark.asyncio
+async def test_sweeper_arguments_override_env_and_are_validated(monkeypatch):
+    calls = []
+    monkeypatch.setenv("MEMORY_SWEEP_INTERVAL", "60")
+    monkeypatch.setattr(memory_sweeper, "sweep_expired", lambda *args: calls.append(args) or 0)
+
+    async def stop(seconds):
+        calls.append(seconds)
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(memory_sweeper.asyncio, "sleep", stop)
+    with pytest.raises(asyncio.CancelledError):
+        await memory_sweeper.run_expiry_sweeper(interval=2, batch_size=5, max_batches=1)
+    assert calls == [(5, 1), 2]
+    for bad in ({"interval": 0}, {"batch_size": 0}, {"max_batches": 0}):
+        with pytest.raises(ValueError):
+            await memory_sweeper.run_expiry_sweeper(**bad)
+
+def test_sweeper_covers_memory_and_file_engines(tmp_path, monkeypatch):
+    from shared.memory import file_memory_engine
+    from shared.memory.file_memory_engine import FileMemoryEngine
+    from shared.memory.in_memory_engine import InMemoryEngine
+    store, log = InMemoryEngine(), FileMemoryEngine(str(tmp_path / "memory.log"))
+    monkeypatch.setattr(memory_sweeper, "memory_store", store)
+    monkeypatch.setattr(memory_sweeper, "sweep_expired", lambda *args: 0)
+    assert "file" not in memory_sweeper.sweep_engines(10, 1)   # Never opens the log itself
+    monkeypatch.setattr(file_memory_engine, "_default_engine", log)
+    for engine in (store, log):
+        engine.save_many("alice", {"gone": 1, "kept": 2})
+        engine.save("alice", "gone", 1, ttl=1)
+    time.sleep(1.1)
+    assert memory_sweeper.sweep_engines(10, 1) == {"sql": 0, "memory": 1, "file": 1}
+    assert log.fetch_many("alice", ["gone", "kept"]) == {"gone": None, "kept": 2}
+    log.close()
+
+def test_sweep_expired_rejects_limits_that_never_finish(sql_engine):
+    with pytest.raises(ValueError):
+        sql_memory_engine.sweep_expired(batch_size=0)
+    with pytest.raises(ValueError):
+        sql_memory_engine.sweep_expired(max_batches=0)
+
+def test_save_without_ttl_clears_expiry(sql_engine):
+    sql_engine.save("alice", "a", "v1", ttl=1)
+    sql_engine.save("alice", "a", "v2")
+    time.sleep(1.1)
+    assert sql_engine.fetch("alice", "a") == "v2"
@@ -0,0 +1,248 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import fakeredis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.utils import rate_limiter as rl
+from jose import jwt
+from starlette.requests import Request
+from core.utils.circuit_breaker import CircuitBreaker
+from core.utils.request_identity import IdentityResolver
+from core.utils.rate_limiter import RateLimiter, LeasedRateLimiter, rate_limit_headers
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(client=fakeredis.FakeRedis())
+
+def test_allows_burst_then_denies_with_retry_after(limiter):
+    limiter.route_limits["POST /api/test"] = 3
+    results = [limiter.hit("1.2.3.4", "POST", "/api/test") for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    denied = results[-1]
+    assert 0 < denied.retry_after <= limiter.period / 3
+    assert rate_limit_headers(denied)["Retry-After"] == str(int(-(-denied.retry_after // 1)))
+    # Other clients and routes have their own buckets
+    assert limiter.hit("5.6.7.8", "POST", "/api/test").allowed
+    assert limiter.hit("1.2.3.4", "GET", "/api/test").allowed
+
+def test_key_expires_with_the_bucket(limiter):
+    limiter.hit("1.2.3.4", "DELETE", "/api/x")
+    ttl_ms = limiter.redis.pttl("ratelimit:1.2.3.4:DELETE:/api/x")
+    assert 0 < ttl_ms <= limiter.period * 1000 / limiter.default_limits["DELETE"]
+
+def test_rule_precedence_and_env_rules(limiter):
+    limiter.load_rules("POST /api/chain/execute=5, /api/chain/execute=10, get=240")
+    assert limiter.get_limit("POST", "/api/chain/execute") == 5
+    assert limiter.get_limit("GET", "/api/chain/execute") == 10
+    assert limiter.get_limit("GET", "/api/other") == 240
+    assert limiter.get_limit("PATCH", "/api/other") == 60
+    with pytest.raises(ValueError):
+        limiter.load_rules("POST /api/x=lots")
+
+def test_fails_open_without_redis(monkeypatch):
+    monkeypatch.setenv("REDIS_PORT", "1")
+    monkeypatch.setenv("REDIS_CONNECT_TIMEOUT_MS", "100")
+    assert RateLimiter().hit("1.2.3.4", "GET", "/api/x").allowed
+
+def _count_calls(limiter):
+    calls = []
+    hit = limiter.hit
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs.get("cost", 1))
+        return hit(*args, **kwargs)
+
+    limiter.hit = counted
+    return calls
+
+def test_leased_limiter_spends_chunks_locally(limiter):
+    limiter.route_limits["GET /api/snapshot"] = 100
+    leased = LeasedRateLimiter(limiter, lease_size=10, lease_ttl_ms=60000, max_fraction=0.1)
+    calls = _count_calls(limiter)
+    results = [leased.hit("1.2.3.4", "GET", "/api/snapshot") for _ in range(100)]
+    assert all(r.allowed for r in results)
+    assert calls == [10] * 10
+    assert [r.remaining for r in results[:3]] == [99, 98, 97]
+    denied = leased.hit("1.2.3.4", "GET", "/api/snapshot")
+    assert not denied.allowed and denied.retry_after > 0
+    assert leased.hit("1.2.3.4", "GET", "/api/snapshot").allowed is False
+    assert len(calls) == 12   # The denial is remembered locally
+
+def test_leased_limiter_never_exceeds_the_shared_limit(limiter):
+    limiter.route_limits["POST /api/test"] = 25
+    workers = [LeasedRateLimiter(limiter, lease_size=10, lease_ttl_ms=60000, max_fraction=0.2) for _ in range(3)]
+    allowed = sum(w.hit("1.2.3.4", "POST", "/api/test").allowed for _ in range(20) for w in workers)
+    assert 25 - 3 * (5 - 1) <= allowed <= 25
+
+def test_circuit_breaker_opens_then_probes(monkeypatch):
+    breaker = CircuitBreaker("test_breaker", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    # After the reset timeout exactly one probe goes through
+    monkeypatch.setattr(breaker, "_opened_at", breaker._opened_at - 30)
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    monkeypatch.setattr(breaker, "_opened_at", breaker._opened_at - 30)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+@pytest_asyncio.fixture
+async def async_limiter():
+    server = fakeredis.FakeServer()
+    limiter = RateLimiter(
+        client=fakeredis.FakeRedis(server=server),
+        async_client=fakeredis.aioredis.FakeRedis(server=server),
+        breaker=CircuitBreaker("test_rate_limiter", failure_threshold=2, reset_timeout=30),
+    )
+    yield limiter
+    await limiter.aclose()
+
+@pytest.mark.asyncio
+async def test_async_hit_shares_buckets_with_sync(async_limiter):
+    async_limiter.route_limits["POST /api/test"] = 2
+    assert (await async_limiter.ahit("1.2.3.4", "POST", "/api/test")).allowed
+    assert async_limiter.hit("1.2.3.4", "POST", "/api/test").allowed
+    denied = await async_limiter.ahit("1.2.3.4", "POST", "/api/test")
+    assert not denied.allowed and denied.retry_after > 0
+
+@pytest.mark.asyncio
+async def test_slow_redis_fails_open_and_trips_the_breaker(async_limiter):
+    calls = []
+
+    async def stalled(keys, args):
+        calls.append(keys)
+        await asyncio.sleep(1)
+
+    async_limiter._agcra = stalled
+    async_limiter.deadline = 0.01
+    async_limiter.route_limits["GET /api/x"] = 1
+    results = [await async_limiter.ahit("1.2.3.4", "GET", "/api/x") for _ in range(4)]
+    assert all(r.allowed for r in results)
+    # Two timeouts open the breaker; after that Redis is not asked at all
+    assert len(calls) == 2
+    assert async_limiter.breaker.state == CircuitBreaker.OPEN
+
+def test_middleware_returns_429_json(monkeypatch, limiter):
+    limiter.route_limits["GET /api/ping"] = 1
+    monkeypatch.setattr(rl, "local_rate_limiter", LeasedRateLimiter(limiter, lease_size=1))
+
+    async def ahit(client_id, method, endpoint, cost=1, role=None):
+        return limiter.hit(client_id, method, endpoint, cost, role)
+
+    monkeypatch.setattr(limiter, "ahit", ahit)
+    app = FastAPI()
+    app.middleware("http")(rl.rate_limit_middleware)
+    app.get("/api/ping")(lambda: {"ok": True})
+    client = TestClient(app)
+
+    ok = client.get("/api/ping")
+    assert ok.status_code == 200 and ok.headers["X-RateLimit-Limit"] == "1"
+    denied = client.get("/api/ping")
+    assert denied.status_code == 429
+    assert denied.json()["detail"]["error"] == "Too many requests"
+    assert int(denied.headers["Retry-After"]) >= 1
+
+def _request(peer="203.0.113.9", headers=None, path="/api/x", method="GET"):
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "query_string": b"",
+        "client": (peer, 40000),
+    })
+
+def test_forwarded_for_only_trusted_from_proxies():
+    resolver = IdentityResolver(trusted_proxies="10.0.0.0/8", secret="")
+    spoofed = {"X-Forwarded-For": "1.1.1.1"}
+    assert resolver.resolve(_request("203.0.113.9", spoofed)).key == "ip:203.0.113.9"
+    # Client-supplied entries left of the real client are ignored
+    chain = {"X-Forwarded-For": "1.1.1.1, 198.51.100.7, 10.0.0.2"}
+    assert resolver.client_ip(_request("10.0.0.1", chain)) == "198.51.100.7"
+    assert resolver.client_ip(_request("10.0.0.1")) == "10.0.0.1"
+    with pytest.raises(ValueError):
+        IdentityResolver(trusted_proxies="10.0.0.0/8, lb", secret="")
+
+def test_jwt_subject_keys_the_bucket_and_verified_tokens_pick_the_tier():
+    resolver = IdentityResolver(trusted_proxies="", secret="s3cret")
+    token = jwt.encode({"sub": "Atlas", "verified": True}, "s3cret", algorithm="HS256")
+    identity = resolver.resolve(_request(headers={"Authorization": f"Bearer {token}"}))
+    assert identity == ("user:Atlas", "admin", "ip:203.0.113.9")
+    # Anyone can get a token for "dustin"; without verification it is only a guest
+    claimed = jwt.encode({"sub": "dustin"}, "s3cret", algorithm="HS256")
+    assert resolver.resolve(_request(headers={"Authorization": f"Bearer {claimed}"})).role == "guest"
+    forged = jwt.encode({"sub": "dustin"}, "guess", algorithm="HS256")
+    assert resolver.resolve(_request(headers={"Authorization": f"Bearer {forged}"})) == (
+        "ip:203.0.113.9", "anonymous", "ip:203.0.113.9"
+    )
+
+def test_token_holders_share_their_address_ceiling(limiter, monkeypatch):
+    monkeypatch.setattr(rl, "identity_resolver", IdentityResolver(trusted_proxies="", secret="s3cret"))
+    limiter.route_limits["GET /api/x"] = 2
+    limiter.tiers.update({"guest": 1, "ceiling": 2})
+
+    def fresh_login(name):
+        token = jwt.encode({"sub": name}, "s3cret", algorithm="HS256")
+        return _request(headers={"Authorization": f"Bearer {token}"})
+
+    # Every new name gets its own bucket, but the address caps them all
+    results = [limiter.check_rate_limit(fresh_login(f"user{i}")) for i in range(5)]
+    assert [r.allowed for r in results] == [True, True, True, True, False]
+    assert not limiter.check_rate_limit(_request()).allowed
+
+def test_tokens_from_login_identify_the_user(monkeypatch):
+    from api.routes import auth_routes
+    from api.services import token_service
+    monkeypatch.setattr(token_service, "SECRET_KEY", "s3cret")
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api")
+    client = TestClient(app)
+    token = client.post("/api/auth/login", json={"username": "Atlas", "password": "hunter22"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == "Atlas"
+    # No explicit secret: the resolver verifies with the one login signed with.
+    # The mock login checks no credentials, so its tokens only get the guest tier
+    resolver = IdentityResolver(trusted_proxies="")
+    assert resolver.resolve(_request(headers=headers))[:2] == ("user:Atlas", "guest")
+
+def test_role_tiers_scale_limits(limiter):
+    limiter.load_tiers("guest=1.5")
+    assert limiter.get_limit("GET", "/api/x") == 120
+    assert limiter.get_limit("GET", "/api/x", "owner") == 1200
+    assert limiter.get_limit("GET", "/api/x", "guest") == 180
+    assert limiter.get_limit("GET", "/api/x", "unknown") == 120
+    with pytest.raises(ValueError):
+        limiter.load_tiers("owner=many")
+
+def test_cost_weighted_by_chain_length_and_max_tokens(monkeypatch, limiter):
+    limiter.endpoint_limits["/api/chain/execute"] = 5
+    monkeypatch.setattr(rl, "local_rate_limiter", LeasedRateLimiter(limiter, lease_size=1))
+
+    async def ahit(client_id, method, endpoint, cost=1, role=None):
+        return limiter.hit(client_id, method, endpoint, cost, role)
+
+    monkeypatch.setattr(limiter, "ahit", ahit)
+    app = FastAPI()
+    app.middleware("http")(rl.rate_limit_middleware)
+
+    @app.post("/api/chain/execute")
+    async def execute(request: Request):
+        return {"steps": len((await request.json())["chain"])}
+
+    client = TestClient(app)
+    chain = {"chain": [{"agent": "neuroweave", "prompt": "hi"}] * 3}
+    first = client.post("/api/chain/execute", json=chain)
+    assert first.json() == {"steps": 3}   # The route still sees the body
+    assert first.headers["X-RateLimit-Remaining"] == "2"
+    assert client.post("/api/chain/execute", json=chain).status_code == 429
+    assert client.post("/api/chain/execute", json={"chain": [chain["chain"][0]]}).status_code == 200
+
+    assert rl.max_tokens_cost({"max_tokens": 1200}, 500) == 3
+    assert rl.max_tokens_cost({"prompt": "hi"}, 500) == 1
@@ -0,0 +1,245 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import fakeredis
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.routes import system_routes
+from core.cache import decorators
+from shared.memory.cached_memory_engine import MemoryCache
+from core.cache.hot_keys import HotKeyTracker
+from core.cache.redis_cache import RedisCache, redis_pool_options
+
+@pytest_asyncio.fixture
+async def redis_cache():
+    server = fakeredis.FakeServer()
+    cache = RedisCache(
+        client=fakeredis.FakeRedis(server=server),
+        async_client=fakeredis.aioredis.FakeRedis(server=server),
+        l1=MemoryCache(max_entries=64, ttl=30, name="test_l1"),
+    )
+    yield cache
+    await cache.aclose()
+
+def test_pool_options_from_env(monkeypatch):
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "8")
+    monkeypatch.setenv("REDIS_SOCKET_TIMEOUT_MS", "250")
+    monkeypatch.setenv("REDIS_HEALTH_CHECK_INTERVAL", "10")
+    options = redis_pool_options()
+    assert options["max_connections"] == 8
+    assert options["socket_timeout"] == 0.25
+    assert options["health_check_interval"] == 10
+
+def test_sync_roundtrip(redis_cache):
+    redis_cache.set("k", {"n": 1}, expire=60)
+    assert redis_cache.get("k") == {"n": 1}
+    redis_cache.delete("k")
+    assert redis_cache.get("k") is None
+
+@pytest.mark.asyncio
+async def test_async_roundtrip_shares_storage(redis_cache):
+    await redis_cache.aset("k", [1, 2], expire=60)
+    assert redis_cache.get("k") == [1, 2]
+    assert await redis_cache.aget("k") == [1, 2]
+    await redis_cache.adelete("k")
+    assert await redis_cache.aget("k") is None
+
+@pytest.mark.asyncio
+async def test_errors_are_swallowed(monkeypatch):
+    monkeypatch.setenv("REDIS_PORT", "1")
+    monkeypatch.setenv("REDIS_CONNECT_TIMEOUT_MS", "100")
+    cache = RedisCache()
+    assert cache.get("k") is None
+    assert await cache.aget("k") is None
+    await cache.aset("k", 1)
+    await cache.aclose()
+
+@pytest.mark.asyncio
+async def test_l1_serves_hits_without_redis(redis_cache):
+    await redis_cache.aset("k", {"n": 1}, expire=60)
+    await redis_cache.aredis.delete("k")  # Gone from L2 only
+    assert await redis_cache.aget("k") == {"n": 1}
+    await redis_cache.adelete("k")
+    assert await redis_cache.aget("k") is None
+
+@pytest.mark.asyncio
+async def test_l1_and_redis_return_the_same_types(redis_cache):
+    value = {"at": datetime(2026, 1, 1), "ids": (1, 2)}
+    await redis_cache.aset("k", value, expire=60)
+    from_l1 = await redis_cache.aget("k")
+    redis_cache.l1.clear()
+    assert await redis_cache.aget("k") == from_l1 == {"at": "2026-01-01T00:00:00", "ids": [1, 2]}
+
+@pytest.mark.asyncio
+async def test_cached_coalesces_concurrent_misses(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    calls = []
+
+    @decorators.cached(expire=60)
+    async def slow(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return {"x": x}
+
+    results = await asyncio.gather(*(slow(1) for _ in range(10)))
+    assert results == [{"x": 1}] * 10
+    assert calls == [1]
+    assert await slow(1) == {"x": 1}
+    assert calls == [1]
+
+@pytest.mark.asyncio
+async def test_cached_early_refresh_recomputes_in_background(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    calls = []
+
+    @decorators.cached(expire=60, early_refresh=True, beta=1e9)
+    async def value():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    assert await value() == 1
+    assert await value() == 1   # Served while the refresh runs
+    await asyncio.sleep(0.05)
+    assert len(calls) == 2
+    assert await value() == 2
+    await asyncio.sleep(0.05)
+
+@pytest.mark.asyncio
+async def test_invalidate_namespace_bumps_generation(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    calls = []
+
+    @decorators.cached(expire=60)
+    async def lookup(x):
+        calls.append(x)
+        return x
+
+    await lookup(1)
+    await lookup(1)
+    assert calls == [1]
+    assert await redis_cache.ageneration(lookup.namespace) == 0
+    await redis_cache.ainvalidate_namespace(lookup.namespace)
+    assert redis_cache.generation(lookup.namespace) == 1
+    await lookup(1)
+    assert calls == [1, 1]
+
+@pytest.mark.asyncio
+async def test_other_workers_see_a_new_generation_quickly(redis_cache):
+    worker = RedisCache(
+        client=redis_cache.redis,
+        async_client=redis_cache.aredis,
+        l1=MemoryCache(max_entries=64, ttl=30, name="test_l1_worker"),
+    )
+    worker.generation_ttl = 0.05
+    assert await worker.ageneration("ns") == 0
+    await redis_cache.ainvalidate_namespace("ns")
+    assert await worker.ageneration("ns") == 0   # Briefly cached
+    await asyncio.sleep(0.06)
+    assert await worker.ageneration("ns") == 1   # Well before the 30 s L1 TTL
+
+@pytest.mark.asyncio
+async def test_cached_methods_skip_self_and_bypass_unkeyable_args(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    calls = []
+
+    class Service:
+        @decorators.cached(expire=60)
+        async def lookup(self, query):
+            calls.append(query)
+            return str(query)
+
+    class Opaque:
+        pass
+
+    assert await Service().lookup("q") == "q"
+    assert await Service().lookup("q") == "q"   # Another instance, same entry
+    assert calls == ["q"]
+    await Service().lookup(Opaque())
+    await Service().lookup(Opaque())
+    assert len(calls) == 3  # Ran uncached
+
+@pytest.mark.asyncio
+async def test_bulk_operations(redis_cache):
+    await redis_cache.aset_many({"a": 1, "b": {"n": 2}}, expire={"a": 30, "b": 90})
+    assert 0 < await redis_cache.aredis.ttl("a") <= 30
+    assert 30 < await redis_cache.aredis.ttl("b") <= 90
+    assert await redis_cache.aget_many(["a", "b", "c"]) == {"a": 1, "b": {"n": 2}, "c": None}
+    assert redis_cache.get_many(["b"]) == {"b": {"n": 2}}
+    await redis_cache.adelete_many(["a", "b"])
+    assert await redis_cache.aget_many(["a", "b"]) == {"a": None, "b": None}
+
+def test_get_many_uses_l1_then_mget(redis_cache):
+    redis_cache.set_many({"a": 1, "b": 2})
+    redis_cache.redis.set("c", redis_cache.codec.encode(3))   # Written by another worker
+    redis_cache.redis.delete("a")                              # Still in this worker's L1
+    assert redis_cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2, "c": 3}
+    redis_cache.delete_many(["a", "b", "c"])
+    assert redis_cache.get_many(["a", "c"]) == {"a": None, "c": None}
+
+@pytest.mark.asyncio
+async def test_cached_batch_only_computes_missing_items(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    seen = []
+
+    @decorators.cached_batch(expire=60)
+    async def square(items, scale=1):
+        seen.append(list(items))
+        return [item * item * scale for item in items]
+
+    assert await square([1, 2, 3]) == [1, 4, 9]
+    assert await square([3, 4, 1]) == [9, 16, 1]
+    assert seen == [[1, 2, 3], [4]]
+    assert await square([2], scale=10) == [40]
+    assert seen[-1] == [2]
+
+@pytest.mark.asyncio
+async def test_cached_batch_keeps_none_results_and_rejects_short_lists(redis_cache, monkeypatch):
+    monkeypatch.setattr(decorators, "cache", redis_cache)
+    seen = []
+
+    @decorators.cached_batch(expire=60)
+    async def lookup(items):
+        seen.append(list(items))
+        return [None if item == "gone" else item.upper() for item in items]
+
+    assert await lookup(["gone", "spore"]) == [None, "SPORE"]
+    assert await lookup(["gone", "spore"]) == [None, "SPORE"]
+    assert seen == [["gone", "spore"]]
+
+    @decorators.cached_batch(expire=60)
+    async def short(items):
+        return items[:-1]
+
+    with pytest.raises(ValueError):
+        await short(["a", "b"])
+
+def test_hot_keys_rank_by_hits():
+    tracker = HotKeyTracker(sample_rate=1.0, top_n=3)
+    for key, hits in {"a": 50, "b": 5, "c": 20, "d": 1, "e": 30}.items():
+        for _ in range(hits):
+            tracker.record(key)
+    assert [key for key, _ in tracker.top()] == ["a", "e", "c"]
+    assert tracker.top(1) == [("a", 50)]
+
+def test_stats_reports_hits_and_namespaces(redis_cache):
+    redis_cache.hot_keys = HotKeyTracker(sample_rate=1.0)
+    redis_cache.set("system:metrics", {"cpu": 1})
+    for _ in range(3):
+        redis_cache.get("system:metrics")
+    redis_cache.get("system:missing")
+    stats = redis_cache.stats()
+    assert stats["l1_entries"] == 1
+    assert stats["top_keys"] == [{"key": "system:metrics", "namespace": "system", "hits": 3}]
+
+def test_system_cache_route_reports_stats(redis_cache, monkeypatch):
+    monkeypatch.setattr(system_routes, "cache", redis_cache)
+    redis_cache.hot_keys = HotKeyTracker(sample_rate=1.0)
+    redis_cache.set("system:metrics", {"cpu": 1})
+    redis_cache.get("system:metrics")
+    app = FastAPI()
+    app.include_router(system_routes.router, prefix="/api")
+    response = TestClient(app).get("/api/system/cache?top=5")
+    assert response.status_code == 200
+    assert response.json()["top_keys"] == [{"key": "system:metrics", "namespace": "system", "hits": 1}]
@@ -0,0 +1,35 @@
+import pytest
+from shared.memory.value_codec import (
+    MAGIC, JSON, MSGPACK, NONE, ZLIB,
+    encode_value, decode_value, wrap_legacy, unwrap_legacy,
+)
+
+@pytest.mark.parametrize("value", ["plain", "123", "", {"n": [1, 2, {"x": None}]}, [1, "a"], 42, True])
+def test_roundtrip(value):
+    assert decode_value(encode_value(value, fmt=JSON, compression=NONE)) == value
+
+def test_strings_are_not_guessed_as_json():
+    # Legacy fetch turned the string "123" into the int 123
+    assert decode_value(encode_value("123")) == "123"
+
+def test_msgpack_roundtrip():
+    pytest.importorskip("msgpack")
+    encoded = encode_value({"a": [1, 2]}, fmt=MSGPACK, compression=NONE)
+    assert encoded.startswith(MAGIC + MSGPACK)
+    assert decode_value(encoded) == {"a": [1, 2]}
+
+def test_compression_above_threshold():
+    value = {"log": "x" * 10000}
+    encoded = encode_value(value, fmt=JSON, compression=ZLIB, threshold=1024)
+    assert encoded[len(MAGIC) + 1] == ZLIB
+    assert len(encoded) < 1000
+    assert decode_value(encoded) == value
+    assert encode_value({"small": 1}, fmt=JSON, compression=ZLIB, threshold=1024)[len(MAGIC) + 1] == NONE
+
+def test_legacy_rows():
+    assert decode_value('{"n": 1}') == {"n": 1}
+    assert decode_value("hello") == "hello"
+    assert decode_value(None) is None
+    for legacy in ('{"n": 1}', "hello", "7"):
+        assert decode_value(wrap_legacy(legacy)) == decode_value(legacy)
+        assert unwrap_legacy(wrap_legacy(legacy)) == legacy
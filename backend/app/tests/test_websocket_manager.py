@@ -0,0 +1,164 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from api.routes import myocore_routes
+from api.services import token_service
+from core.utils.websocket_manager import ConnectionManager
+
+class FakeSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.inbox = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    async def receive_text(self):
+        data = await self.inbox.get()
+        if data is None:
+            raise WebSocketDisconnect()
+        return data
+
+    async def send_text(self, frame):
+        await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(json.loads(frame))
+
+async def _connect(manager, count, **kwargs):
+    sockets = [FakeSocket(**kwargs) for _ in range(count)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, f"c{i}")
+    await asyncio.sleep(0.01)   # Initial heartbeats
+    return sockets
+
+@pytest_asyncio.fixture
+async def make_manager():
+    created = []
+
+    def make(**kwargs):
+        created.append(ConnectionManager(heartbeat_interval=3600, **kwargs))
+        return created[-1]
+
+    yield make
+    for manager in created:
+        await manager.close_all()
+
+def _events(ws):
+    return [frame for frame in ws.frames if frame["type"] != "heartbeat"]
+
+@pytest.mark.asyncio
+async def test_stalled_client_does_not_delay_the_others(make_manager):
+    manager = make_manager(queue_size=8, policy="drop_oldest")
+    fast, stalled = await _connect(manager, 2)
+    stalled.gate.clear()
+    await manager.broadcast({"type": "event", "n": 1}, exclude={"c9"})
+    await asyncio.sleep(0.01)
+    assert _events(fast) == [{"type": "event", "n": 1}]
+    assert _events(stalled) == []
+    stalled.gate.set()
+    await asyncio.sleep(0.01)
+    assert _events(stalled) == [{"type": "event", "n": 1}]
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_the_newest_frames(make_manager):
+    manager = make_manager(queue_size=3, policy="drop_oldest")
+    (ws,) = await _connect(manager, 1)
+    ws.gate.clear()
+    await manager.broadcast({"type": "event", "n": 0})
+    await asyncio.sleep(0)   # Frame 0 is now in flight
+    for n in range(1, 10):
+        await manager.broadcast({"type": "event", "n": n})
+    ws.gate.set()
+    await asyncio.sleep(0.01)
+    # The queue kept the last 3 of frames 1-9
+    assert [f["n"] for f in _events(ws)] == [0, 7, 8, 9]
+    assert manager.connection_stats["c0"]["messages_dropped"] == 6
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_cuts_off_slow_consumers(make_manager):
+    manager = make_manager(queue_size=2, policy="disconnect")
+    fast, slow = await _connect(manager, 2)
+    slow.gate.clear()
+    for n in range(5):
+        await manager.broadcast({"type": "event", "n": n})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    assert slow.closed_with == 1013
+    assert "c1" not in manager.active_connections
+    assert [f["n"] for f in _events(fast)] == [0, 1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_send_timeout_drops_the_connection(make_manager):
+    manager = make_manager(queue_size=2, send_timeout_ms=20)
+    (ws,) = await _connect(manager, 1)
+    ws.gate.clear()
+    manager.send("c0", {"type": "event"})
+    await asyncio.sleep(0.05)
+    assert manager.get_connection_stats()["total_connections"] == 0
+    assert manager.send("c0", {"type": "event"}) is False
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ConnectionManager(policy="block")
+
+@pytest.mark.asyncio
+async def test_publish_reaches_only_topic_subscribers(make_manager):
+    manager = make_manager()
+    a, b = await _connect(manager, 2)
+    manager.subscribe("c0", "agent:neuroweave")
+    manager.subscribe("c1", "system")
+    assert manager.publish("agent:neuroweave", {"type": "log", "n": 1}) == 1
+    assert manager.publish("agent:rootbloom", {"type": "log", "n": 2}) == 0
+    await asyncio.sleep(0.01)
+    assert _events(a) == [{"type": "log", "n": 1}] and _events(b) == []
+    await manager.disconnect("c0")
+    assert "agent:neuroweave" not in manager.topics
+
+@pytest.mark.asyncio
+async def test_heartbeat_wheel_covers_every_client_from_one_task(make_manager):
+    manager = make_manager(heartbeat_slots=4)
+    manager.heartbeat_interval = 0.04
+    tasks_before = len(asyncio.all_tasks())
+    sockets = await _connect(manager, 10)
+    # A writer per client plus a single wheel task
+    assert len(asyncio.all_tasks()) - tasks_before == 10 + 1
+    await asyncio.sleep(0.1)
+    assert all(any(f["type"] == "heartbeat" for f in ws.frames) for ws in sockets)
+
+@pytest.mark.asyncio
+async def test_serve_handles_ping_and_subscriptions(make_manager):
+    manager = make_manager()
+    ws = FakeSocket()
+    session = asyncio.create_task(manager.serve(ws, "c0", topics=["system"], initial=[{"type": "hello"}]))
+    await ws.inbox.put("ping")
+    await ws.inbox.put('{"action": "subscribe", "topic": "agent:sporelink"}')
+    await ws.inbox.put('{"action": "unsubscribe", "topic": "system"}')
+    await asyncio.sleep(0.01)
+    assert manager.outboxes["c0"].topics == {"agent:sporelink"}
+    await ws.inbox.put(None)
+    await session
+    assert [f["type"] for f in _events(ws)] == ["hello", "pong"]
+    assert manager.topics == {} and manager.active_connections == {}
+
+def test_mycocore_stream_runs_on_the_hub(monkeypatch):
+    monkeypatch.setattr(myocore_routes, "manager", ConnectionManager(heartbeat_interval=3600))
+    monkeypatch.setattr(token_service, "SECRET_KEY", "s3cret")
+    token = token_service.create_access_token({"sub": "Atlas"})
+    app = FastAPI()
+    app.include_router(myocore_routes.router, prefix="/api")
+    with TestClient(app).websocket_connect(f"/api/mycocore/stream?token={token}&topics=agent:neuroweave") as ws:
+        assert ws.receive_json()["type"] == "connection_established"
+        ws.send_text("ping")
+        assert ws.receive_json()["type"] == "pong"
+        assert myocore_routes.manager.get_connection_stats()["topics"] == {"system": 1, "agent:neuroweave": 1, "logs": 1}